@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""benchmark_models_import
+--------------------------
+
+Reports the cold import time of :mod:`gdcdatamodel.models` with and
+without a schema snapshot (see :mod:`gdcdatamodel.models.snapshot`).
+Every import runs in a fresh interpreter.
+
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from gdcdictionary import gdcdictionary
+
+from gdcdatamodel.models import snapshot
+
+
+IMPORT_CMD = [sys.executable, '-c', 'import gdcdatamodel.models']
+
+
+def time_import(env, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call(IMPORT_CMD, env=env)
+        timings.append(time.time() - start)
+    return sorted(timings)
+
+
+def report(name, timings):
+    print('{:<20} min {:>7.3f}s  median {:>7.3f}s  max {:>7.3f}s'.format(
+        name, timings[0], timings[len(timings) // 2], timings[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=5,
+                        help='number of imports to time per mode')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+
+    try:
+        snapshot.write_snapshot(snapshot.build_snapshot(gdcdictionary), path)
+
+        env = dict(os.environ)
+        env.pop(snapshot.SNAPSHOT_ENV_VAR, None)
+        report('without snapshot', time_import(env, args.runs))
+
+        env[snapshot.SNAPSHOT_ENV_VAR] = path
+        report('with snapshot', time_import(env, args.runs))
+
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
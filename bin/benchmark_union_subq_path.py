@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""benchmark_union_subq_path
+--------------------------
+
+Reports the planning and execution time Postgres reports (``EXPLAIN
+ANALYZE``) for :func:`gdcdatamodel.query.union_subq_path` with each
+strategy across common label pairs.
+
+"""
+
+import argparse
+import getpass
+import json
+
+from gdcdatamodel import models  # noqa
+from gdcdatamodel import query
+from psqlgraph import Node, PsqlGraphDriver
+
+
+LABEL_PAIRS = [
+    ('case', 'aliquot'),
+    ('case', 'file'),
+    ('sample', 'case'),
+    ('aliquot', 'case'),
+    ('read_group', 'case'),
+    ('file', 'case'),
+]
+
+
+def get_timings(session, q):
+    compiled = q.statement.compile(dialect=session.bind.dialect)
+    rows = session.connection().execute(
+        'EXPLAIN (ANALYZE, FORMAT JSON) ' + str(compiled), compiled.params)
+    plan = rows.scalar()
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time'], plan[0]['Execution Time']
+
+
+def benchmark(g, src_label, dst_label, strategy, project_id, runs):
+    post_filters = []
+    if project_id:
+        post_filters.append(lambda q: q.props(project_id=project_id))
+
+    timings = []
+    with g.session_scope() as session:
+        for _ in range(runs):
+            q = query.union_subq_path(
+                g.nodes(Node.get_subclass(src_label)), dst_label,
+                post_filters, strategy=strategy)
+            timings.append(get_timings(session, q))
+            session.rollback()
+
+    return sorted(timings, key=sum)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-H", "--host", type=str, action="store",
+                        required=True, help="psql-server host")
+    parser.add_argument("-U", "--user", type=str, action="store",
+                        required=True, help="psql test user")
+    parser.add_argument("-D", "--database", type=str, action="store",
+                        required=True, help="psql test database")
+    parser.add_argument("-P", "--password", type=str, action="store",
+                        help="psql test password")
+    parser.add_argument("-p", "--project-id", type=str, action="store",
+                        help="only match destination nodes of this project")
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="number of runs per label pair and strategy")
+    parser.add_argument("--pair", nargs=2, action="append",
+                        metavar=("SRC", "DST"),
+                        help="label pair to benchmark, may be repeated")
+
+    args = parser.parse_args()
+    prompt = "Password for {}:".format(args.user)
+    password = args.password or getpass.getpass(prompt)
+    g = PsqlGraphDriver(args.host, args.user, password, args.database)
+
+    print('{:<28} {:<14} {:>12} {:>12}'.format(
+        'pair', 'strategy', 'plan (ms)', 'execute (ms)'))
+    for src_label, dst_label in args.pair or LABEL_PAIRS:
+        for strategy in query.STRATEGIES:
+            planning, execution = benchmark(
+                g, src_label, dst_label, strategy, args.project_id, args.runs)
+            print('{:<28} {:<14} {:>12.1f} {:>12.1f}'.format(
+                '{} -> {}'.format(src_label, dst_label),
+                strategy, planning, execution))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""benchmark_versioned_nodes_delta
+--------------------------
+
+Compares full and delta versions (see
+:meth:`gdcdatamodel.models.versioned_nodes.VersionedNode.clone_delta`)
+of a node edited one property at a time: the size of the stored rows
+and the latency of reading the history back.  Everything is written
+in a transaction that is rolled back.
+
+"""
+
+import argparse
+import getpass
+import time
+
+from gdcdatamodel import models as md
+from psqlgraph import PsqlGraphDriver
+
+
+SIZE_SQL = """
+SELECT sum(pg_column_size(v.*)) FROM versioned_nodes v WHERE node_id = :node_id
+"""
+
+
+def new_node(node_id, properties):
+    node = md.Aliquot(node_id=node_id, project_id='BENCH-MARK',
+                      submitter_id=node_id)
+    node.sysan.update({'key{}'.format(i): 'x' * 32 for i in range(properties)})
+    return node
+
+
+def write_versions(session, node, versions, clone):
+    session.add(node)
+    session.flush()
+    for version in range(versions):
+        node.sysan['version'] = version
+        session.add(clone(node))
+        session.flush()
+
+
+def time_history(session, node, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        list(md.VersionedNode.iter_history(session, node.node_id, node.label))
+        timings.append(time.time() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-H", "--host", type=str, action="store",
+                        required=True, help="psql-server host")
+    parser.add_argument("-U", "--user", type=str, action="store",
+                        required=True, help="psql test user")
+    parser.add_argument("-D", "--database", type=str, action="store",
+                        required=True, help="psql test database")
+    parser.add_argument("-P", "--password", type=str, action="store",
+                        help="psql test password")
+    parser.add_argument("-v", "--versions", type=int, default=200,
+                        help="number of versions per node")
+    parser.add_argument("-k", "--properties", type=int, default=50,
+                        help="number of system annotations per node")
+    parser.add_argument("-c", "--checkpoint-interval", type=int,
+                        default=md.versioned_nodes.DELTA_CHECKPOINT_INTERVAL,
+                        help="versions between full snapshots")
+    parser.add_argument("-n", "--runs", type=int, default=5,
+                        help="number of history reads to time")
+
+    args = parser.parse_args()
+    prompt = "Password for {}:".format(args.user)
+    password = args.password or getpass.getpass(prompt)
+    g = PsqlGraphDriver(args.host, args.user, password, args.database)
+
+    def clone_delta(node):
+        return md.VersionedNode.clone_delta(
+            session, node, args.checkpoint_interval)
+
+    with g.session_scope() as session:
+        modes = [
+            ('full', new_node('benchmark-full', args.properties),
+             md.VersionedNode.clone),
+            ('delta', new_node('benchmark-delta', args.properties),
+             clone_delta),
+        ]
+
+        print('{:<8} {:>12} {:>16}'.format('mode', 'size (kB)', 'history (ms)'))
+        for mode, node, clone in modes:
+            write_versions(session, node, args.versions, clone)
+            size = session.execute(SIZE_SQL, {'node_id': node.node_id}).scalar()
+            latency = time_history(session, node, args.runs)
+            print('{:<8} {:>12.1f} {:>16.1f}'.format(
+                mode, size / 1024.0, latency * 1000))
+
+        session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""drain_related_cases_queue
+--------------------------
+
+Worker rebuilding the related case cache of the nodes queued by
+flushes in the deferred related case cache mode.
+
+"""
+
+import argparse
+import getpass
+import logging
+import time
+
+from gdcdatamodel.models import case_cache_queue
+from psqlgraph import Node, PsqlGraphDriver
+
+
+logging.basicConfig()
+logger = logging.getLogger("drain_related_cases_queue")
+logger.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-H", "--host", type=str, action="store",
+                        required=True, help="psql-server host")
+    parser.add_argument("-U", "--user", type=str, action="store",
+                        required=True, help="psql test user")
+    parser.add_argument("-D", "--database", type=str, action="store",
+                        required=True, help="psql test database")
+    parser.add_argument("-P", "--password", type=str, action="store",
+                        help="psql test password")
+    parser.add_argument("-b", "--batch-size", type=int, default=1000,
+                        help="nodes to rebuild per transaction")
+    parser.add_argument("-f", "--follow", action="store_true",
+                        help="keep polling the queue once it is empty")
+    parser.add_argument("-i", "--poll-interval", type=float, default=5.0,
+                        help="seconds between polls with --follow")
+
+    args = parser.parse_args()
+    prompt = "Password for {}:".format(args.user)
+    password = args.password or getpass.getpass(prompt)
+    g = PsqlGraphDriver(args.host, args.user, password, args.database)
+
+    while True:
+        count = case_cache_queue.drain(g, Node, args.batch_size)
+        logger.info("Drained %d queued nodes", count)
+
+        if not args.follow:
+            break
+
+        time.sleep(args.poll_interval)
+
+    print("Done.")
+
+
+if __name__ == '__main__':
+    main()
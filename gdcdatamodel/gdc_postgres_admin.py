@@ -9,17 +9,22 @@ Module for stateful management of a GDC PostgreSQL installation.
 import argparse
 import logging
 import random
+import re
 import sqlalchemy as sa
 import time
 
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 from psqlgraph.base import ORMBase
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex, CreateTable
 
 #: Required but 'unused' import to register GDC models
 from . import models  # noqa
+from .models import case_cache
+from .models.utils import string_types
 
 from psqlgraph import (
     create_all,
@@ -106,6 +111,62 @@ COMMIT;
 """
 
 
+EXISTING_INDEXES_SQL = """
+SELECT pg_indexes.indexname AS name,
+       pg_indexes.tablename AS table,
+       pg_index.indisvalid AS valid
+FROM pg_indexes
+JOIN pg_class ON pg_class.relname = pg_indexes.indexname
+JOIN pg_namespace
+     ON pg_namespace.oid = pg_class.relnamespace
+    AND pg_namespace.nspname = pg_indexes.schemaname
+JOIN pg_index ON pg_index.indexrelid = pg_class.oid
+WHERE pg_indexes.schemaname = current_schema()
+"""
+
+DROP_INDEX_CONCURRENTLY_SQL = """
+DROP INDEX CONCURRENTLY IF EXISTS "{name}"
+"""
+
+
+EXISTING_TABLES_SQL = """
+SELECT pg_class.relname AS name,
+       pg_class.reltuples::bigint AS rows,
+       pg_total_relation_size(pg_class.oid) AS size
+FROM pg_class
+JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace
+WHERE pg_namespace.nspname = current_schema()
+  AND pg_class.relkind IN ('r', 'p')
+"""
+
+EXISTING_FOREIGN_KEYS_SQL = """
+SELECT src.relname AS table,
+       pg_attribute.attname AS column,
+       dst.relname AS referenced
+FROM pg_constraint
+JOIN pg_class src ON src.oid = pg_constraint.conrelid
+JOIN pg_class dst ON dst.oid = pg_constraint.confrelid
+JOIN pg_attribute
+     ON pg_attribute.attrelid = pg_constraint.conrelid
+    AND pg_attribute.attnum = pg_constraint.conkey[1]
+WHERE pg_constraint.contype = 'f'
+"""
+
+#: Prefixes of the tables psqlgraph creates for Node/Edge subclasses
+GRAPH_TABLE_PREFIXES = ('node_', 'edge_')
+
+#: Prefix of the GDC specific indexes, see models.indexes.index_name()
+GDC_INDEX_PREFIX = 'index_'
+
+#: One statement of a graph-plan with the locks it takes
+PlanStep = namedtuple('PlanStep', [
+    'statement',
+    'lock',
+    'impact',
+    'destructive',
+])
+
+
 def execute(engine, sql, *args, **kwargs):
     statement = sa.sql.text(sql)
     logger.debug(statement)
@@ -120,34 +181,395 @@ def get_engine(host, user, password, database):
     return create_engine(con_str, connect_args=connect_args)
 
 
+#: Number of tables per GRANT/REVOKE statement
+GRANT_CHUNK_SIZE = 100
+
+#: Number of connections GRANT/REVOKE statements are spread over
+GRANT_WORKERS = 4
+
+
+class PhaseTimer(object):
+    """Log the duration of the named phases of a subcommand"""
+
+    def __init__(self):
+        self.timings = []
+
+    def phase(self, name):
+        timer = self
+
+        class Phase(object):
+            def __enter__(self):
+                self.start = time.time()
+
+            def __exit__(self, *exc_info):
+                timer.timings.append((name, time.time() - self.start))
+                logger.info('Phase %-30s %8.2fs', name, timer.timings[-1][1])
+
+        return Phase()
+
+
+def get_graph_tables(namespace=None):
+    node_cls = ext.get_abstract_node(namespace)
+    edge_cls = ext.get_abstract_edge(namespace)
+
+    return [
+        cls.__tablename__
+        for cls in node_cls.get_subclasses() + edge_cls.get_subclasses()
+    ]
+
+
+def get_statements_for_all_graph_tables(sql, namespace=None,
+                                        chunk_size=GRANT_CHUNK_SIZE, **kwargs):
+    """Returns the statements of a SQL statment that has a python format
+    variable {table}, replaced with comma separated chunks of the
+    tablenames of all Node and Edge tables
+
+    """
+
+    tables = get_graph_tables(namespace)
+    return [
+        sql.format(**dict(kwargs, table=', '.join(tables[i:i + chunk_size])))
+        for i in range(0, len(tables), chunk_size)
+    ]
+
+
+def execute_statements(engine, statements, workers=GRANT_WORKERS,
+                       dry_run=False):
+    """Execute independent statements over up to workers connections, or
+    only print them with dry_run
+
+    """
+
+    if dry_run:
+        for statement in statements:
+            print(statement.strip())
+        return statements
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(execute, engine, statement)
+                       for statement in statements]:
+            future.result()
+
+    return statements
+
+
 def execute_for_all_graph_tables(engine, sql, namespace=None, *args, **kwargs):
     """Execute a SQL statment that has a python format variable {table}
-    to be replaced with the tablename for all Node and Edge tables
+    to be replaced with the tablename for all Node and Edge tables.
+
+    Tables are batched ``chunk_size`` per statement and statements run
+    over ``workers`` connections (or are printed with ``dry_run``).
 
     """
+
+    chunk_size = kwargs.pop('chunk_size', GRANT_CHUNK_SIZE)
+    workers = kwargs.pop('workers', GRANT_WORKERS)
+    dry_run = kwargs.pop('dry_run', False)
+
+    statements = get_statements_for_all_graph_tables(
+        sql, namespace, chunk_size, **kwargs)
+    return execute_statements(engine, statements, workers, dry_run)
+
+
+def get_users(user):
+    """Returns the grantee list of a user name or list of user names"""
+
+    users = [user] if isinstance(user, string_types) else list(user)
+    return ', '.join(users)
+
+
+def grant_read_permissions_to_graph(engine, user, namespace=None, **kwargs):
+    return execute_for_all_graph_tables(
+        engine, GRANT_READ_PRIVS_SQL, namespace, user=get_users(user), **kwargs)
+
+
+def grant_write_permissions_to_graph(engine, user, namespace=None, **kwargs):
+    return execute_for_all_graph_tables(
+        engine, GRANT_WRITE_PRIVS_SQL, namespace, user=get_users(user), **kwargs)
+
+
+def revoke_read_permissions_to_graph(engine, user, namespace=None, **kwargs):
+    return execute_for_all_graph_tables(
+        engine, REVOKE_READ_PRIVS_SQL, namespace, user=get_users(user), **kwargs)
+
+
+def revoke_write_permissions_to_graph(engine, user, namespace=None, **kwargs):
+    return execute_for_all_graph_tables(
+        engine, REVOKE_WRITE_PRIVS_SQL, namespace, user=get_users(user), **kwargs)
+
+
+def get_declared_indexes(namespace=None):
+    """Returns a map of index name -> Index declared on the Node and Edge
+    tables
+
+    """
+
     node_cls = ext.get_abstract_node(namespace)
     edge_cls = ext.get_abstract_edge(namespace)
 
+    indexes = {}
     for cls in node_cls.get_subclasses() + edge_cls.get_subclasses():
-        _kwargs = dict(kwargs, **{'table': cls.__tablename__})
-        statement = sql.format(**_kwargs)
-        execute(engine, statement)
+        for index in cls.__table__.indexes:
+            indexes.setdefault(index.name, index)
+    return indexes
+
+
+def get_existing_indexes(engine):
+    """Returns a map of index name -> valid for the indexes in the
+    database
+
+    """
+
+    rows = execute(engine, EXISTING_INDEXES_SQL)
+    return {row.name: row.valid for row in rows}
+
+
+def get_create_index_concurrently_sql(engine, index):
+    statement = str(CreateIndex(index).compile(dialect=engine.dialect))
+    return re.sub(
+        r'^CREATE (UNIQUE )?INDEX',
+        lambda match: 'CREATE {}INDEX CONCURRENTLY'.format(match.group(1) or ''),
+        statement.strip())
+
+
+def create_table_indexes(engine, table, indexes):
+    """Build the indexes of one table one after the other, concurrent
+    builds on the same table would wait on each other anyway
+
+    :returns: list of (index name, seconds)
+
+    """
+
+    connection = engine.connect().execution_options(
+        isolation_level='AUTOCOMMIT')
+    timings = []
+
+    try:
+        for index in indexes:
+            start = time.time()
+            logger.info('Creating index %s on %s', index.name, table)
+            connection.execute(get_create_index_concurrently_sql(engine, index))
+            timings.append((index.name, time.time() - start))
+            logger.info('Created index %s in %.2fs', index.name, timings[-1][1])
+    finally:
+        connection.close()
+
+    return timings
+
+
+def create_indexes(engine, namespace=None, workers=4):
+    """Build the indexes declared on the models that are missing from
+    the database with ``CREATE INDEX CONCURRENTLY``, tables in
+    parallel.
+
+    Invalid indexes left behind by an interrupted concurrent build are
+    dropped and rebuilt, valid ones are kept, so an interrupted run can
+    simply be restarted.
+
+    :returns: ``dict`` with the names of the ``existing``,
+        ``dropped`` (invalid) and ``created`` indexes
+
+    """
+
+    declared = get_declared_indexes(namespace)
+    existing = get_existing_indexes(engine)
+
+    invalid = sorted(
+        name for name, valid in existing.items()
+        if not valid and name in declared
+    )
+    for name in invalid:
+        logger.info('Dropping invalid index %s', name)
+        connection = engine.connect().execution_options(
+            isolation_level='AUTOCOMMIT')
+        try:
+            connection.execute(DROP_INDEX_CONCURRENTLY_SQL.format(name=name))
+        finally:
+            connection.close()
+
+    missing = defaultdict(list)
+    for name, index in sorted(declared.items()):
+        if not existing.get(name):
+            missing[index.table.name].append(index)
+
+    logger.info('%d declared indexes, %d missing on %d tables',
+                len(declared), sum(map(len, missing.values())), len(missing))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(create_table_indexes, engine, table, indexes)
+            for table, indexes in sorted(missing.items())
+        ]
+        created = [name for f in futures for name, _ in f.result()]
+
+    return {
+        'existing': sorted(name for name in declared if existing.get(name)),
+        'dropped': invalid,
+        'created': created,
+    }
+
+
+def get_graph_classes(namespace=None):
+    node_cls = ext.get_abstract_node(namespace)
+    edge_cls = ext.get_abstract_edge(namespace)
+    return node_cls.get_subclasses(), edge_cls.get_subclasses()
+
+
+def describe_table_size(tables, name):
+    table = tables.get(name)
+    if table is None:
+        return 'new table'
+    return '~{} rows, {} MB'.format(table.rows, table.size // (1024 * 1024))
 
 
-def grant_read_permissions_to_graph(engine, user, namespace=None):
-    execute_for_all_graph_tables(engine, GRANT_READ_PRIVS_SQL, namespace, user=user)
+def get_edge_table_endpoints(foreign_keys, table):
+    """Returns (src table, dst table) of an existing edge table"""
 
+    endpoints = {fk.column: fk.referenced
+                 for fk in foreign_keys if fk.table == table}
+    return endpoints.get('src_id'), endpoints.get('dst_id')
 
-def grant_write_permissions_to_graph(engine, user, namespace=None):
-    execute_for_all_graph_tables(engine, GRANT_WRITE_PRIVS_SQL, namespace, user=user)
 
+def get_plan(engine, namespace=None, drop_orphans=False):
+    """Compare the loaded Node/Edge subclasses and their indexes with the
+    live catalog.
 
-def revoke_read_permissions_to_graph(engine, user, namespace=None):
-    execute_for_all_graph_tables(engine, REVOKE_READ_PRIVS_SQL, namespace, user=user)
+    :returns: ordered list of :class:`PlanStep`:
 
+        1. renames of orphaned edge tables whose endpoints match exactly
+           one missing edge table (e.g. after a tablename change)
+        2. missing node tables, then missing edge tables, with indexes
+        3. missing indexes on existing tables (built concurrently)
+        4. orphaned GDC indexes and, with drop_orphans, orphaned tables
 
-def revoke_write_permissions_to_graph(engine, user, namespace=None):
-    execute_for_all_graph_tables(engine, REVOKE_WRITE_PRIVS_SQL, namespace, user=user)
+    """
+
+    node_classes, edge_classes = get_graph_classes(namespace)
+    tables = {row.name: row for row in execute(engine, EXISTING_TABLES_SQL)}
+    foreign_keys = execute(engine, EXISTING_FOREIGN_KEYS_SQL).fetchall()
+    existing_indexes = {
+        row.name: row for row in execute(engine, EXISTING_INDEXES_SQL)}
+
+    declared_tables = {
+        cls.__tablename__ for cls in node_classes + edge_classes}
+    orphans = sorted(
+        name for name in tables
+        if name.startswith(GRAPH_TABLE_PREFIXES)
+        and name not in declared_tables
+    )
+
+    steps = []
+
+    # Renamed edge tables
+    missing_edges = [
+        cls for cls in edge_classes if cls.__tablename__ not in tables]
+    renamed = {}
+    for orphan in orphans:
+        endpoints = get_edge_table_endpoints(foreign_keys, orphan)
+        candidates = [
+            cls for cls in missing_edges
+            if (cls.__src_table__, cls.__dst_table__) == endpoints
+        ]
+        if len(candidates) == 1 and candidates[0] not in renamed.values():
+            renamed[orphan] = candidates[0]
+            steps.append(PlanStep(
+                'ALTER TABLE {} RENAME TO {}'.format(
+                    orphan, candidates[0].__tablename__),
+                'ACCESS EXCLUSIVE on {}'.format(orphan),
+                'brief, blocks reads and writes; {}'.format(
+                    describe_table_size(tables, orphan)),
+                False,
+            ))
+
+    renamed_tables = {cls.__tablename__ for cls in renamed.values()}
+    new_tables = set()
+
+    # Missing tables, nodes first so edge foreign keys resolve
+    for cls in node_classes + edge_classes:
+        table = cls.__table__
+        if table.name in tables or table.name in renamed_tables:
+            continue
+
+        new_tables.add(table.name)
+        referenced = sorted({
+            fk.column.table.name for fk in table.foreign_keys})
+        steps.append(PlanStep(
+            str(CreateTable(table).compile(dialect=engine.dialect)).strip(),
+            'SHARE ROW EXCLUSIVE on {}'.format(', '.join(referenced))
+            if referenced else 'none',
+            'brief, blocks writes to referenced tables' if referenced
+            else 'none',
+            False,
+        ))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            steps.append(PlanStep(
+                str(CreateIndex(index).compile(dialect=engine.dialect)).strip(),
+                'SHARE on {}'.format(table.name),
+                'none, table is empty',
+                False,
+            ))
+
+    # Missing indexes on existing tables
+    declared_indexes = get_declared_indexes(namespace)
+    for name, index in sorted(declared_indexes.items()):
+        table = index.table.name
+        if table in new_tables:
+            continue
+        existing = existing_indexes.get(name)
+        if existing is not None and existing.valid:
+            continue
+        if existing is not None:
+            steps.append(PlanStep(
+                DROP_INDEX_CONCURRENTLY_SQL.format(name=name).strip(),
+                'SHARE UPDATE EXCLUSIVE on {}'.format(table),
+                'none, drops invalid index',
+                False,
+            ))
+        steps.append(PlanStep(
+            get_create_index_concurrently_sql(engine, index),
+            'SHARE UPDATE EXCLUSIVE on {}'.format(table),
+            'does not block writes, scans {}'.format(
+                describe_table_size(tables, table)),
+            False,
+        ))
+
+    # Orphaned indexes and tables
+    for name, index in sorted(existing_indexes.items()):
+        if (name.startswith(GDC_INDEX_PREFIX)
+                and name not in declared_indexes
+                and index.table in declared_tables):
+            steps.append(PlanStep(
+                DROP_INDEX_CONCURRENTLY_SQL.format(name=name).strip(),
+                'SHARE UPDATE EXCLUSIVE on {}'.format(index.table),
+                'does not block writes',
+                True,
+            ))
+
+    if drop_orphans:
+        for orphan in orphans:
+            if orphan in renamed:
+                continue
+            steps.append(PlanStep(
+                'DROP TABLE {}'.format(orphan),
+                'ACCESS EXCLUSIVE on {}'.format(orphan),
+                'brief, drops {}'.format(describe_table_size(tables, orphan)),
+                True,
+            ))
+
+    return steps
+
+
+def format_plan(steps):
+    """Returns the plan as a SQL script annotated with lock impact"""
+
+    lines = []
+    for i, step in enumerate(steps, 1):
+        lines.append('-- [{}] lock: {}; impact: {}{}'.format(
+            i, step.lock, step.impact,
+            '; DESTRUCTIVE' if step.destructive else ''))
+        lines.append(step.statement + ';')
+        lines.append('')
+    return '\n'.join(lines)
 
 
 def create_graph_tables(engine, timeout, namespace=None):
@@ -322,11 +744,20 @@ def subcommand_create(args):
         return create_tables(**kwargs)
 
 
+def get_grant_kwargs(args):
+    return dict(
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+
+
 def subcommand_grant(args):
     """Grant permissions to a user.
 
     Argument ``--read`` will grant users read permissions
     Argument ``--write`` will grant users write and READ permissions
+    Argument ``--dry-run`` only prints the statements
     """
 
     logger.info("Running subcommand 'grant'")
@@ -334,15 +765,22 @@ def subcommand_grant(args):
 
     assert args.read or args.write, 'No premission types/users specified.'
 
+    timer = PhaseTimer()
+    kwargs = get_grant_kwargs(args)
+
     if args.read:
         users_read = [u for u in args.read.split(',') if u]
-        for user in users_read:
-            grant_read_permissions_to_graph(engine, user, args.namespace)
+        with timer.phase('grant read'):
+            grant_read_permissions_to_graph(
+                engine, users_read, args.namespace, **kwargs)
 
     if args.write:
         users_write = [u for u in args.write.split(',') if u]
-        for user in users_write:
-            grant_write_permissions_to_graph(engine, user, args.namespace)
+        with timer.phase('grant write'):
+            grant_write_permissions_to_graph(
+                engine, users_write, args.namespace, **kwargs)
+
+    return timer.timings
 
 
 def subcommand_revoke(args):
@@ -350,20 +788,128 @@ def subcommand_revoke(args):
 
     Argument ``--read`` will revoke users' read permissions
     Argument ``--write`` will revoke users' write AND READ permissions
+    Argument ``--dry-run`` only prints the statements
     """
 
     logger.info("Running subcommand 'revoke'")
     engine = get_engine(args.host, args.user, args.password, args.database)
 
+    timer = PhaseTimer()
+    kwargs = get_grant_kwargs(args)
+
     if args.read:
         users_read = [u for u in args.read.split(',') if u]
-        for user in users_read:
-            revoke_read_permissions_to_graph(engine, user, args.namespace)
+        with timer.phase('revoke read'):
+            revoke_read_permissions_to_graph(
+                engine, users_read, args.namespace, **kwargs)
 
     if args.write:
         users_write = [u for u in args.write.split(',') if u]
-        for user in users_write:
-            revoke_write_permissions_to_graph(engine, user, args.namespace)
+        with timer.phase('revoke write'):
+            revoke_write_permissions_to_graph(
+                engine, users_write, args.namespace, **kwargs)
+
+    return timer.timings
+
+
+def subcommand_index(args):
+    """Build the indexes declared on the graph models that are missing
+    from the database with CREATE INDEX CONCURRENTLY.
+
+    Tables are indexed in parallel (``--workers``).  Invalid indexes
+    left by an interrupted run are dropped and rebuilt.
+    """
+
+    logger.info("Running subcommand 'index'")
+    engine = get_engine(args.host, args.user, args.password, args.database)
+    return create_indexes(engine, args.namespace, args.workers)
+
+
+def subcommand_plan(args):
+    """Print the ordered DDL plan bringing the database in line with the
+    loaded models, with the locks each statement takes.  Nothing is
+    executed.
+
+    Argument ``--drop-orphans`` also plans dropping graph tables no
+    longer defined by the models
+    """
+
+    logger.info("Running subcommand 'plan'")
+    engine = get_engine(args.host, args.user, args.password, args.database)
+
+    steps = get_plan(engine, args.namespace, args.drop_orphans)
+    print(format_plan(steps))
+    logger.info("Planned %d statements", len(steps))
+    return steps
+
+
+def subcommand_cache_rebuild(args):
+    """Rebuild the related case cache (the _related_cases shortcut edges)
+    server-side, deleting stale and inserting missing edges.
+
+    Arguments ``--project``/``--case`` limit the rebuild to nodes of
+    those projects/related to those cases.
+    """
+
+    logger.info("Running subcommand 'cache-rebuild'")
+    engine = get_engine(args.host, args.user, args.password, args.database)
+    node_cls = ext.get_abstract_node(args.namespace)
+
+    project_ids = [p for p in (args.project or '').split(',') if p]
+    case_ids = [c for c in (args.case or '').split(',') if c]
+
+    results = case_cache.rebuild_related_cases(
+        engine, node_cls,
+        project_ids=project_ids,
+        case_ids=case_ids,
+        workers=args.workers,
+    )
+
+    for result in results:
+        logger.info("%-40s level %-3d deleted %-8d inserted %-8d %8.2fs",
+                    result.label, result.level, result.deleted,
+                    result.inserted, result.seconds)
+
+    return results
+
+
+def subcommand_cache_verify(args):
+    """Diff the related case cache against the cases derived from the
+    real edges and log every missing/stale shortcut edge.
+
+    Argument ``--repair-sql`` writes a SQL script fixing the cache
+    Argument ``--repair`` applies the fix
+    """
+
+    logger.info("Running subcommand 'cache-verify'")
+    engine = get_engine(args.host, args.user, args.password, args.database)
+    node_cls = ext.get_abstract_node(args.namespace)
+    graph = case_cache.get_case_cache_graph(node_cls)
+
+    repair_sql = open(args.repair_sql, 'w') if args.repair_sql else None
+    count = 0
+
+    try:
+        pages = case_cache.verify_related_cases(
+            engine, node_cls, page_size=args.page_size)
+        for page in pages:
+            count += len(page)
+            for discrepancy in page:
+                logger.info("%s %s -> case %s is %s",
+                            discrepancy.label, discrepancy.src_id,
+                            discrepancy.dst_id,
+                            'missing' if discrepancy.missing else 'stale')
+
+            if repair_sql:
+                repair_sql.write(case_cache.render_repair_sql(graph, page))
+            if args.repair:
+                case_cache.repair_related_cases(engine, node_cls, page)
+    finally:
+        if repair_sql:
+            repair_sql.close()
+
+    logger.info("Found %d related case cache discrepancies", count)
+    return count
 
 
 def add_base_args(subparser):
@@ -399,11 +945,27 @@ def add_subcommand_create(subparsers):
     )
 
 
+def add_grant_args(parser):
+    parser.add_argument(
+        "--chunk-size", type=int, action="store", default=GRANT_CHUNK_SIZE,
+        help="How many tables to include in one statement."
+    )
+    parser.add_argument(
+        "--workers", type=int, action="store", default=GRANT_WORKERS,
+        help="How many statements to run concurrently."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Print the statements instead of executing them."
+    )
+    return parser
+
+
 def add_subcommand_grant(subparsers):
-    parser = add_base_args(subparsers.add_parser(
+    parser = add_grant_args(add_base_args(subparsers.add_parser(
         'graph-grant',
         help=subcommand_grant.__doc__
-    ))
+    )))
     parser.add_argument(
         "--read", type=str, action="store",
         help="Users to grant read access to (comma separated)."
@@ -415,10 +977,10 @@ def add_subcommand_grant(subparsers):
 
 
 def add_subcommand_revoke(subparsers):
-    parser = add_base_args(subparsers.add_parser(
+    parser = add_grant_args(add_base_args(subparsers.add_parser(
         'graph-revoke',
         help=subcommand_revoke.__doc__
-    ))
+    )))
     parser.add_argument(
         "--read", type=str, action="store",
         help="Users to revoke read access from (comma separated)."
@@ -430,12 +992,77 @@ def add_subcommand_revoke(subparsers):
     )
 
 
+def add_subcommand_index(subparsers):
+    parser = add_base_args(subparsers.add_parser(
+        'graph-index',
+        help=subcommand_index.__doc__
+    ))
+    parser.add_argument(
+        "--workers", type=int, action="store", default=4,
+        help="How many tables to build indexes on concurrently."
+    )
+
+
+def add_subcommand_plan(subparsers):
+    parser = add_base_args(subparsers.add_parser(
+        'graph-plan',
+        help=subcommand_plan.__doc__
+    ))
+    parser.add_argument(
+        "--drop-orphans", action="store_true",
+        help="Include DROP TABLE statements for orphaned graph tables."
+    )
+
+
+def add_subcommand_cache_rebuild(subparsers):
+    parser = add_base_args(subparsers.add_parser(
+        'graph-cache-rebuild',
+        help=subcommand_cache_rebuild.__doc__
+    ))
+    parser.add_argument(
+        "--project", type=str, action="store",
+        help="Only rebuild nodes of these projects (comma separated)."
+    )
+    parser.add_argument(
+        "--case", type=str, action="store",
+        help="Only rebuild nodes related to these case ids (comma separated)."
+    )
+    parser.add_argument(
+        "--workers", type=int, action="store", default=4,
+        help="How many classes of the same level to rebuild concurrently."
+    )
+
+
+def add_subcommand_cache_verify(subparsers):
+    parser = add_base_args(subparsers.add_parser(
+        'graph-cache-verify',
+        help=subcommand_cache_verify.__doc__
+    ))
+    parser.add_argument(
+        "--page-size", type=int, action="store",
+        default=case_cache.VERIFY_PAGE_SIZE,
+        help="How many discrepancies to fetch (and repair) at a time."
+    )
+    parser.add_argument(
+        "--repair-sql", type=str, action="store",
+        help="Path to write a SQL script repairing the discrepancies to."
+    )
+    parser.add_argument(
+        "--repair", action="store_true",
+        help="Repair the discrepancies (one transaction per page)."
+    )
+
+
 def get_parser():
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(dest="subcommand")
     add_subcommand_create(subparsers)
     add_subcommand_grant(subparsers)
     add_subcommand_revoke(subparsers)
+    add_subcommand_index(subparsers)
+    add_subcommand_plan(subparsers)
+    add_subcommand_cache_rebuild(subparsers)
+    add_subcommand_cache_verify(subparsers)
     return parser
 
 
@@ -451,6 +1078,10 @@ def main(args=None):
         'graph-create': subcommand_create,
         'graph-grant': subcommand_grant,
         'graph-revoke': subcommand_revoke,
+        'graph-index': subcommand_index,
+        'graph-plan': subcommand_plan,
+        'graph-cache-rebuild': subcommand_cache_rebuild,
+        'graph-cache-verify': subcommand_cache_verify,
     }[args.subcommand](args)
 
     logger.info("Done.")
@@ -14,6 +14,7 @@ propogate to all code that imports this package and MAY BREAK THINGS.
 - jsm
 
 """
+import json
 import os
 import sys
 
@@ -38,11 +39,14 @@ from gdcdatamodel.models import (
     qcreport,
     released_data,
     studyrule,
+    case_cache_queue,
 )
 
 from sqlalchemy import (
     event,
-    and_
+    and_,
+    inspect,
+    text,
 )
 
 from psqlgraph import (
@@ -71,7 +75,23 @@ from gdcdatamodel.models.caching import (
 from gdcdatamodel.models.indexes import (
     cls_add_indexes,
     get_secondary_key_indexes,
+    get_unique_key_indexes,
 )
+from gdcdatamodel.models.lazy import (
+    LazyLoader,
+    cls_inject_lazy_lookups,
+    install_lazy_module,
+)
+from gdcdatamodel.models.link_rules import (
+    get_link_rules,
+    load_link_rules,
+)
+from gdcdatamodel.models.snapshot import (
+    SNAPSHOT_ENV_VAR,
+    build_snapshot,
+    read_snapshot,
+)
+from gdcdatamodel.models.utils import string_types
 from gdcdatamodel.models.misc import FileReport                # noqa
 from gdcdatamodel.models.versioned_nodes import VersionedNode  # noqa
 from gdcdatamodel.models.utils import py3_to_bytes
@@ -82,6 +102,12 @@ logger = logging.getLogger('gdcdatamodel')
 # the database, inform later code to skip these
 excluded_props = ['id', 'type']
 
+# These are schema keys that are handled explicitly by the factories
+# and are not copied into a Node subclass's ``_dictionary``
+skipped_dict_vals = ['$schema', 'systemProperties',
+                     'additionalProperties', 'links', 'properties',
+                     'uniqueKeys', 'id']
+
 
 def remove_spaces(s):
     """Returns a stripped string with all of the spaces removed.
@@ -99,6 +125,20 @@ def get_cls_package(package_namespace=None):
     return cls_package
 
 
+def get_package_module(package_namespace):
+    """Returns the module classes in :param:`package_namespace` are
+    registered in, creating it if needed
+
+    """
+    m = get_cls_package(package_namespace)
+    pkg = sys.modules.get(m)
+    if not pkg:
+        pkg = ModuleType(m)
+        sys.modules[m] = pkg
+        globals()[package_namespace] = pkg
+    return pkg
+
+
 def register_class(cls, package_namespace=None):
     """Register a class in `globals`.  This allows us to import the ORM
     classes from :mod:`gdcdatamodel.models`
@@ -109,13 +149,7 @@ def register_class(cls, package_namespace=None):
 
     """
     if package_namespace:
-        m = get_cls_package(package_namespace)
-        pkg = sys.modules.get(m)
-        if not pkg:
-            pkg = ModuleType(m)
-            sys.modules[m] = pkg
-            globals()[package_namespace] = pkg
-        setattr(pkg, cls.__name__,  cls)
+        setattr(get_package_module(package_namespace), cls.__name__,  cls)
 
     else:
         globals()[cls.__name__] = cls
@@ -128,14 +162,10 @@ def get_links(schema):
     :returns: a ``dict`` of format ``{<name>: <link>}``
 
     """
-    links = {}
-    for entry in schema.get('links') or []:
-        if 'subgroup' in entry:
-            for link in entry['subgroup']:
-                links[link['name']] = link
-        else:
-            links[entry['name']] = entry
-    return links
+    return {
+        name: rule.link
+        for name, rule in get_link_rules(schema).by_name.items()
+    }
 
 
 def types_from_str(types):
@@ -151,11 +181,11 @@ def types_from_str(types):
     }[type_]]
 
 
-def PropertyFactory(name, schema, key=None):
-    """Returns a pg_property (psqlgraph specific type of hybrid_property)
+def get_property_types(schema):
+    """Given a property schema, return the list of JSON schema type
+    names (or ``[None]`` if untyped) the property accepts.
 
     """
-    key = name if key is None else key
 
     # Assert the dictionary has no references for properties
     assert '$ref' not in schema.keys(), (
@@ -179,7 +209,15 @@ def PropertyFactory(name, schema, key=None):
         types = schema.get('type')
 
     # If None is all we have left over, then turn it into a list of None.
-    types = [types] if not isinstance(types, list) else types
+    return [types] if not isinstance(types, list) else types
+
+
+def PropertyFactory(name, schema, key=None):
+    """Returns a pg_property (psqlgraph specific type of hybrid_property)
+
+    """
+    key = name if key is None else key
+    types = get_property_types(schema)
 
     # Convert the list of string type identifiers to Python types
     python_types = types_from_str(types)
@@ -227,17 +265,39 @@ def cls_inject_versioned_nodes_lookup(cls):
         return self.get_versions(session)
 
     def get_versions(self, session):
-        """Returns a query for node versions given a session.
+        """Returns a query for node versions given a session.  Delta
+        versions are returned as full snapshots.
 
         """
 
-        return session.query(VersionedNode)\
-                      .filter(VersionedNode.node_id == self.node_id)\
-                      .filter(VersionedNode.label == self.label)\
-                      .order_by(VersionedNode.key.desc())
+        return versioned_nodes.VersionsQuery(VersionedNode, session=session)\
+                              .filter(VersionedNode.node_id == self.node_id)\
+                              .filter(VersionedNode.label == self.label)\
+                              .order_by(VersionedNode.key.desc())
+
+    def get_version_history(self, session, before_key=None, limit=None):
+        """Returns a page of node versions, see
+        :meth:`VersionedNode.get_history`
+
+        """
+
+        return VersionedNode.get_history(
+            session, self.node_id, self.label, before_key,
+            limit or versioned_nodes.HISTORY_PAGE_SIZE)
+
+    def get_version_as_of(self, session, gdc_version):
+        """Returns the node version in release :param:`gdc_version`, see
+        :meth:`VersionedNode.get_as_of`
+
+        """
+
+        return VersionedNode.get_as_of(
+            session, self.node_id, self.label, gdc_version)
 
     cls._versions = _versions
     cls.get_versions = get_versions
+    cls.get_version_history = get_version_history
+    cls.get_version_as_of = get_version_as_of
 
 
 def cls_inject_created_datetime_hook(cls,
@@ -258,22 +318,239 @@ def cls_inject_created_datetime_hook(cls,
             target._props[created_key] = ts
 
 
+#: ``session.info`` key of the flush timestamp stamped on updated nodes
+UPDATED_DATETIME_INFO_KEY = 'gdcdatamodel_updated_datetime'
+
+#: Merge properties into nodes: drop the keys being set, then add the
+#: new values and optionally the updated datetime, the transaction
+#: timestamp rendered as JSON like ``datetime.isoformat('T')``
+BULK_UPDATE_PROPS_SQL = """
+UPDATE {table}
+SET _props = (
+    SELECT CAST(coalesce(json_object_agg(merged.key, merged.value), '{{}}')
+                AS JSONB)
+    FROM (
+        SELECT key, value
+        FROM jsonb_each({table}._props)
+        WHERE NOT (key = ANY(:keys))
+        UNION ALL
+        SELECT key, value
+        FROM jsonb_each(CAST(:props AS JSONB))
+        {stamp}
+    ) merged
+)
+WHERE node_id = ANY(:node_ids)
+"""
+
+BULK_UPDATE_STAMP_SQL = """
+        UNION ALL
+        SELECT :updated_key, CAST(to_json(now()) AS JSONB)"""
+
+
+def get_updated_datetime(session):
+    """Returns the ISO timestamp of the current flush,
+    ``session._flush_timestamp``, formatted once per flush
+
+    """
+
+    flush_timestamp = session._flush_timestamp
+    cached = session.info.get(UPDATED_DATETIME_INFO_KEY)
+    if cached is None or cached[0] is not flush_timestamp:
+        cached = (flush_timestamp, flush_timestamp.isoformat('T'))
+        session.info[UPDATED_DATETIME_INFO_KEY] = cached
+    return cached[1]
+
+
+def set_updated_datetime_on_update(target, session, flush_context, instances):
+    """Hook on updated nodes.  Stamp the updated datetime of the node if
+    its properties changed.
+
+    Nodes whose only changes are to their associations, system
+    annotations or acl are not stamped.  psqlgraph runs this hook after
+    merging the node onto its existing properties, so the ``_props``
+    history only holds actual changes.
+
+    """
+
+    if target._updated_datetime_key not in target.__pg_properties__:
+        return
+    if getattr(session, '_flush_timestamp', None) is None:
+        return
+    if not inspect(target).attrs._props.history.has_changes():
+        return
+    target._props[target._updated_datetime_key] = get_updated_datetime(session)
+
+
+def bulk_update_props(cls, session, node_ids, props=None):
+    """Merge :param:`props` into the properties of nodes in a single
+    ``UPDATE``, setting their updated datetime server-side.
+
+    ::WARNING:: This bypasses the ORM: psqlgraph doesn't snapshot the
+    previous properties, no session hooks run and instances already
+    loaded in the session are not refreshed.
+
+    :param node_ids: ids of the nodes to update
+    :param props: ``dict`` of properties to set
+    :returns: number of nodes updated
+    :raises KeyError: if a property is not a property of the class
+
+    """
+
+    props = props or {}
+    updated_key = getattr(cls, '_updated_datetime_key', None)
+    allowed = set(cls.__pg_properties__) - {'created_datetime', updated_key}
+    for key in props:
+        if key not in allowed:
+            raise KeyError('{} has no property {}'.format(cls, key))
+
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+
+    keys = list(props)
+    stamp = ''
+    if updated_key in cls.__pg_properties__:
+        keys.append(updated_key)
+        stamp = BULK_UPDATE_STAMP_SQL
+
+    sql = BULK_UPDATE_PROPS_SQL.format(table=cls.__tablename__, stamp=stamp)
+    return session.execute(text(sql), {
+        'props': json.dumps(props),
+        'keys': keys,
+        'node_ids': node_ids,
+        'updated_key': updated_key,
+    }).rowcount
+
+
 def cls_inject_updated_datetime_hook(cls, updated_key="updated_datetime"):
-    """Given a class, inject a SQLAlchemy hook that will write the
-    timestamp of the last session flush to the :param:`updated_key`
-    property.
+    """Given a class, add :func:`set_updated_datetime_on_update` to its
+    session hooks to write the timestamp of the flush to the
+    :param:`updated_key` property of updated nodes, and add
+    :func:`bulk_update_props`.
 
     """
 
-    @event.listens_for(cls, 'before_update')
-    def set_updated_datetimes(mapper, connection, target):
-        # SQLAlchemy fires this event when associations change, but we should
-        # only adjust the timestamp if the object itself was modified.
-        target_session = target.get_session()
-        if target_session.is_modified(target, include_collections=False):
-            ts = target_session._flush_timestamp.isoformat('T')
-            if updated_key in target.props:
-                target._props[updated_key] = ts
+    cls._updated_datetime_key = updated_key
+    cls._session_hooks_before_update = cls._session_hooks_before_update + [
+        set_updated_datetime_on_update,
+    ]
+    cls.bulk_update_props = classmethod(bulk_update_props)
+
+
+#: Number of secondary key tuples resolved per round trip
+SECONDARY_KEYS_CHUNK_SIZE = 1000
+
+#: Join the node table against the arrays of looked up values, one
+#: array (and one ->> predicate using its secondary key index) per key
+SECONDARY_KEYS_LOOKUP_SQL = """
+SELECT {columns}
+FROM {table}
+JOIN unnest({arrays}) AS lookup({aliases})
+     ON {predicates}
+"""
+
+
+def get_secondary_keys_lookup(cls, keys, columns):
+    """Returns the bulk lookup statement of the nodes of cls by the
+    values of keys (one ``:key_<i>`` array parameter per key)
+
+    """
+
+    aliases = ['key_{}'.format(i) for i in range(len(keys))]
+    return text(SECONDARY_KEYS_LOOKUP_SQL.format(
+        columns=columns,
+        table=cls.__tablename__,
+        arrays=', '.join('CAST(:{} AS TEXT[])'.format(a) for a in aliases),
+        aliases=', '.join(aliases),
+        predicates='\n     AND '.join(
+            "({}._props ->> '{}') = lookup.{}".format(
+                cls.__tablename__, key, alias)
+            for key, alias in zip(keys, aliases)),
+    ))
+
+
+def iter_secondary_keys_chunks(cls, values, keys, chunk_size):
+    """Yield ``(keys, params)`` per chunk of the distinct, complete value
+    tuples.  Values are compared as text.
+
+    """
+
+    if keys is None:
+        if not cls.__pg_secondary_keys:
+            raise ValueError('{} has no secondary keys'.format(cls.__name__))
+        keys = cls.__pg_secondary_keys[0]
+
+    if list(keys) not in [list(k) for k in cls.__pg_secondary_keys]:
+        raise ValueError('{} are not secondary keys of {}, expected one of {}'
+                         .format(keys, cls.__name__, cls.__pg_secondary_keys))
+
+    values = list({
+        tuple(value) for value in values
+        if None not in value and len(value) == len(keys)
+    })
+
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        params = {
+            'key_{}'.format(i): [str(value[i]) for value in chunk]
+            for i in range(len(keys))
+        }
+        yield keys, params
+
+
+def get_node_ids_by_secondary_keys(cls, session, values, keys=None,
+                                   chunk_size=SECONDARY_KEYS_CHUNK_SIZE):
+    """Resolve secondary key tuples to node ids with one query per chunk
+
+    :param session: The session to query with
+    :param values: iterable of value tuples ordered like keys
+    :param keys:
+        One of the ``uniqueKeys`` (without ``id``) of the class,
+        defaults to the first one
+    :returns: ``dict`` of value tuple (as text) -> node_id of the
+        nodes found
+
+    """
+
+    node_ids = {}
+    for keys, params in iter_secondary_keys_chunks(cls, values, keys, chunk_size):
+        statement = get_secondary_keys_lookup(
+            cls, keys, '{}.node_id, lookup.*'.format(cls.__tablename__))
+        for row in session.execute(statement, params):
+            node_ids[tuple(row[1:])] = row[0]
+    return node_ids
+
+
+def get_nodes_by_secondary_keys(cls, session, values, keys=None,
+                                chunk_size=SECONDARY_KEYS_CHUNK_SIZE):
+    """Resolve secondary key tuples to nodes with one query per chunk,
+    see :func:`get_node_ids_by_secondary_keys`
+
+    :returns: ``dict`` of value tuple -> node of the nodes found
+
+    """
+
+    nodes = {}
+    for keys, params in iter_secondary_keys_chunks(cls, values, keys, chunk_size):
+        statement = get_secondary_keys_lookup(
+            cls, keys, '{}.*'.format(cls.__tablename__))
+        for node in session.query(cls).from_statement(statement).params(params):
+            nodes[tuple(str(node._props.get(key)) for key in keys)] = node
+    return nodes
+
+
+def get_secondary_key_filter(cls, key, value):
+    """Returns the filter for a secondary key equal to value.
+
+    String values are compared with ``_props->>key`` so the filter can
+    use the secondary key indexes, any other value falls back to JSONB
+    containment which matches its JSON type exactly.
+
+    """
+
+    if isinstance(value, string_types):
+        return cls._secondary_key_columns[key] == value
+    return cls._props.contains({key: value})
 
 
 def cls_inject_secondary_keys(cls, schema):
@@ -291,6 +568,9 @@ def cls_inject_secondary_keys(cls, schema):
         0. ``_secondary_keys``, a tuple of
            :class:`sqlalchemy.dialects.postgresql.json.JSONElement`
            objects
+        0. ``get_node_ids_by_secondary_keys`` and
+           ``get_nodes_by_secondary_keys`` classmethods to resolve
+           many secondary key tuples at once
 
     """
 
@@ -299,6 +579,14 @@ def cls_inject_secondary_keys(cls, schema):
         keys for keys in unique_keys if 'id' not in keys
     ]
 
+    # Build the JSONB ->> expressions once per class, they match the
+    # expressions of the indexes from get_secondary_key_indexes()
+    cls._secondary_key_columns = {
+        key: cls._props[key].astext
+        for keys in cls.__pg_secondary_keys
+        for key in keys
+    }
+
     class SecondaryKeyComparator(Comparator):
         def __eq__(self, other):
             filters = []
@@ -307,12 +595,8 @@ def cls_inject_secondary_keys(cls, schema):
             for keys, values in zip(secondary_keys, other):
                 if 'id' in keys:
                     continue
-                other = {
-                    key: val
-                    for key, val
-                    in zip(keys, values)
-                }
-                filters.append(cls._props.contains(other))
+                for key, val in zip(keys, values):
+                    filters.append(get_secondary_key_filter(cls, key, val))
             return and_(*filters)
 
     @property
@@ -340,8 +624,12 @@ def cls_inject_secondary_keys(cls, schema):
     _secondary_keys._is_pg_property = False
     cls._secondary_keys = _secondary_keys
     cls._secondary_keys_dicts = _secondary_keys_dicts
+    cls.get_node_ids_by_secondary_keys = classmethod(
+        get_node_ids_by_secondary_keys)
+    cls.get_nodes_by_secondary_keys = classmethod(get_nodes_by_secondary_keys)
 
     cls_add_indexes(cls, get_secondary_key_indexes(cls))
+    cls_add_indexes(cls, get_unique_key_indexes(cls))
 
 
 def NodeFactory(_id, schema, node_cls=Node, package_namespace=None):
@@ -374,9 +662,6 @@ def NodeFactory(_id, schema, node_cls=Node, package_namespace=None):
     #    'title': schema.get('title'),
     #}
 
-    skipped_dict_vals = [ '$schema', 'systemProperties',
-                          'additionalProperties', 'links', 'properties',
-                          'uniqueKeys', 'id' ]
     attributes['_dictionary'] = {
         key: schema[key] for key in schema if key not in skipped_dict_vals
     }
@@ -420,6 +705,32 @@ def NodeFactory(_id, schema, node_cls=Node, package_namespace=None):
     return cls
 
 
+def get_resolved_schema(schema):
+    """Reduce a dictionary schema to what :func:`NodeFactory` needs:
+    link properties are dropped and every property is resolved to its
+    list of type names and enum.  The result can be passed to
+    :func:`NodeFactory` in place of the original schema.
+
+    """
+
+    links = get_links(schema)
+    resolved = {
+        key: schema[key] for key in schema if key not in skipped_dict_vals
+    }
+    resolved['id'] = schema['id']
+    resolved['uniqueKeys'] = schema.get('uniqueKeys', [])
+    resolved['properties'] = {}
+
+    for key, prop_schema in schema.get('properties', {}).items():
+        if key in links or key in excluded_props:
+            continue
+        resolved['properties'][key] = {'type': get_property_types(prop_schema)}
+        if prop_schema.get('enum') is not None:
+            resolved['properties'][key]['enum'] = prop_schema['enum']
+
+    return resolved
+
+
 def generate_edge_tablename(src_label, label, dst_label):
     """Generate a name for the edge table.
 
@@ -464,6 +775,7 @@ def EdgeFactory(name, label, src_label, dst_label, src_dst_assoc,
                 node_cls=Node,
                 edge_cls=Edge,
                 package_namespace=None,
+                tablename=None,
                 _assigned_association_proxies=defaultdict(lambda: defaultdict(set))):
     """Returns an edge class.
 
@@ -477,6 +789,10 @@ def EdgeFactory(name, label, src_label, dst_label, src_dst_assoc,
     :param dst_src_assoc:
         The backref name i.e. ``dst.dst_src_assoc`` returns a list of
         source type nodes
+    :param tablename:
+        A previously generated tablename (e.g. from a schema
+        snapshot).  Generated with :func:`generate_edge_tablename`
+        if not given.
     :param _assigned_association_proxies:
         Don't pass this parameter. This will be used to store what
         links and backrefs have been assigned to the source and
@@ -497,7 +813,8 @@ def EdgeFactory(name, label, src_label, dst_label, src_dst_assoc,
 
     # Generate the tablename. If it is too long, it will be hashed and
     # truncated.
-    tablename = generate_edge_tablename(src_label, label, dst_label)
+    if tablename is None:
+        tablename = generate_edge_tablename(src_label, label, dst_label)
 
     # Lookup the tablenames for the source and destination classes
     src_cls = node_cls.get_subclass(src_label)
@@ -616,6 +933,36 @@ def parse_edge(src_label,
     return '_{}_out'.format(edge.__name__)
 
 
+def caches_related_cases(label, schema):
+    """Should nodes of this type have case shortcut edges
+
+    :param label: The node label
+    :param schema: The node's schema (or ``_dictionary``)
+
+    """
+
+    return (
+        schema['category'] not in NOT_RELATED_CASES_CATEGORIES
+        or label in ['annotation']
+    )
+
+
+def get_related_cases_link(label):
+    """Returns the link definition of the case shortcut edge for nodes
+    of type :param:`label`
+
+    """
+
+    return {
+        'name': RELATED_CASES_LINK_NAME,
+        'multiplicity': 'many_to_one',
+        'required': False,
+        'target_type': 'case',
+        'label': 'relates_to',
+        'backref': '_related_{}'.format(label),
+    }
+
+
 def load_edges(dictionary, node_cls=Node, edge_cls=Edge, package_namespace=None):
     """Add a dictionry of links from this class
 
@@ -644,22 +991,10 @@ def load_edges(dictionary, node_cls=Node, edge_cls=Edge, package_namespace=None)
             }
 
     for src_cls in node_cls.get_subclasses():
-        cache_case = (
-            not src_cls._dictionary['category'] in NOT_RELATED_CASES_CATEGORIES
-            or src_cls.get_label() in ['annotation']
-        )
-
-        if not cache_case:
+        if not caches_related_cases(src_cls.label, src_cls._dictionary):
             continue
 
-        link = {
-            'name': RELATED_CASES_LINK_NAME,
-            'multiplicity': 'many_to_one',
-            'required': False,
-            'target_type': 'case',
-            'label': 'relates_to',
-            'backref': '_related_{}'.format(src_cls.label),
-        }
+        link = get_related_cases_link(src_cls.label)
 
         parse_edge(
             src_cls.label,
@@ -742,39 +1077,126 @@ def inject_pg_edges(node_cls):
         cls_inject_backward_edges(cls)
 
 
+def load_snapshot(snapshot, node_cls=Node, edge_cls=Edge, package_namespace=None):
+    """Create all Node and Edge subclasses from a schema snapshot (see
+    :mod:`gdcdatamodel.models.snapshot`) rather than from the raw
+    dictionary.  This is the equivalent of :func:`load_nodes`,
+    :func:`load_edges` and :func:`inject_pg_backrefs`.
+
+    """
+
+    for spec in snapshot['nodes']:
+        name = get_class_name_from_id(spec['id'])
+        if not node_cls.is_subclass_loaded(name):
+            cls = NodeFactory(
+                spec['id'], spec['schema'], node_cls, package_namespace)
+            register_class(cls, package_namespace)
+
+    for spec in snapshot['edges']:
+        if edge_cls.is_subclass_loaded(spec['name']):
+            continue
+        EdgeFactory(
+            spec['name'],
+            spec['label'],
+            spec['src_label'],
+            spec['dst_label'],
+            spec['src_dst_assoc'],
+            spec['dst_src_assoc'],
+            node_cls=node_cls,
+            edge_cls=edge_cls,
+            package_namespace=package_namespace,
+            tablename=spec['tablename'],
+        )
+
+    classes = {cls.get_label(): cls for cls in node_cls.get_subclasses()}
+    for spec in snapshot['nodes']:
+        cls = classes[spec['id']]
+        for name, link in spec['links'].items():
+            cls._pg_links[name] = {
+                'edge_out': link['edge_out'],
+                'dst_type': classes[link['dst_type']],
+            }
+        for name, backref in spec['backrefs'].items():
+            cls._pg_backrefs[name] = {
+                'name': backref['name'],
+                'src_type': classes[backref['src_type']],
+            }
+
+
+def load_lazily(snapshot, node_cls, edge_cls, package_namespace=None):
+    """Defer creating the classes in the snapshot until they are looked
+    up, see :mod:`gdcdatamodel.models.lazy`
+
+    """
+
+    loader = LazyLoader(snapshot, node_cls, edge_cls, package_namespace)
+    cls_inject_lazy_lookups(node_cls, loader)
+
+    if package_namespace:
+        install_lazy_module(
+            get_package_module(package_namespace).__name__, loader)
+    else:
+        install_lazy_module(__name__, loader)
+
+    return loader
+
+
 @lru_cache(maxsize=10)
-def load_dictionary(dictionary=None, package_namespace=None):
+def load_dictionary(dictionary=None, package_namespace=None, snapshot=None,
+                    lazy=False):
     """ Loads all classes defined in dictionary, this method is expected to be called only once
         and very early in the application lifecycle. Subsequent calls are cached
     Args:
         dictionary: gdc dictionary or an extension of it
         package_namespace (str): module namespace used to insert all class generated from the dictionary
+        snapshot (str): path to a schema snapshot of the default dictionary, defaults to
+            ``$GDC_MODELS_SNAPSHOT``.  The snapshot is ignored if a dictionary is given or if it
+            was built for different gdcdictionary/gdcdatamodel versions
+        lazy (bool): only create classes when they are first looked up and leave mapper configuration
+            to SQLAlchemy, see :mod:`gdcdatamodel.models.lazy`
     Raises:
         AssertionError: If method is called more than maxsize of the lru_cache, which is 10. This method should only
             be called once
     """
 
+    node_cls, edge_cls = ext.register_base_class(package_namespace)
+
+    resolved = None
     if dictionary is None:
+        resolved = read_snapshot(snapshot or os.environ.get(SNAPSHOT_ENV_VAR))
+
+    if dictionary is None and not resolved:
         from gdcdictionary import gdcdictionary
         dictionary = gdcdictionary
 
-    node_cls, edge_cls = ext.register_base_class(package_namespace)
+    if lazy:
+        load_lazily(
+            resolved or build_snapshot(dictionary),
+            node_cls, edge_cls, package_namespace)
+
+    elif resolved:
+        load_snapshot(resolved, node_cls, edge_cls, package_namespace)
+
+    else:
+        load_nodes(dictionary, node_cls, package_namespace)
+        load_edges(dictionary, node_cls, edge_cls, package_namespace)
+        inject_pg_backrefs(dictionary, node_cls)
+
+    if dictionary is not None:
+        load_link_rules(dictionary)
 
-    load_nodes(dictionary, node_cls, package_namespace)
-    load_edges(dictionary, node_cls, edge_cls, package_namespace)
-    inject_pg_backrefs(dictionary, node_cls)
-    inject_pg_edges(node_cls)
-    configure_mappers()
+    if not lazy:
+        inject_pg_edges(node_cls)
+        configure_mappers()
 
     # register abstract node and edge in package
     if package_namespace:
-        m = get_cls_package(package_namespace)
-        pkg = sys.modules.get(m)
+        pkg = get_package_module(package_namespace)
         setattr(pkg, "Node", node_cls)
         setattr(pkg, "Edge", edge_cls)
 
 
 # load default dictionary
 if os.environ.get("LOAD_GDC_DICTIONARY", "True") == "True":
-    load_dictionary()
+    load_dictionary(lazy=os.environ.get("GDC_MODELS_LAZY") == "True")
 
@@ -13,10 +13,35 @@ GDC datamodel.
     cache when the set of graph edges is modified.  The value of this
     key in sysan should be a list of case ids
 
+The cache is maintained in one of two modes:
+
+**recursive** (default):
+    Each inserted, updated or deleted edge walks the source node and
+    its descendants during the flush, updating shortcut edges through
+    the ORM.
+
+**batched**:
+    The edge hooks only record the source node of the edge.  Once the
+    flush has been executed, the shortcut edges of all recorded nodes
+    and their descendants are recomputed with a few set-based SQL
+    statements per node class (see
+    :mod:`gdcdatamodel.models.case_cache`).  Prefer this for large
+    transactions.
+
+Use :func:`set_related_cases_mode` to pick the mode globally or for a
+single session.
+
 """
 
 import logging
 
+from collections import Counter, defaultdict
+
+from psqlgraph.session import GraphSession
+from sqlalchemy import event
+
+from gdcdatamodel.models import case_cache, case_cache_queue
+
 logger = logging.getLogger('gdcdatamodel')
 
 #: This variable contains the link name for the case shortcut
@@ -30,6 +55,128 @@ NOT_RELATED_CASES_CATEGORIES = {
     'TBD',
 }
 
+#: Update the cache per edge by walking the ORM graph during flush
+RELATED_CASES_RECURSIVE = 'recursive'
+
+#: Update the cache with set-based SQL after the flush
+RELATED_CASES_BATCHED = 'batched'
+
+#: Queue the nodes to update for an asynchronous worker
+RELATED_CASES_DEFERRED = 'deferred'
+
+RELATED_CASES_MODES = {
+    RELATED_CASES_RECURSIVE,
+    RELATED_CASES_BATCHED,
+    RELATED_CASES_DEFERRED,
+}
+
+#: Key of the per-session mode override in ``Session.info``
+RELATED_CASES_MODE_KEY = 'gdcdatamodel_related_cases_mode'
+
+#: Key of the nodes pending a batched update in the flush context
+RELATED_CASES_PENDING_KEY = 'gdcdatamodel_related_cases_pending'
+
+#: Key of the :class:`RelatedCasesMemo` in the flush context
+RELATED_CASES_MEMO_KEY = 'gdcdatamodel_related_cases_memo'
+
+_related_cases_mode = RELATED_CASES_RECURSIVE
+
+#: Hits, misses and invalidations of the flush-scoped memo of
+#: parent-derived case sets, summed over all flushes
+related_cases_memo_stats = Counter()
+
+
+def set_related_cases_mode(mode, session=None):
+    """Set how the related case cache is maintained.
+
+    :param mode: One of :data:`RELATED_CASES_MODES`
+    :param session:
+        Only use this mode for flushes of this session, otherwise set
+        the default for all sessions
+
+    """
+
+    global _related_cases_mode
+
+    if mode not in RELATED_CASES_MODES:
+        raise ValueError('Unknown related cases mode {!r}, expected one of {}'
+                         .format(mode, sorted(RELATED_CASES_MODES)))
+
+    if session is None:
+        _related_cases_mode = mode
+    else:
+        session.info[RELATED_CASES_MODE_KEY] = mode
+
+
+def get_related_cases_mode(session=None):
+    """Returns the related case cache mode used by :param:`session`"""
+
+    if session is not None:
+        return session.info.get(RELATED_CASES_MODE_KEY, _related_cases_mode)
+    return _related_cases_mode
+
+
+def reset_related_cases_memo_stats():
+    related_cases_memo_stats.clear()
+
+
+class RelatedCasesMemo(object):
+    """Flush-scoped memo of the related case ids a node derives from its
+    parents, shared by every hook invocation of one flush.
+
+    An entry depends on the node's outgoing edges and on the shortcut
+    edges of its parents, so it has to be invalidated when either
+    changes.
+
+    """
+
+    def __init__(self):
+        #: node_id -> frozenset of case ids
+        self.case_ids = {}
+
+        #: case node_id -> Case node
+        self.cases = {}
+
+        self.stats = Counter()
+
+    def _count(self, key):
+        self.stats[key] += 1
+        related_cases_memo_stats[key] += 1
+
+    def related_cases_from_parents(self, node):
+        case_ids = self.case_ids.get(node.node_id)
+
+        if case_ids is None:
+            self._count('misses')
+            cases = related_cases_from_parents(node)
+            self.cases.update((case.node_id, case) for case in cases)
+            case_ids = self.case_ids[node.node_id] = frozenset(
+                case.node_id for case in cases)
+        else:
+            self._count('hits')
+
+        return [self.cases[case_id] for case_id in case_ids]
+
+    def invalidate(self, node_id):
+        if self.case_ids.pop(node_id, None) is not None:
+            self._count('invalidations')
+
+
+def get_related_cases_memo(flush_context):
+    """Returns the memo of the flush, or None outside of a flush"""
+
+    if flush_context is None:
+        return None
+
+    return flush_context.attributes.setdefault(
+        RELATED_CASES_MEMO_KEY, RelatedCasesMemo())
+
+
+def invalidate_related_cases_memo(flush_context, node_id):
+    memo = get_related_cases_memo(flush_context)
+    if memo is not None:
+        memo.invalidate(node_id)
+
 
 def get_related_case_edge_cls(node):
     """Returns the Edge class for related cases of a given node
@@ -78,6 +225,12 @@ def get_edge_src(edge):
     return src
 
 
+def get_edge_src_id(edge):
+    """Return the id of the edge's source without querying for it"""
+
+    return edge.src.node_id if edge.src is not None else edge.src_id
+
+
 def get_edge_dst(edge, allow_query=False):
     """Return the edge's destination or None.
 
@@ -188,7 +341,12 @@ def cache_related_cases_recursive(node,
 
     # These are the cases are currently connected by a shortcut edge
     # to this node's parents
-    updated_cases = {c.node_id: c for c in related_cases_from_parents(node)}
+    memo = get_related_cases_memo(flush_context)
+    if memo is None:
+        parent_cases = related_cases_from_parents(node)
+    else:
+        parent_cases = memo.related_cases_from_parents(node)
+    updated_cases = {c.node_id: c for c in parent_cases}
 
     current_case_ids = set(current_cases.keys())
     updated_case_ids = set(updated_cases.keys())
@@ -202,6 +360,10 @@ def cache_related_cases_recursive(node,
 
     to_recur = [e for e in node.edges_in if e.src]
     for edge in to_recur:
+        # The child derives its cases from this node's shortcut edges
+        if memo is not None:
+            memo.invalidate(get_edge_src_id(edge))
+
         cache_related_cases_recursive(
             get_edge_src(edge),
             session,
@@ -246,6 +408,49 @@ def update_cache_edges(node, session, correct_cases):
         assoc_proxy.append(case)
 
 
+def record_related_cases_update(target, flush_context):
+    """Record the source node of an edge for a batched (or deferred)
+    update of the related case cache once the flush has been executed.
+
+    """
+
+    node_cls = target.get_node_class()
+    src_cls = node_cls.get_subclass_named(target.__src_class__)
+
+    if not hasattr(src_cls, RELATED_CASES_LINK_NAME):
+        return
+
+    src_id = target.src.node_id if target.src is not None else target.src_id
+    if src_id is None:
+        return
+
+    pending = flush_context.attributes.setdefault(RELATED_CASES_PENDING_KEY, {})
+    pending.setdefault(node_cls, defaultdict(set))[src_cls].add(src_id)
+
+
+@event.listens_for(GraphSession, 'after_flush_postexec')
+def cache_related_cases_after_flush(session, flush_context):
+    """Run the batched related case cache update (or queue it in
+    deferred mode) for the nodes recorded by the edge hooks during this
+    flush.
+
+    """
+
+    pending = flush_context.attributes.pop(RELATED_CASES_PENDING_KEY, None)
+    if not pending:
+        return
+
+    if get_related_cases_mode(session) == RELATED_CASES_DEFERRED:
+        for nodes in pending.values():
+            case_cache_queue.enqueue(session, nodes)
+        return
+
+    for node_cls, nodes in pending.items():
+        graph = case_cache.get_case_cache_graph(node_cls)
+        changes = case_cache.update_related_cases(session, graph, nodes)
+        case_cache.refresh_session_state(session, graph, changes)
+
+
 def cache_related_cases_on_insert(target,
                                   session,
                                   flush_context,
@@ -268,12 +473,18 @@ def cache_related_cases_on_insert(target,
 
     """
 
+    if get_related_cases_mode(session) != RELATED_CASES_RECURSIVE:
+        return record_related_cases_update(target, flush_context)
+
     if not target.src:
         target.src = get_edge_src(target)
 
     if not target.dst:
         target.dst = get_edge_dst(target, allow_query=True)
 
+        # The source may have been visited without this parent
+        invalidate_related_cases_memo(flush_context, get_edge_src_id(target))
+
     cache_related_cases_recursive(
         get_edge_src(target),
         session,
@@ -302,6 +513,10 @@ def cache_related_cases_on_update(target,
         deprecated).
 
     """
+
+    if get_related_cases_mode(session) != RELATED_CASES_RECURSIVE:
+        return record_related_cases_update(target, flush_context)
+
     cache_related_cases_recursive(
         get_edge_src(target),
         session,
@@ -330,10 +545,16 @@ def cache_related_cases_on_delete(target,
         deprecated).
 
     """
+
+    if get_related_cases_mode(session) != RELATED_CASES_RECURSIVE:
+        return record_related_cases_update(target, flush_context)
+
     # Remove the source and destination of application local
     # association_proxy so cache_related_cases_update_children doesn't
     # traverse the edge
     target.dst, target.src = None, None
+    invalidate_related_cases_memo(flush_context, target.src_id)
+
     cache_related_cases_recursive(
         get_edge_src(target),
         session,
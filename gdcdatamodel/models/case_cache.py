@@ -0,0 +1,819 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.models.case_cache
+----------------------------------
+
+Set-based SQL maintenance of the related case cache (the
+``_related_cases`` shortcut edges, see
+:mod:`gdcdatamodel.models.caching`).
+
+The cached cases of a node are the cases it has an edge to plus the
+cached cases of every other node it has an edge to.  Rather than
+walking nodes one at a time, this module recomputes the cache edges of
+a set of nodes of one class with a single statement, and walks the
+classes outward from case in order of their distance from case so a
+node's parents are always up to date before the node itself.
+
+"""
+
+import logging
+import time
+
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.orm.util import identity_key
+
+logger = logging.getLogger(__name__)
+
+#: Upper bound on the number of per-class statements issued to
+#: propagate a single update, this only matters for cyclic graphs
+MAX_SYNC_STATEMENTS = 10000
+
+#: Default number of discrepancies per page when verifying the cache
+VERIFY_PAGE_SIZE = 10000
+
+#: A shortcut edge that is missing from or stale in the cache
+Discrepancy = namedtuple('Discrepancy', [
+    'label',
+    'src_id',
+    'dst_id',
+    'missing',
+])
+
+#: Changes made by a full rebuild to the shortcut edges of one class
+RebuildResult = namedtuple('RebuildResult', [
+    'label',
+    'level',
+    'deleted',
+    'inserted',
+    'seconds',
+])
+
+EMPTY_EDGE_COLUMNS_SQL = "'{}'::jsonb, '{}'::jsonb, '{}'::text[]"
+
+#: Scopes selecting the nodes of a class whose cache edges a statement
+#: recomputes, see :meth:`CaseCacheGraph.scope_sql`
+SCOPE_IDS = 'ids'
+SCOPE_CLASS = 'class'
+SCOPE_PROJECTS = 'projects'
+SCOPE_CASES = 'cases'
+
+IDS_SCOPE_SQL = """
+    SELECT unnest(CAST(:ids AS TEXT[])) AS node_id
+"""
+
+CLASS_SCOPE_SQL = """
+    SELECT {node_table}.node_id FROM {node_table}
+"""
+
+PROJECTS_SCOPE_SQL = """
+    SELECT {node_table}.node_id FROM {node_table}
+    WHERE {node_table}._props ->> 'project_id' = ANY(:project_ids)
+"""
+
+CACHED_CASES_SCOPE_SQL = """
+    SELECT {cache_table}.src_id AS node_id FROM {cache_table}
+    WHERE {cache_table}.dst_id = ANY(:case_ids)
+"""
+
+DIRECT_CASES_SCOPE_SQL = """
+    SELECT {edge_table}.src_id AS node_id FROM {edge_table}
+    WHERE {edge_table}.dst_id = ANY(:case_ids)
+"""
+
+PARENT_CASES_SCOPE_SQL = """
+    SELECT {edge_table}.src_id AS node_id
+    FROM {edge_table}
+    JOIN {parent_cache_table}
+         ON {parent_cache_table}.src_id = {edge_table}.dst_id
+    WHERE {parent_cache_table}.dst_id = ANY(:case_ids)
+"""
+
+DIRECT_CASES_SQL = """
+    SELECT {edge_table}.src_id, {edge_table}.dst_id
+    FROM {edge_table}
+    WHERE {edge_table}.src_id IN (SELECT node_id FROM scope)
+"""
+
+PARENT_CASES_SQL = """
+    SELECT {edge_table}.src_id, {parent_cache_table}.dst_id
+    FROM {edge_table}
+    JOIN {parent_cache_table}
+         ON {parent_cache_table}.src_id = {edge_table}.dst_id
+    WHERE {edge_table}.src_id IN (SELECT node_id FROM scope)
+"""
+
+NO_CASES_SQL = """
+    SELECT NULL::text AS src_id, NULL::text AS dst_id WHERE false
+"""
+
+SYNC_CACHE_SQL = """
+WITH scope AS (
+    {scope}
+),
+expected AS (
+    {expected}
+),
+deleted AS (
+    DELETE FROM {cache_table}
+    WHERE {cache_table}.src_id IN (SELECT node_id FROM scope)
+      AND NOT EXISTS (
+          SELECT 1 FROM expected
+          WHERE expected.src_id = {cache_table}.src_id
+            AND expected.dst_id = {cache_table}.dst_id)
+    RETURNING {cache_table}.src_id, {cache_table}.dst_id
+),
+inserted AS (
+    INSERT INTO {cache_table} (src_id, dst_id, _props, _sysan, acl)
+    SELECT DISTINCT expected.src_id, expected.dst_id, {empty_columns}
+    FROM expected
+    WHERE NOT EXISTS (
+          SELECT 1 FROM {cache_table}
+          WHERE {cache_table}.src_id = expected.src_id
+            AND {cache_table}.dst_id = expected.dst_id)
+    RETURNING {cache_table}.src_id, {cache_table}.dst_id
+)
+{result}
+"""
+
+#: Result of :data:`SYNC_CACHE_SQL` listing every changed edge
+SYNC_CHANGES_SQL = """
+SELECT src_id, dst_id, false AS added FROM deleted
+UNION ALL
+SELECT src_id, dst_id, true AS added FROM inserted
+"""
+
+#: Result of :data:`SYNC_CACHE_SQL` counting the changed edges
+SYNC_COUNTS_SQL = """
+SELECT (SELECT count(*) FROM deleted) AS deleted,
+       (SELECT count(*) FROM inserted) AS inserted
+"""
+
+DIFF_CACHE_SQL = """
+WITH scope AS (
+    {scope}
+),
+expected AS (
+    {expected}
+),
+actual AS (
+    SELECT {cache_table}.src_id, {cache_table}.dst_id
+    FROM {cache_table}
+    WHERE {cache_table}.src_id IN (SELECT node_id FROM scope)
+)
+SELECT coalesce(expected.src_id, actual.src_id) AS src_id,
+       coalesce(expected.dst_id, actual.dst_id) AS dst_id,
+       actual.src_id IS NULL AS missing
+FROM expected
+FULL OUTER JOIN actual
+     ON actual.src_id = expected.src_id
+    AND actual.dst_id = expected.dst_id
+WHERE expected.src_id IS NULL OR actual.src_id IS NULL
+"""
+
+EXPECTED_TABLE_SQL = """
+CREATE TEMPORARY TABLE {expected_table} (
+    src_id TEXT NOT NULL,
+    dst_id TEXT NOT NULL,
+    PRIMARY KEY (src_id, dst_id)
+) ON COMMIT DROP
+"""
+
+EXPECTED_DIRECT_SQL = """
+INSERT INTO {expected_table} (src_id, dst_id)
+SELECT DISTINCT {edge_table}.src_id, {edge_table}.dst_id
+FROM {edge_table}
+WHERE NOT EXISTS (
+      SELECT 1 FROM {expected_table} existing
+      WHERE existing.src_id = {edge_table}.src_id
+        AND existing.dst_id = {edge_table}.dst_id)
+"""
+
+EXPECTED_PARENT_SQL = """
+INSERT INTO {expected_table} (src_id, dst_id)
+SELECT DISTINCT {edge_table}.src_id, {parent_expected_table}.dst_id
+FROM {edge_table}
+JOIN {parent_expected_table}
+     ON {parent_expected_table}.src_id = {edge_table}.dst_id
+WHERE NOT EXISTS (
+      SELECT 1 FROM {expected_table} existing
+      WHERE existing.src_id = {edge_table}.src_id
+        AND existing.dst_id = {parent_expected_table}.dst_id)
+"""
+
+#: Page of rows of {table} without a match in {other_table}, ordered
+#: by (src_id, dst_id) and starting after (:src_id, :dst_id)
+UNMATCHED_PAGE_SQL = """
+SELECT {table}.src_id, {table}.dst_id
+FROM {table}
+WHERE NOT EXISTS (
+      SELECT 1 FROM {other_table}
+      WHERE {other_table}.src_id = {table}.src_id
+        AND {other_table}.dst_id = {table}.dst_id)
+  AND ({table}.src_id, {table}.dst_id) > (:src_id, :dst_id)
+ORDER BY {table}.src_id, {table}.dst_id
+LIMIT :limit
+"""
+
+REPAIR_DELETE_SQL = """
+DELETE FROM {cache_table}
+USING unnest(CAST(:src_ids AS TEXT[]), CAST(:dst_ids AS TEXT[]))
+      AS repair(src_id, dst_id)
+WHERE {cache_table}.src_id = repair.src_id
+  AND {cache_table}.dst_id = repair.dst_id
+"""
+
+REPAIR_INSERT_SQL = """
+INSERT INTO {cache_table} (src_id, dst_id, _props, _sysan, acl)
+SELECT repair.src_id, repair.dst_id, {empty_columns}
+FROM unnest(CAST(:src_ids AS TEXT[]), CAST(:dst_ids AS TEXT[]))
+     AS repair(src_id, dst_id)
+WHERE NOT EXISTS (
+      SELECT 1 FROM {cache_table} existing
+      WHERE existing.src_id = repair.src_id
+        AND existing.dst_id = repair.dst_id)
+"""
+
+CHILDREN_SQL = """
+    SELECT DISTINCT {edge_table}.src_id
+    FROM {edge_table}
+    WHERE {edge_table}.dst_id = ANY(:ids)
+"""
+
+
+class CaseCacheGraph(object):
+    """Class level view of the graph used to maintain the case cache.
+
+    :param node_cls: The abstract Node class of a (namespaced) model
+
+    """
+
+    def __init__(self, node_cls):
+        self.node_cls = node_cls
+        self.edge_cls = node_cls.get_edge_class()
+        self.case_cls = node_cls.get_subclass('case')
+
+        classes = {cls.__name__: cls for cls in node_cls.get_subclasses()}
+
+        #: Number of edge classes seen, classes created lazily after
+        #: this graph was built make it stale
+        self.edge_count = len(self.edge_cls.get_subclasses())
+
+        #: node class -> shortcut edge class
+        self.cache_edges = {}
+
+        #: node class -> [(edge class, parent class)]
+        self.parent_edges = defaultdict(list)
+
+        #: node class -> [(edge class, child class)]
+        self.child_edges = defaultdict(list)
+
+        for edge in self.edge_cls.get_subclasses():
+            src = classes[edge.__src_class__]
+            dst = classes[edge.__dst_class__]
+            if edge.__name__ == '{}RelatesToCase'.format(src.__name__):
+                self.cache_edges[src] = edge
+            else:
+                self.parent_edges[src].append((edge, dst))
+                self.child_edges[dst].append((edge, src))
+
+        self.levels = self.get_levels()
+
+    def get_levels(self):
+        """Returns a map of class -> level where a level is the longest
+        distance from the class to case following edges from child to
+        parent.  Classes on a cycle are capped at the number of classes.
+
+        """
+
+        levels = {self.case_cls: 0}
+        frontier = [self.case_cls]
+        max_level = len(self.node_cls.get_subclasses())
+
+        while frontier:
+            parent = frontier.pop()
+            for _, child in self.child_edges[parent]:
+                level = min(levels[parent] + 1, max_level)
+                if levels.get(child, -1) < level:
+                    levels[child] = level
+                    frontier.append(child)
+
+        return levels
+
+    def get_level(self, cls):
+        return self.levels.get(cls, 0)
+
+    def get_parents(self, cls):
+        return {parent for _, parent in self.parent_edges[cls]}
+
+    def is_cyclic(self, cls):
+        """True if a parent of cls is not strictly closer to case"""
+
+        return any(
+            self.get_level(parent) >= self.get_level(cls)
+            for parent in self.get_parents(cls)
+            if parent in self.cache_edges
+        )
+
+    def get_classes_by_level(self):
+        """Returns a sorted list of ``(level, [classes])`` of the classes
+        with a shortcut edge
+
+        """
+
+        levels = defaultdict(list)
+        for cls in self.cache_edges:
+            levels[self.get_level(cls)].append(cls)
+        return sorted(levels.items(), key=lambda item: item[0])
+
+    def scope_sql(self, cls, scope):
+        """Returns SQL selecting the ``node_id`` of the nodes of
+        :param:`cls` in scope:
+
+        - :data:`SCOPE_IDS`: the ids in ``:ids``
+        - :data:`SCOPE_CLASS`: every node of the class
+        - :data:`SCOPE_PROJECTS`: nodes of the projects in ``:project_ids``
+        - :data:`SCOPE_CASES`: nodes that are or (once their parents are
+          up to date) should be related to a case in ``:case_ids``
+
+        """
+
+        if scope == SCOPE_IDS:
+            return IDS_SCOPE_SQL
+        if scope == SCOPE_CLASS:
+            return CLASS_SCOPE_SQL.format(node_table=cls.__tablename__)
+        if scope == SCOPE_PROJECTS:
+            return PROJECTS_SCOPE_SQL.format(node_table=cls.__tablename__)
+        if scope != SCOPE_CASES:
+            raise ValueError('Unknown case cache scope {!r}'.format(scope))
+
+        selects = [CACHED_CASES_SCOPE_SQL.format(
+            cache_table=self.cache_edges[cls].__tablename__)]
+        for edge, parent in self.parent_edges[cls]:
+            if parent is self.case_cls:
+                selects.append(DIRECT_CASES_SCOPE_SQL.format(
+                    edge_table=edge.__tablename__))
+            elif parent in self.cache_edges:
+                selects.append(PARENT_CASES_SCOPE_SQL.format(
+                    edge_table=edge.__tablename__,
+                    parent_cache_table=self.cache_edges[parent].__tablename__,
+                ))
+
+        return '\n    UNION\n'.join(selects)
+
+    def expected_cases_sql(self, cls):
+        """Returns SQL selecting (src_id, dst_id) of the shortcut edges
+        the nodes of :param:`cls` in the ``scope`` CTE should have
+
+        """
+
+        selects = []
+        for edge, parent in self.parent_edges[cls]:
+            if parent is self.case_cls:
+                selects.append(DIRECT_CASES_SQL.format(
+                    edge_table=edge.__tablename__))
+            elif parent in self.cache_edges:
+                selects.append(PARENT_CASES_SQL.format(
+                    edge_table=edge.__tablename__,
+                    parent_cache_table=self.cache_edges[parent].__tablename__,
+                ))
+
+        if not selects:
+            return NO_CASES_SQL
+
+        return '\n    UNION\n'.join(selects)
+
+    def sync_sql(self, cls, scope=SCOPE_IDS, result=SYNC_CHANGES_SQL):
+        return SYNC_CACHE_SQL.format(
+            scope=self.scope_sql(cls, scope),
+            expected=self.expected_cases_sql(cls),
+            cache_table=self.cache_edges[cls].__tablename__,
+            empty_columns=EMPTY_EDGE_COLUMNS_SQL,
+            result=result,
+        )
+
+    def diff_sql(self, cls, scope=SCOPE_IDS):
+        return DIFF_CACHE_SQL.format(
+            scope=self.scope_sql(cls, scope),
+            expected=self.expected_cases_sql(cls),
+            cache_table=self.cache_edges[cls].__tablename__,
+        )
+
+    def children_sql(self, edge):
+        return CHILDREN_SQL.format(edge_table=edge.__tablename__)
+
+
+_graphs = {}
+
+
+def get_case_cache_graph(node_cls):
+    """Returns the (memoized) :class:`CaseCacheGraph` for node_cls"""
+
+    graph = _graphs.get(node_cls)
+    edge_count = len(node_cls.get_edge_class().get_subclasses())
+    if graph is None or graph.edge_count != edge_count:
+        graph = _graphs[node_cls] = CaseCacheGraph(node_cls)
+    return graph
+
+
+def sync_related_cases(session, graph, cls, ids):
+    """Make the shortcut edges of nodes of class :param:`cls` with the
+    given ids match the shortcut edges of their parents
+
+    :returns: list of ``(src_id, dst_id, added)`` changes
+
+    """
+
+    if cls not in graph.cache_edges or not ids:
+        return []
+
+    rows = session.execute(text(graph.sync_sql(cls)), {'ids': list(ids)})
+    return [(row.src_id, row.dst_id, row.added) for row in rows]
+
+
+def diff_related_cases(session, graph, cls, ids):
+    """Compare the shortcut edges of nodes of class :param:`cls` with the
+    given ids to the ones they should have without changing them
+
+    :returns: list of ``(src_id, dst_id, missing)`` where missing is
+        True for an absent edge and False for a stale one
+
+    """
+
+    if cls not in graph.cache_edges or not ids:
+        return []
+
+    rows = session.execute(text(graph.diff_sql(cls)), {'ids': list(ids)})
+    return [(row.src_id, row.dst_id, row.missing) for row in rows]
+
+
+def get_children(session, graph, cls, ids):
+    """Returns a map of child class -> ids of the nodes with an edge to
+    a node of class :param:`cls` with one of the given ids
+
+    """
+
+    children = defaultdict(set)
+    for edge, child in graph.child_edges[cls]:
+        if child not in graph.cache_edges:
+            continue
+        rows = session.execute(
+            text(graph.children_sql(edge)), {'ids': list(ids)})
+        children[child].update(row.src_id for row in rows)
+    return children
+
+
+def update_related_cases(session, graph, pending):
+    """Recompute the shortcut edges of the given nodes and propagate
+    any change to their descendants, one class at a time in order of
+    distance from case.
+
+    :param pending: map of node class -> ids of nodes to update
+    :returns: map of node class -> list of ``(src_id, dst_id, added)``
+
+    """
+
+    pending = defaultdict(set, {
+        cls: set(ids) for cls, ids in pending.items() if ids
+    })
+    changes = defaultdict(list)
+    statements = 0
+
+    while pending:
+        cls = min(pending, key=graph.get_level)
+        ids = pending.pop(cls)
+
+        statements += 1
+        if statements > MAX_SYNC_STATEMENTS:
+            raise RuntimeError(
+                'Related case cache update did not converge after {} '
+                'statements'.format(MAX_SYNC_STATEMENTS))
+
+        changed = sync_related_cases(session, graph, cls, ids)
+        if not changed:
+            continue
+
+        logger.debug('Updated %d %s case cache edges', len(changed), cls.label)
+        changes[cls].extend(changed)
+
+        changed_ids = {src_id for src_id, _, _ in changed}
+        for child, child_ids in get_children(session, graph, cls, changed_ids).items():
+            pending[child].update(child_ids)
+
+    return changes
+
+
+def refresh_session_state(session, graph, changes):
+    """Bring objects in the session's identity map in line with cache
+    edges that were changed with SQL: deleted edges are expunged and
+    the shortcut relationships of affected nodes and cases are expired.
+
+    """
+
+    for cls, changed in changes.items():
+        cache_edge = graph.cache_edges[cls]
+        relationship_out = '_{}_out'.format(cache_edge.__name__)
+        relationship_in = '_{}_in'.format(cache_edge.__name__)
+
+        for src_id, dst_id, added in changed:
+            if not added:
+                edge = session.identity_map.get(
+                    identity_key(cache_edge, (src_id, dst_id)))
+                if edge is not None:
+                    session.expunge(edge)
+
+            node = session.identity_map.get(identity_key(cls, src_id))
+            if node is not None:
+                session.expire(node, [relationship_out])
+
+            case = session.identity_map.get(
+                identity_key(graph.case_cls, dst_id))
+            if case is not None:
+                session.expire(case, [relationship_in])
+
+
+def get_rebuild_scope(project_ids=None, case_ids=None):
+    """Returns the scope and statement parameters of a rebuild
+
+    :param project_ids: Only rebuild nodes of these projects
+    :param case_ids: Only rebuild nodes related to these cases
+
+    """
+
+    if project_ids and case_ids:
+        raise ValueError('A rebuild can be scoped to projects or cases, not both')
+
+    if project_ids:
+        return SCOPE_PROJECTS, {'project_ids': list(project_ids)}
+    if case_ids:
+        return SCOPE_CASES, {'case_ids': list(case_ids)}
+    return SCOPE_CLASS, {}
+
+
+def rebuild_class(engine, graph, cls, scope, params):
+    """Rebuild the shortcut edges of one class in its own transaction
+
+    :returns: :class:`RebuildResult`
+
+    """
+
+    start = time.time()
+    statement = text(graph.sync_sql(cls, scope, SYNC_COUNTS_SQL))
+    with engine.begin() as connection:
+        row = connection.execute(statement, params).first()
+
+    result = RebuildResult(
+        cls.label, graph.get_level(cls), row.deleted, row.inserted,
+        time.time() - start)
+    logger.info('Rebuilt %s case cache: %d deleted, %d inserted in %.2fs',
+                cls.label, row.deleted, row.inserted, result.seconds)
+    return result
+
+
+def rebuild_cyclic_classes(engine, graph, classes, scope, params):
+    """Rebuild classes that (transitively) are their own parents until a
+    pass over all of them changes nothing
+
+    """
+
+    totals = {cls: RebuildResult(cls.label, graph.get_level(cls), 0, 0, 0.0)
+              for cls in classes}
+
+    for _ in range(MAX_SYNC_STATEMENTS // max(len(classes), 1)):
+        changed = False
+        for cls in classes:
+            result = rebuild_class(engine, graph, cls, scope, params)
+            total = totals[cls]
+            totals[cls] = total._replace(
+                deleted=total.deleted + result.deleted,
+                inserted=total.inserted + result.inserted,
+                seconds=total.seconds + result.seconds,
+            )
+            changed = changed or result.deleted or result.inserted
+        if not changed:
+            return [totals[cls] for cls in classes]
+
+    raise RuntimeError(
+        'Related case cache rebuild of {} did not converge'
+        .format(', '.join(cls.label for cls in classes)))
+
+
+def rebuild_related_cases(engine, node_cls, project_ids=None,
+                          case_ids=None, workers=4):
+    """Server-side rebuild of the related case cache.
+
+    Level by level outward from case, insert missing and delete stale
+    shortcut edges of every class.  Classes within a level don't depend
+    on each other and are rebuilt concurrently on separate connections,
+    each class is committed on its own.
+
+    :param engine: SQLAlchemy engine, its pool should allow
+        :param:`workers` connections
+    :param node_cls: The abstract Node class of the graph
+    :param project_ids: Only rebuild nodes of these projects
+    :param case_ids: Only rebuild nodes related to these cases
+    :param workers: Number of classes to rebuild concurrently
+    :returns: list of :class:`RebuildResult`
+
+    """
+
+    graph = get_case_cache_graph(node_cls)
+    scope, params = get_rebuild_scope(project_ids, case_ids)
+    results = []
+
+    for level, classes in graph.get_classes_by_level():
+        start = time.time()
+        independent = [cls for cls in classes if not graph.is_cyclic(cls)]
+        cyclic = [cls for cls in classes if graph.is_cyclic(cls)]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(rebuild_class, engine, graph, cls, scope, params)
+                for cls in independent
+            ]
+            results.extend(future.result() for future in futures)
+
+        if cyclic:
+            results.extend(
+                rebuild_cyclic_classes(engine, graph, cyclic, scope, params))
+
+        logger.info('Rebuilt case cache level %d (%d classes) in %.2fs',
+                    level, len(classes), time.time() - start)
+
+    return results
+
+
+def get_expected_table(cls):
+    return 'expected_{}'.format(cls.__tablename__)
+
+
+def create_expected_tables(connection, graph):
+    """Fill a temporary table per class with the shortcut edges derived
+    from the real edges only, so drift in a parent's cache does not
+    hide drift in its children.  Must run inside a transaction.
+
+    """
+
+    for cls in graph.cache_edges:
+        connection.execute(text(EXPECTED_TABLE_SQL.format(
+            expected_table=get_expected_table(cls))))
+
+    def fill(cls):
+        inserted = 0
+        for edge, parent in graph.parent_edges[cls]:
+            if parent is graph.case_cls:
+                statement = EXPECTED_DIRECT_SQL.format(
+                    expected_table=get_expected_table(cls),
+                    edge_table=edge.__tablename__)
+            elif parent in graph.cache_edges:
+                statement = EXPECTED_PARENT_SQL.format(
+                    expected_table=get_expected_table(cls),
+                    edge_table=edge.__tablename__,
+                    parent_expected_table=get_expected_table(parent))
+            else:
+                continue
+            inserted += connection.execute(text(statement)).rowcount
+        return inserted
+
+    for _, classes in graph.get_classes_by_level():
+        cyclic = [cls for cls in classes if graph.is_cyclic(cls)]
+        for cls in classes:
+            if cls not in cyclic:
+                fill(cls)
+
+        for _ in range(MAX_SYNC_STATEMENTS):
+            if not sum(fill(cls) for cls in cyclic):
+                break
+
+
+def iter_unmatched(connection, label, table, other_table, missing, page_size):
+    """Yield pages of :class:`Discrepancy` for rows of table that are
+    not in other_table
+
+    """
+
+    statement = text(UNMATCHED_PAGE_SQL.format(
+        table=table, other_table=other_table))
+    src_id, dst_id = '', ''
+
+    while True:
+        rows = connection.execute(statement, {
+            'src_id': src_id,
+            'dst_id': dst_id,
+            'limit': page_size,
+        }).fetchall()
+
+        if not rows:
+            return
+
+        yield [
+            Discrepancy(label, row.src_id, row.dst_id, missing)
+            for row in rows
+        ]
+
+        src_id, dst_id = rows[-1].src_id, rows[-1].dst_id
+
+
+def verify_related_cases(engine, node_cls, page_size=VERIFY_PAGE_SIZE):
+    """Compare the shortcut edges of every class with the ones derived
+    from the real edges.
+
+    Runs in a single REPEATABLE READ transaction that is held open
+    while the generator is consumed.  The transaction only writes the
+    temporary tables holding the expected shortcut edges and is rolled
+    back at the end.
+
+    :param engine: SQLAlchemy engine
+    :param node_cls: The abstract Node class of the graph
+    :param page_size: Maximum number of discrepancies per page
+    :returns: generator of pages (lists) of :class:`Discrepancy`
+
+    """
+
+    graph = get_case_cache_graph(node_cls)
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+            start = time.time()
+            create_expected_tables(connection, graph)
+            logger.info('Computed expected case cache in %.2fs',
+                        time.time() - start)
+
+            for _, classes in graph.get_classes_by_level():
+                for cls in classes:
+                    expected = get_expected_table(cls)
+                    cache_table = graph.cache_edges[cls].__tablename__
+                    for page in iter_unmatched(
+                            connection, cls.label, expected, cache_table,
+                            True, page_size):
+                        yield page
+                    for page in iter_unmatched(
+                            connection, cls.label, cache_table, expected,
+                            False, page_size):
+                        yield page
+        finally:
+            transaction.rollback()
+
+
+def get_repair_statements(graph, discrepancies):
+    """Returns the minimal ``(statement, params)`` batch to repair the
+    given discrepancies: one delete and/or one insert per class
+
+    """
+
+    classes = {cls.label: cls for cls in graph.cache_edges}
+    changes = defaultdict(lambda: ([], []))
+    for discrepancy in discrepancies:
+        changes[(discrepancy.label, discrepancy.missing)][0].append(
+            discrepancy.src_id)
+        changes[(discrepancy.label, discrepancy.missing)][1].append(
+            discrepancy.dst_id)
+
+    statements = []
+    for (label, missing), (src_ids, dst_ids) in sorted(changes.items()):
+        template = REPAIR_INSERT_SQL if missing else REPAIR_DELETE_SQL
+        statements.append((template.format(
+            cache_table=graph.cache_edges[classes[label]].__tablename__,
+            empty_columns=EMPTY_EDGE_COLUMNS_SQL,
+        ), {'src_ids': src_ids, 'dst_ids': dst_ids}))
+
+    return statements
+
+
+def quote_text_array(values):
+    return 'ARRAY[{}]::TEXT[]'.format(', '.join(
+        "'{}'".format(value.replace("'", "''")) for value in values))
+
+
+def render_repair_sql(graph, discrepancies):
+    """Returns the repair batch for the given discrepancies as a SQL
+    script that can be reviewed and applied with psql
+
+    """
+
+    statements = []
+    for statement, params in get_repair_statements(graph, discrepancies):
+        statement = statement.replace(
+            'CAST(:src_ids AS TEXT[])', quote_text_array(params['src_ids'])
+        ).replace(
+            'CAST(:dst_ids AS TEXT[])', quote_text_array(params['dst_ids']))
+        statements.append(statement.strip() + ';')
+
+    return '\n'.join(['BEGIN;'] + statements + ['COMMIT;']) + '\n'
+
+
+def repair_related_cases(engine, node_cls, discrepancies):
+    """Apply the repair batch for the given discrepancies in one
+    transaction
+
+    """
+
+    graph = get_case_cache_graph(node_cls)
+    with engine.begin() as connection:
+        for statement, params in get_repair_statements(graph, discrepancies):
+            connection.execute(text(statement), params)
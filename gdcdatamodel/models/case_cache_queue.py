@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.models.case_cache_queue
+----------------------------------
+
+Queue of nodes whose related case cache is out of date.
+
+In the ``deferred`` related case cache mode (see
+:mod:`gdcdatamodel.models.caching`) a flush does not touch the
+``_related_cases`` shortcut edges, it only records the source nodes of
+the changed edges in the ``related_cases_queue`` table.  A worker
+(``bin/drain_related_cases_queue.py``) drains the queue and rebuilds
+the shortcut edges in bulk with
+:func:`gdcdatamodel.models.case_cache.update_related_cases`.
+
+Drains are serialized with a transaction level advisory lock.  A child
+rebuilt by one worker while another worker is still updating its
+parent would otherwise be rebuilt from the parent's stale cache and
+dropped from the queue.
+
+"""
+
+import logging
+import time
+
+from collections import defaultdict
+
+from sqlalchemy import Column, DateTime, Text, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declarative_base
+
+from gdcdatamodel.models import case_cache
+
+logger = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+
+#: Key of the advisory lock held by a drain transaction
+DRAIN_LOCK_KEY = 0x52435144
+
+#: Attempts to enqueue nodes that concurrent transactions are queuing
+ENQUEUE_ATTEMPTS = 3
+
+ENQUEUE_SQL = """
+INSERT INTO related_cases_queue (node_id, label)
+SELECT DISTINCT ON (queued.node_id) queued.node_id, queued.label
+FROM unnest(CAST(:node_ids AS TEXT[]), CAST(:labels AS TEXT[]))
+     AS queued(node_id, label)
+WHERE NOT EXISTS (
+      SELECT 1 FROM related_cases_queue existing
+      WHERE existing.node_id = queued.node_id)
+"""
+
+DRAIN_LOCK_SQL = """
+SELECT pg_advisory_xact_lock(:key)
+"""
+
+DEQUEUE_SQL = """
+DELETE FROM related_cases_queue
+WHERE node_id IN (
+    SELECT node_id FROM related_cases_queue
+    ORDER BY created
+    LIMIT :limit
+    FOR UPDATE
+)
+RETURNING node_id, label
+"""
+
+
+class RelatedCasesQueueEntry(Base):
+
+    __tablename__ = 'related_cases_queue'
+
+    def __repr__(self):
+        return ("<RelatedCasesQueueEntry(node_id='{}', label='{}')>"
+                .format(self.node_id, self.label))
+
+    node_id = Column(
+        Text,
+        primary_key=True,
+        nullable=False,
+    )
+
+    label = Column(
+        Text,
+        nullable=False,
+    )
+
+    created = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=text('now()'),
+        index=True,
+    )
+
+
+def enqueue(session, nodes):
+    """Add nodes to the queue, nodes already queued are skipped
+
+    :param nodes: map of node class -> ids of nodes to queue
+
+    """
+
+    node_ids, labels = [], []
+    for cls, ids in nodes.items():
+        node_ids.extend(ids)
+        labels.extend([cls.label] * len(ids))
+
+    if not node_ids:
+        return
+
+    # A node queued by a concurrent transaction violates the primary
+    # key once that transaction commits, retry in a savepoint to skip it
+    connection = session.connection()
+    for attempt in range(ENQUEUE_ATTEMPTS):
+        savepoint = connection.begin_nested()
+        try:
+            connection.execute(text(ENQUEUE_SQL), {
+                'node_ids': node_ids,
+                'labels': labels,
+            })
+        except IntegrityError:
+            savepoint.rollback()
+            if attempt + 1 == ENQUEUE_ATTEMPTS:
+                raise
+            logger.debug('Retrying enqueue of %d nodes', len(node_ids))
+        else:
+            savepoint.commit()
+            return
+
+
+def dequeue(session, node_cls, limit):
+    """Remove up to :param:`limit` nodes from the queue.  Waits for any
+    concurrent drain transaction to finish first.
+
+    :returns: map of node class -> ids of dequeued nodes
+
+    """
+
+    session.execute(text(DRAIN_LOCK_SQL), {'key': DRAIN_LOCK_KEY})
+    rows = session.execute(text(DEQUEUE_SQL), {'limit': limit})
+
+    nodes = defaultdict(set)
+    for row in rows:
+        nodes[node_cls.get_subclass(row.label)].add(row.node_id)
+    return nodes
+
+
+def get_queue_size(session):
+    return session.query(RelatedCasesQueueEntry).count()
+
+
+def drain(driver, node_cls, batch_size=1000):
+    """Rebuild the related case cache of queued nodes until the queue is
+    empty.  Each batch is committed in its own transaction, concurrent
+    drains take turns.
+
+    :param driver: PsqlGraphDriver
+    :param node_cls: The abstract Node class of the graph
+    :returns: number of nodes dequeued
+
+    """
+
+    total = 0
+
+    while True:
+        with driver.session_scope() as session:
+            nodes = dequeue(session, node_cls, batch_size)
+            if not nodes:
+                break
+
+            graph = case_cache.get_case_cache_graph(node_cls)
+            changes = case_cache.update_related_cases(session, graph, nodes)
+
+        count = sum(len(ids) for ids in nodes.values())
+        total += count
+        logger.info('Rebuilt related cases of %d queued nodes (%d edges changed)',
+                    count, sum(len(c) for c in changes.values()))
+
+    return total
+
+
+def wait_until_empty(driver, timeout=None, poll_interval=1.0):
+    """Block until every queued node has been processed
+
+    :param timeout: Seconds to wait, None to wait forever
+    :returns: True if the queue is empty, False on timeout
+
+    """
+
+    start = time.time()
+
+    while True:
+        with driver.session_scope() as session:
+            if not get_queue_size(session):
+                return True
+
+        if timeout is not None and time.time() - start >= timeout:
+            return False
+
+        time.sleep(poll_interval)
+
+
+def verify(session, node_cls, nodes):
+    """Check the related case cache of the given nodes.  Queued nodes
+    are reported as inconsistent as well.
+
+    :param nodes: map of node class -> ids of nodes to check
+    :returns: map of node class -> list of ``(src_id, dst_id, missing)``
+        where missing is True for an absent shortcut edge and False for
+        a stale one, and the list of queued node ids
+
+    """
+
+    graph = case_cache.get_case_cache_graph(node_cls)
+
+    diffs = {}
+    for cls, ids in nodes.items():
+        diff = case_cache.diff_related_cases(session, graph, cls, ids)
+        if diff:
+            diffs[cls] = diff
+
+    ids = [node_id for ids in nodes.values() for node_id in ids]
+    queued = [
+        entry.node_id for entry in
+        session.query(RelatedCasesQueueEntry)
+        .filter(RelatedCasesQueueEntry.node_id.in_(ids))
+    ] if ids else []
+
+    return diffs, queued
@@ -13,7 +13,7 @@ query patterns (e.g. secondary_keys).
 
 import logging
 
-from sqlalchemy import Index, func
+from sqlalchemy import Index, func, or_
 import hashlib
 
 from gdcdatamodel.models.utils import py3_to_bytes
@@ -53,6 +53,34 @@ def index_name(cls, description):
     return name
 
 
+def detached(indexes):
+    """Returns indexes without attaching them to their table.  An Index
+    on a table's columns adds itself to ``table.indexes`` on creation,
+    which would declare it for ``create_all`` and friends.
+
+    """
+
+    indexes = tuple(indexes)
+    for index in indexes:
+        if index.table is not None:
+            index.table.indexes.discard(index)
+    return indexes
+
+
+def create_index_concurrently(connection, index):
+    """Build an index with ``CREATE INDEX CONCURRENTLY``.  The
+    connection must be in autocommit mode.
+
+    """
+
+    logger.info('Creating %s', index.name)
+    index.dialect_kwargs['postgresql_concurrently'] = True
+    try:
+        index.create(connection)
+    finally:
+        del index.dialect_kwargs['postgresql_concurrently']
+
+
 def get_secondary_key_indexes(cls):
     """Returns tuple of indexes on the secondary keys on the class
 
@@ -61,6 +89,8 @@ def get_secondary_key_indexes(cls):
     - cls._props[key].astext
     - lower(cls._props[key].astext)
 
+    The indexes are not attached to the table, see :func:`cls_add_indexes`
+
     """
 
     #: use text_pattern_ops, allows LIKE statements not starting with %
@@ -83,7 +113,59 @@ def get_secondary_key_indexes(cls):
         ) for key in secondary_keys
     )
 
-    return tuple(key_indexes) + tuple(lower_key_indexes)
+    return detached(tuple(key_indexes) + tuple(lower_key_indexes))
+
+
+#: Node states left out of partial unique key indexes
+PARTIAL_INDEX_EXCLUDED_STATES = ('deleted', 'legacy')
+
+
+def get_unique_key_tuples(cls):
+    """Returns the secondary key tuples with more than one key"""
+
+    return [keys for keys in cls.__pg_secondary_keys if len(keys) > 1]
+
+
+def get_unique_key_indexes(cls):
+    """Returns a composite index per multi-key secondary key tuple, e.g.
+    ``(_props->>'project_id', _props->>'submitter_id')``
+
+    ..note:: THIS MUST BE CALLED AFTER `cls_inject_secondary_keys()`
+
+    The indexes are not attached to the table, see :func:`cls_add_indexes`
+
+    """
+
+    return detached(
+        Index(
+            index_name(cls, 'uk_' + '_'.join(keys)),
+            *[cls._props[key].astext.label(key) for key in keys]
+        ) for keys in get_unique_key_tuples(cls)
+    )
+
+
+def get_partial_unique_key_indexes(cls,
+                                   excluded_states=PARTIAL_INDEX_EXCLUDED_STATES):
+    """Returns the composite indexes of :func:`get_unique_key_indexes`
+    restricted to nodes not in one of excluded_states.  These are not
+    declared on the model, queries must repeat the predicate to use
+    them.
+
+    """
+
+    if 'state' not in cls.__pg_properties__:
+        return ()
+
+    state = cls._props['state'].astext
+    predicate = or_(state.is_(None), state.notin_(excluded_states))
+
+    return detached(
+        Index(
+            index_name(cls, 'puk_' + '_'.join(keys)),
+            *[cls._props[key].astext.label(key) for key in keys],
+            postgresql_where=predicate
+        ) for keys in get_unique_key_tuples(cls)
+    )
 
 
 def cls_add_indexes(cls, indexes):
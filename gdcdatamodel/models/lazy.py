@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.models.lazy
+----------------------------------
+
+Opt-in lazy creation of the Node and Edge subclasses.
+
+In lazy mode :func:`gdcdatamodel.models.load_dictionary` only resolves
+the node and edge specs (see :mod:`gdcdatamodel.models.snapshot`).  A
+Node subclass, the node classes it links to and every edge class
+between them are created the first time the class is looked up through
+``models.<ClassName>`` or ``Node.get_subclass(label)`` /
+``Node.get_subclass_named(name)``.  Mappers are not configured at load
+time, SQLAlchemy configures them when a class is first used.
+
+::WARNING:: Polymorphic queries against the abstract ``Node``/``Edge``
+classes (e.g. ``g.nodes()``) only cover the classes that were created
+before mappers were first configured.  Call
+:meth:`LazyLoader.materialize_all` before relying on them.
+
+"""
+
+import logging
+import sys
+
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+
+def get_edge_name(edge_out):
+    """Returns the edge class name from a ``_<EdgeName>_out`` link
+    relationship name
+
+    """
+
+    return edge_out[1:-len('_out')]
+
+
+class LazyLoader(object):
+    """Creates Node/Edge subclasses from snapshot specs on demand"""
+
+    def __init__(self, snapshot, node_cls, edge_cls, package_namespace=None):
+        from gdcdatamodel import models
+
+        self.node_cls = node_cls
+        self.edge_cls = edge_cls
+        self.package_namespace = package_namespace
+
+        self.node_specs = {spec['id']: spec for spec in snapshot['nodes']}
+        self.labels = {
+            models.get_class_name_from_id(label): label
+            for label in self.node_specs
+        }
+
+        # label -> specs of all edges to or from nodes with that label
+        self.edge_specs = {label: [] for label in self.node_specs}
+        self.edge_labels = {}
+        for spec in snapshot['edges']:
+            self.edge_specs[spec['src_label']].append(spec)
+            self.edge_specs[spec['dst_label']].append(spec)
+            self.edge_labels[spec['name']] = spec['src_label']
+
+        #: Labels whose class and incident edges have been created
+        self.materialized = set()
+
+        #: Set while creating classes so the factories' own class
+        #: lookups don't trigger further materialization
+        self.busy = False
+
+    def get_class(self, label):
+        """Returns the class for label if it has been created"""
+
+        for cls in self.node_cls.get_subclasses():
+            if cls.get_label() == label:
+                return cls
+        return None
+
+    def create_node_class(self, label):
+        """Creates the Node subclass without any of its edges"""
+
+        from gdcdatamodel import models
+
+        cls = self.get_class(label)
+        if cls:
+            return cls
+
+        cls = models.NodeFactory(
+            label,
+            self.node_specs[label]['schema'],
+            self.node_cls,
+            self.package_namespace,
+        )
+        models.register_class(cls, self.package_namespace)
+        return cls
+
+    def materialize(self, label):
+        """Create the Node subclass for label, the classes of its
+        neighbors and all edge classes to and from it.
+
+        :returns: the Node subclass
+
+        """
+
+        from gdcdatamodel import models
+
+        if label in self.materialized:
+            return self.get_class(label)
+
+        logger.debug('Materializing %s', label)
+        self.busy = True
+        try:
+            cls = self.create_node_class(label)
+
+            for spec in self.edge_specs[label]:
+                self.create_node_class(spec['src_label'])
+                self.create_node_class(spec['dst_label'])
+                if self.edge_cls.is_subclass_loaded(spec['name']):
+                    continue
+                models.EdgeFactory(
+                    spec['name'],
+                    spec['label'],
+                    spec['src_label'],
+                    spec['dst_label'],
+                    spec['src_dst_assoc'],
+                    spec['dst_src_assoc'],
+                    node_cls=self.node_cls,
+                    edge_cls=self.edge_cls,
+                    package_namespace=self.package_namespace,
+                    tablename=spec['tablename'],
+                )
+
+            self.materialized.add(label)
+            self.inject_links()
+        finally:
+            self.busy = False
+
+        return cls
+
+    def materialize_named(self, name):
+        """Create the Node or Edge subclass named name (and everything
+        :meth:`materialize` creates along with it).
+
+        :returns: the class or None if there is no such class
+
+        """
+
+        if name in self.labels:
+            return self.materialize(self.labels[name])
+
+        if name in self.edge_labels:
+            self.materialize(self.edge_labels[name])
+            for cls in self.edge_cls.get_subclasses():
+                if cls.__name__ == name:
+                    return cls
+
+        return None
+
+    def materialize_all(self):
+        for label in self.node_specs:
+            self.materialize(label)
+
+    def inject_links(self):
+        """Refresh ``_pg_links``, ``_pg_backrefs`` and ``_pg_edges`` of
+        the created classes to include every edge that exists so far.
+
+        """
+
+        from gdcdatamodel import models
+
+        classes = {
+            cls.get_label(): cls for cls in self.node_cls.get_subclasses()
+        }
+
+        def edge_exists(edge_out):
+            return self.edge_cls.is_subclass_loaded(get_edge_name(edge_out))
+
+        for label, cls in classes.items():
+            spec = self.node_specs[label]
+            for name, link in spec['links'].items():
+                if link['dst_type'] in classes and edge_exists(link['edge_out']):
+                    cls._pg_links[name] = {
+                        'edge_out': link['edge_out'],
+                        'dst_type': classes[link['dst_type']],
+                    }
+            for name, backref in spec['backrefs'].items():
+                src_type = backref['src_type']
+                if src_type not in classes:
+                    continue
+                src_link = self.node_specs[src_type]['links'][backref['name']]
+                if edge_exists(src_link['edge_out']):
+                    cls._pg_backrefs[name] = {
+                        'name': backref['name'],
+                        'src_type': classes[src_type],
+                    }
+
+        models.inject_pg_edges(self.node_cls)
+
+
+def cls_inject_lazy_lookups(node_cls, loader):
+    """Wrap ``get_subclass`` and ``get_subclass_named`` on the abstract
+    node class to materialize classes known to :param:`loader`
+
+    """
+
+    get_subclass = node_cls.get_subclass.__func__
+    get_subclass_named = node_cls.get_subclass_named.__func__
+
+    def lazy_get_subclass(cls, label):
+        if label in loader.node_specs and not loader.busy:
+            return loader.materialize(label)
+        return get_subclass(cls, label)
+
+    def lazy_get_subclass_named(cls, name):
+        if name in loader.labels and not loader.busy:
+            return loader.materialize_named(name)
+        return get_subclass_named(cls, name)
+
+    node_cls.get_subclass = classmethod(lazy_get_subclass)
+    node_cls.get_subclass_named = classmethod(lazy_get_subclass_named)
+    node_cls._lazy_loader = loader
+
+
+class LazyModule(ModuleType):
+    """Stands in for a module in ``sys.modules``, resolving class names
+    it doesn't have through a :class:`LazyLoader`.  Everything else,
+    including setting attributes, goes to the wrapped module.
+
+    This has the effect of a PEP 562 module ``__getattr__`` on
+    interpreters older than Python 3.7.
+
+    """
+
+    def __init__(self, module, loader):
+        ModuleType.__init__(self, module.__name__, module.__doc__)
+        self.__dict__['_lazy_module'] = module
+        self.__dict__['_lazy_loader'] = loader
+
+    def __getattr__(self, name):
+        module = self.__dict__['_lazy_module']
+        try:
+            return getattr(module, name)
+        except AttributeError:
+            pass
+
+        cls = self.__dict__['_lazy_loader'].materialize_named(name)
+        if cls is None:
+            raise AttributeError(name)
+        return cls
+
+    def __setattr__(self, name, value):
+        setattr(self.__dict__['_lazy_module'], name, value)
+
+    def __delattr__(self, name):
+        delattr(self.__dict__['_lazy_module'], name)
+
+    def __dir__(self):
+        return dir(self.__dict__['_lazy_module'])
+
+
+def install_lazy_module(name, loader):
+    """Replace module :param:`name` with a :class:`LazyModule` in
+    ``sys.modules`` and on its parent package
+
+    :returns: the :class:`LazyModule`
+
+    """
+
+    module = sys.modules[name]
+    if isinstance(module, LazyModule):
+        module = module.__dict__['_lazy_module']
+
+    proxy = LazyModule(module, loader)
+    sys.modules[name] = proxy
+
+    parent, _, child = name.rpartition('.')
+    if parent in sys.modules:
+        setattr(sys.modules[parent], child, proxy)
+
+    return proxy
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.models.link_rules
+----------------------------------
+
+Flat per-label tables of the rules in the dictionary's ``links``.
+
+A schema's ``links`` mixes single links and (possibly nested)
+``subgroup`` entries.  :func:`get_link_rules` interprets them once per
+label into a :class:`LinkRules` holding every link as a
+:class:`LinkRule` and every subgroup as a :class:`LinkGroup`, which the
+link validators consume directly.  Tables are built for every label at
+:func:`gdcdatamodel.models.load_dictionary` and rebuilt if a schema's
+``links`` are replaced.
+
+"""
+
+import logging
+
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+LinkRule = namedtuple('LinkRule', [
+    'name',
+    'backref',
+    'label',
+    'multiplicity',
+    'required',
+    'target_type',
+    'link',
+])
+
+LinkGroup = namedtuple('LinkGroup', [
+    'names',
+    'required',
+    'exclusive',
+    'rules',
+])
+
+#: Multiplicities that limit the number of sources linked to a target
+ONE_TO = ('one_to_one', 'one_to_many')
+
+#: Multiplicities that limit the number of targets linked from a source
+TO_ONE = ('many_to_one', 'one_to_one')
+
+
+def get_rule(link):
+    return LinkRule(
+        name=link['name'],
+        backref=link.get('backref'),
+        label=link.get('label'),
+        multiplicity=link.get('multiplicity'),
+        required=link.get('required') is True,
+        target_type=link.get('target_type'),
+        link=link,
+    )
+
+
+def iter_group_rules(entry):
+    """Yields the rules of a subgroup, flattening nested subgroups"""
+
+    for link in entry['subgroup']:
+        if 'subgroup' in link:
+            for rule in iter_group_rules(link):
+                yield rule
+        elif 'name' in link:
+            yield get_rule(link)
+
+
+class LinkRules(object):
+    """The link rules of one label
+
+    :param links: the ``links`` of the label's schema
+
+    """
+
+    def __init__(self, label, links):
+        self.label = label
+        self.source = links
+
+        #: Links outside of any subgroup
+        self.rules = []
+
+        #: Subgroups of links
+        self.groups = []
+
+        #: Links and subgroups in schema order
+        self.entries = []
+
+        #: Every link by name, including the ones in subgroups, in
+        #: schema order
+        self.by_name = OrderedDict()
+
+        for entry in links or []:
+            if 'subgroup' in entry:
+                rules = tuple(iter_group_rules(entry))
+                group = LinkGroup(
+                    names=tuple(rule.name for rule in rules),
+                    required=entry.get('required') is True,
+                    exclusive=entry.get('exclusive') is True,
+                    rules=rules,
+                )
+                self.groups.append(group)
+                self.entries.append(group)
+            elif 'name' in entry:
+                rules = (get_rule(entry),)
+                self.rules.extend(rules)
+                self.entries.extend(rules)
+            else:
+                rules = ()
+            for rule in rules:
+                self.by_name[rule.name] = rule
+
+
+#: label -> LinkRules
+_link_rules = {}
+
+
+def get_link_rules(schema):
+    """Returns the :class:`LinkRules` of a schema, building them if the
+    schema's ``links`` changed since they were last built
+
+    """
+
+    links = schema.get('links')
+    rules = _link_rules.get(schema['id'])
+    if rules is None or rules.source is not links:
+        rules = LinkRules(schema['id'], links)
+        _link_rules[schema['id']] = rules
+    return rules
+
+
+def load_link_rules(dictionary):
+    """Build the link rules of every label of a dictionary"""
+
+    for schema in dictionary.schema.values():
+        get_link_rules(schema)
+    logger.debug('Built link rules of %d labels', len(dictionary.schema))
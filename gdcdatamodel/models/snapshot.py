@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.models.snapshot
+----------------------------------
+
+Build-time snapshots of the resolved dictionary schema.
+
+Loading the models normally requires importing gdcdictionary (which
+parses and resolves every YAML schema) and re-deriving class names,
+edge tablenames, link/backref maps, property types and secondary keys
+from the raw schemas.  A snapshot is a plain JSON document holding the
+result of that resolution so :func:`gdcdatamodel.models.load_dictionary`
+can create the ORM classes directly from it.
+
+A snapshot is keyed by the gdcdictionary and gdcdatamodel versions it
+was built with and is ignored (with a warning) if either differs from
+the installed version or the installed versions can't be determined.
+
+Build a snapshot with::
+
+    python -m gdcdatamodel.models.snapshot -o models_snapshot.json
+
+and point ``$GDC_MODELS_SNAPSHOT`` at it.
+
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    try:
+        import importlib_metadata
+    except ImportError:
+        importlib_metadata = None
+
+logger = logging.getLogger(__name__)
+
+#: Bump this when the layout of the snapshot document changes
+SNAPSHOT_FORMAT = 1
+
+#: Environment variable pointing to the snapshot to load models from
+SNAPSHOT_ENV_VAR = 'GDC_MODELS_SNAPSHOT'
+
+
+def get_distribution_version(name):
+    """Returns the installed version of a distribution or None without
+    importing it.
+
+    """
+
+    if importlib_metadata is None:
+        return None
+
+    try:
+        return importlib_metadata.version(name)
+    except Exception:
+        return None
+
+
+def get_snapshot_key(dictionary_version=None):
+    """Returns the key identifying the versions a snapshot is valid for
+
+    :param dictionary_version:
+        Version of the dictionary, defaults to the installed
+        gdcdictionary version
+
+    """
+
+    if dictionary_version is None:
+        dictionary_version = get_distribution_version('gdcdictionary')
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'gdcdictionary': dictionary_version,
+        'gdcdatamodel': get_distribution_version('gdcdatamodel'),
+    }
+
+
+def get_edge_spec(src_label, link, dictionary):
+    """Resolve a single link to the arguments of
+    :func:`gdcdatamodel.models.EdgeFactory`
+
+    """
+
+    from gdcdatamodel import models
+
+    dst_label = dictionary.schema[link['target_type']]['id']
+    name = ''.join(map(models.get_class_name_from_id, [
+        src_label, link['label'], dst_label]))
+    spec = {
+        'name': name,
+        'label': link['label'],
+        'src_label': src_label,
+        'dst_label': dst_label,
+        'src_dst_assoc': link['name'],
+        'dst_src_assoc': link['backref'],
+    }
+    spec['tablename'] = models.generate_edge_tablename(*map(
+        models.remove_spaces, [src_label, spec['label'], dst_label]))
+
+    return spec
+
+
+def build_snapshot(dictionary, dictionary_version=None):
+    """Resolve all node and edge specs from a dictionary.
+
+    :returns: a JSON serializable ``dict``
+
+    """
+
+    from gdcdatamodel import models
+
+    nodes = {}
+    edges = []
+
+    for label, schema in dictionary.schema.items():
+        nodes[label] = {
+            'id': schema['id'],
+            'schema': models.get_resolved_schema(schema),
+            'links': {},
+            'backrefs': {},
+        }
+
+    for label, schema in dictionary.schema.items():
+        for name, link in models.get_links(schema).items():
+            if link['target_type'] not in dictionary.schema:
+                raise RuntimeError(
+                    "Destination '{}' for edge '{}' from '{}' not defined"
+                    .format(link['target_type'], name, label))
+
+            spec = get_edge_spec(schema['id'], link, dictionary)
+            edges.append(spec)
+            nodes[label]['links'][link['name']] = {
+                'edge_out': '_{}_out'.format(spec['name']),
+                'dst_type': spec['dst_label'],
+            }
+            nodes[link['target_type']]['backrefs'][link['backref']] = {
+                'name': link['name'],
+                'src_type': label,
+            }
+
+    for label, schema in dictionary.schema.items():
+        if models.caches_related_cases(schema['id'], schema):
+            link = models.get_related_cases_link(schema['id'])
+            edges.append(get_edge_spec(schema['id'], link, dictionary))
+
+    return {
+        'key': get_snapshot_key(dictionary_version),
+        'nodes': list(nodes.values()),
+        'edges': edges,
+    }
+
+
+def to_native_strings(value):
+    """Returns :param:`value` with its ASCII strings converted to the
+    native ``str``, like the dictionary's YAML loader does on Python 2.
+    ``json`` returns ``unicode`` strings there, which ``type()`` rejects
+    as class names.
+
+    """
+
+    if sys.version_info[0] >= 3:
+        return value
+
+    if isinstance(value, dict):
+        return {
+            to_native_strings(k): to_native_strings(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [to_native_strings(v) for v in value]
+    if isinstance(value, unicode):  # noqa: F821
+        try:
+            return str(value)
+        except UnicodeEncodeError:
+            return value
+    return value
+
+
+def write_snapshot(snapshot, path):
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, sort_keys=True)
+
+
+def read_snapshot(path):
+    """Read a snapshot if it is usable with the installed versions
+
+    :returns: the snapshot ``dict`` or None
+
+    """
+
+    if not path:
+        return None
+
+    try:
+        with open(path) as f:
+            snapshot = to_native_strings(json.load(f))
+    except (IOError, OSError, ValueError) as e:
+        logger.warning('Unable to read models snapshot %s: %s', path, e)
+        return None
+
+    expected = get_snapshot_key()
+    if expected['gdcdictionary'] is None or expected['gdcdatamodel'] is None:
+        logger.warning(
+            'Ignoring models snapshot %s, unable to determine the '
+            'installed versions %s', path, expected)
+        return None
+
+    if snapshot.get('key') != expected:
+        logger.warning(
+            'Ignoring models snapshot %s built for %s, expected %s',
+            path, snapshot.get('key'), expected)
+        return None
+
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a snapshot of the resolved gdcdictionary schema')
+    parser.add_argument('-o', '--output', required=True,
+                        help='path to write the snapshot to')
+    args = parser.parse_args()
+
+    from gdcdictionary import gdcdictionary
+    write_snapshot(build_snapshot(gdcdictionary), args.output)
+    logger.info('Wrote models snapshot to %s', args.output)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,6 +1,11 @@
 import sys
 from functools import wraps
 
+if sys.version_info[0] > 2:
+    string_types = (str,)
+else:
+    string_types = (basestring,)  # noqa: F821
+
 
 def validate(*types, **kwargs):
     def decorator(f):
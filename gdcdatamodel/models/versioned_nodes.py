@@ -1,18 +1,307 @@
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB
-from sqlalchemy import Column, Text, DateTime, BigInteger, text, Index
+from sqlalchemy import Column, Text, DateTime, BigInteger, text, Index, select
+from sqlalchemy.orm import Query
+from collections import Counter
 from copy import copy
+from itertools import islice
 
 
 Base = declarative_base()
 
 
+#: Default number of versions per page of :meth:`VersionedNode.get_history`
+HISTORY_PAGE_SIZE = 100
+
+#: Default number of rows fetched at a time by :meth:`VersionedNode.iter_as_of`
+AS_OF_BATCH_SIZE = 10000
+
+#: Default maximum number of versions between full snapshots, see
+#: :meth:`VersionedNode.clone_delta`
+DELTA_CHECKPOINT_INTERVAL = 10
+
+#: Columns of a full snapshot that a delta row stores as changes
+DELTA_COLUMNS = ('properties', 'system_annotations', 'acl', 'neighbors')
+
+
+def get_state(version):
+    """Returns the :data:`DELTA_COLUMNS` of a full version"""
+
+    return {column: getattr(version, column) for column in DELTA_COLUMNS}
+
+
+def get_dict_delta(previous, current):
+    previous, current = previous or {}, current or {}
+    delta = {
+        'set': {
+            key: value for key, value in current.items()
+            if key not in previous or previous[key] != value
+        },
+        'unset': sorted(key for key in previous if key not in current),
+    }
+    return delta if delta['set'] or delta['unset'] else None
+
+
+def apply_dict_delta(previous, delta):
+    state = dict(previous or {})
+    if delta:
+        for key in delta['unset']:
+            state.pop(key, None)
+        state.update(delta['set'])
+    return state
+
+
+def get_delta(previous, current):
+    """Returns the changes from one state (see :func:`get_state`) to
+    another as a JSON document:
+
+    .. code-block::
+        {
+            'properties': {'set': {<key>: <value>}, 'unset': [<key>]},
+            'system_annotations': {'set': {...}, 'unset': [...]},
+            'acl': <acl>,
+            'neighbors': {'add': [<node_id>], 'remove': [<node_id>]},
+        }
+
+    Unchanged entries are left out.
+
+    """
+
+    delta = {}
+    for column in ('properties', 'system_annotations'):
+        column_delta = get_dict_delta(previous[column], current[column])
+        if column_delta:
+            delta[column] = column_delta
+
+    if (previous['acl'] or []) != (current['acl'] or []):
+        delta['acl'] = current['acl']
+
+    previous_neighbors = Counter(previous['neighbors'] or [])
+    current_neighbors = Counter(current['neighbors'] or [])
+    if previous_neighbors != current_neighbors:
+        delta['neighbors'] = {
+            'add': sorted((current_neighbors - previous_neighbors).elements()),
+            'remove': sorted((previous_neighbors - current_neighbors).elements()),
+        }
+
+    return delta
+
+
+def apply_delta(previous, delta):
+    """Returns the state obtained by applying a :func:`get_delta` delta
+    to a state
+
+    """
+
+    state = {
+        'properties': apply_dict_delta(
+            previous['properties'], delta.get('properties')),
+        'system_annotations': apply_dict_delta(
+            previous['system_annotations'], delta.get('system_annotations')),
+        'acl': delta.get('acl', previous['acl']),
+        'neighbors': list(previous['neighbors'] or []),
+    }
+
+    if 'neighbors' in delta:
+        for node_id in delta['neighbors']['remove']:
+            state['neighbors'].remove(node_id)
+        state['neighbors'].extend(delta['neighbors']['add'])
+
+    return state
+
+
+#: Every version from a delta's base down to the nearest full snapshot
+#: of each ``(node_id, label, base_key)``
+BASES_SQL = """
+SELECT DISTINCT ON (v.key) v.*
+FROM unnest(CAST(:node_ids AS TEXT[]), CAST(:labels AS TEXT[]),
+            CAST(:base_keys AS BIGINT[])) AS wanted(node_id, label, base_key)
+JOIN versioned_nodes v
+  ON v.node_id = wanted.node_id
+ AND v.label = wanted.label
+ AND v.key <= wanted.base_key
+ AND v.key >= (
+    SELECT max(f.key)
+    FROM versioned_nodes f
+    WHERE f.node_id = wanted.node_id
+      AND f.label = wanted.label
+      AND f.delta IS NULL
+      AND f.key <= wanted.base_key
+ )
+ORDER BY v.key
+"""
+
+
+def get_bases(session, versions):
+    """Returns the ``versioned_nodes`` rows the delta versions need to
+    be resolved and that are not in versions, with a single query.  The
+    rows are not added to the session.
+
+    """
+
+    keys = {version.key for version in versions}
+    wanted = [
+        version for version in versions
+        if version.delta is not None and version.base_key not in keys
+    ]
+    if not wanted:
+        return []
+
+    query = text(BASES_SQL).columns(*VersionedNode.__table__.columns)
+    return session.connection().execute(query, {
+        'node_ids': [version.node_id for version in wanted],
+        'labels': [version.label for version in wanted],
+        'base_keys': [version.base_key for version in wanted],
+    }).fetchall()
+
+
+def resolve_versions(session, versions):
+    """Returns versions with every delta version replaced by a transient
+    :class:`VersionedNode` holding the full snapshot.  Missing base
+    versions are loaded from the database with one query, see
+    :func:`get_bases`.
+
+    :param versions: VersionedNodes or ``versioned_nodes`` rows
+    :returns: list in the order of versions
+
+    """
+
+    if all(version.delta is None for version in versions):
+        return list(versions)
+
+    known = {version.key: version for version in versions}
+    for base in get_bases(session, versions):
+        known.setdefault(base.key, base)
+    states = {}
+
+    def get_version_state(version):
+        chain = []
+        while version.delta is not None and version.key not in states:
+            chain.append(version)
+            version = known[version.base_key]
+        state = states.get(version.key) or get_state(version)
+        for delta_version in reversed(chain):
+            state = apply_delta(state, delta_version.delta)
+            states[delta_version.key] = state
+        return state
+
+    resolved = []
+    for version in versions:
+        if version.delta is None:
+            resolved.append(version)
+            continue
+        state = get_version_state(version)
+        resolved.append(VersionedNode(
+            key=version.key,
+            label=version.label,
+            node_id=version.node_id,
+            project_id=version.project_id,
+            gdc_versions=version.gdc_versions,
+            created=version.created,
+            versioned=version.versioned,
+            **state
+        ))
+    return resolved
+
+
+class VersionsQuery(Query):
+    """Query of VersionedNodes returning delta versions as full
+    snapshots, see :func:`resolve_versions`.  Results are resolved
+    :data:`HISTORY_PAGE_SIZE` at a time.
+
+    """
+
+    def __iter__(self):
+        results = super(VersionsQuery, self).__iter__()
+        while True:
+            versions = list(islice(results, HISTORY_PAGE_SIZE))
+            if not versions:
+                return
+            if all(isinstance(v, VersionedNode) for v in versions):
+                versions = resolve_versions(self.session, versions)
+            for version in versions:
+                yield version
+
+
+SNAPSHOT_SQL = """
+WITH scope AS (
+    SELECT node_id, acl, _sysan, _props, created
+    FROM {table}
+    WHERE {where}
+), edges AS (
+    {edges}
+), neighbors AS (
+    SELECT node_id, array_agg(neighbor_id ORDER BY direction) AS neighbors
+    FROM edges
+    GROUP BY node_id
+)
+INSERT INTO versioned_nodes (
+    label, node_id, project_id, created, acl, system_annotations,
+    properties, neighbors, gdc_versions
+)
+SELECT
+    :label, scope.node_id, scope._props->>'project_id', scope.created,
+    scope.acl, scope._sysan, scope._props,
+    COALESCE(neighbors.neighbors, CAST('{{}}' AS TEXT[])),
+    CAST(:gdc_versions AS TEXT[])
+FROM scope
+LEFT JOIN neighbors ON neighbors.node_id = scope.node_id
+"""
+
+EDGES_OUT_SQL = """
+    SELECT e.src_id AS node_id, e.dst_id AS neighbor_id, 0 AS direction
+    FROM {table} e JOIN scope ON scope.node_id = e.src_id
+"""
+
+EDGES_IN_SQL = """
+    SELECT e.dst_id AS node_id, e.src_id AS neighbor_id, 1 AS direction
+    FROM {table} e JOIN scope ON scope.node_id = e.dst_id
+"""
+
+NO_EDGES_SQL = """
+    SELECT CAST(NULL AS TEXT) AS node_id, CAST(NULL AS TEXT) AS neighbor_id,
+           0 AS direction
+    WHERE false
+"""
+
+
+def get_snapshot_sql(node_cls, node_ids=None, project_id=None):
+    """Returns the ``INSERT ... SELECT`` versioning the nodes of a class,
+    optionally restricted to node ids and/or a project
+
+    """
+
+    where = ['true']
+    if node_ids is not None:
+        where.append('node_id = ANY(:node_ids)')
+    if project_id is not None:
+        where.append("_props->>'project_id' = :project_id")
+
+    edge_cls = node_cls.get_edge_class()
+    edges = [
+        EDGES_OUT_SQL.format(table=edge.__tablename__)
+        for edge in edge_cls._get_edges_with_src(node_cls.__name__)
+    ] + [
+        EDGES_IN_SQL.format(table=edge.__tablename__)
+        for edge in edge_cls._get_edges_with_dst(node_cls.__name__)
+    ]
+
+    return SNAPSHOT_SQL.format(
+        table=node_cls.__tablename__,
+        where=' AND '.join(where),
+        edges='UNION ALL'.join(edges) or NO_EDGES_SQL,
+    )
+
+
 class VersionedNode(Base):
 
     __tablename__ = 'versioned_nodes'
     __table_args__ = (
         Index('submitted_node_id_idx', 'node_id'),
-        Index('submitted_node_gdc_versions_idx', 'node_id'),
+        Index('submitted_node_gdc_versions_idx', 'gdc_versions',
+              postgresql_using='gin'),
+        Index('versioned_nodes_node_id_label_key_idx',
+              'node_id', 'label', 'key'),
     )
 
     def __repr__(self):
@@ -74,6 +363,222 @@ class VersionedNode(Base):
         ARRAY(Text),
     )
 
+    #: Key of the version :attr:`delta` applies to, None for a full
+    #: snapshot
+    base_key = Column(
+        BigInteger,
+    )
+
+    #: Changes to the :data:`DELTA_COLUMNS` since the :attr:`base_key`
+    #: version, see :func:`get_delta`.  The columns themselves are NULL.
+    delta = Column(
+        JSONB,
+    )
+
+    @staticmethod
+    def query_history(session, node_id, label, before_key=None,
+                      limit=HISTORY_PAGE_SIZE):
+        """Returns a page of the stored versions of a node, newest first,
+        without resolving delta versions, see :meth:`get_history`
+
+        """
+
+        query = session.query(VersionedNode)\
+                       .filter(VersionedNode.node_id == node_id)\
+                       .filter(VersionedNode.label == label)
+        if before_key is not None:
+            query = query.filter(VersionedNode.key < before_key)
+        return query.order_by(VersionedNode.key.desc()).limit(limit).all()
+
+    @staticmethod
+    def get_history(session, node_id, label, before_key=None,
+                    limit=HISTORY_PAGE_SIZE):
+        """Returns a page of the versions of a node, newest first.  Pages
+        are keyed on :attr:`key` so each one is a range scan of the
+        ``(node_id, label, key)`` index however deep into the history.
+        Delta versions are returned as full snapshots.
+
+        :param before_key:
+            Only return versions older than this key, i.e. the key of
+            the last version of the previous page
+        :returns: list of at most :param:`limit` VersionedNodes
+
+        """
+
+        return resolve_versions(session, VersionedNode.query_history(
+            session, node_id, label, before_key, limit))
+
+    @staticmethod
+    def iter_history(session, node_id, label, page_size=HISTORY_PAGE_SIZE):
+        """Yields every version of a node, newest first, one page of
+        :meth:`get_history` at a time
+
+        """
+
+        before_key = None
+        while True:
+            page = VersionedNode.get_history(
+                session, node_id, label, before_key, page_size)
+            for version in page:
+                yield version
+            if len(page) < page_size:
+                return
+            before_key = page[-1].key
+
+    @staticmethod
+    def get_as_of(session, node_id, label, gdc_version):
+        """Returns the latest version of a node in release
+        :param:`gdc_version` or None
+
+        """
+
+        version = session.query(VersionedNode)\
+                         .filter(VersionedNode.node_id == node_id)\
+                         .filter(VersionedNode.label == label)\
+                         .filter(VersionedNode.gdc_versions.contains([gdc_version]))\
+                         .order_by(VersionedNode.key.desc())\
+                         .first()
+        return resolve_versions(session, [version])[0] if version else None
+
+    @staticmethod
+    def get_as_of_query(gdc_version, label=None, project_id=None,
+                        releases=None):
+        """Returns a select of the latest version of each node at or
+        before a release, see :meth:`iter_as_of`
+
+        """
+
+        table = VersionedNode.__table__
+        query = select([table])\
+            .where(table.c.gdc_versions.overlap(releases or [gdc_version]))\
+            .distinct(table.c.node_id)\
+            .order_by(table.c.node_id, table.c.key.desc())
+
+        if label is not None:
+            query = query.where(table.c.label == label)
+        if project_id is not None:
+            query = query.where(table.c.project_id == project_id)
+
+        return query
+
+    @staticmethod
+    def iter_as_of(session, gdc_version, label=None, project_id=None,
+                   releases=None, batch_size=AS_OF_BATCH_SIZE):
+        """Yields the latest version of each node at or before a release,
+        ordered by node_id.  Rows are streamed from a server-side cursor
+        and are not added to the session, so memory stays bounded
+        whatever the size of the release.
+
+        :param gdc_version: the release to reconstruct
+        :param label: only yield nodes with this label
+        :param project_id: only yield nodes of this project
+        :param releases:
+            the releases at or before :param:`gdc_version` whose versions
+            count, defaults to only :param:`gdc_version`
+        :returns: iterator of ``versioned_nodes`` rows, delta versions
+            are resolved to transient VersionedNodes
+
+        """
+
+        query = VersionedNode.get_as_of_query(
+            gdc_version, label, project_id, releases)
+        connection = session.connection().execution_options(
+            stream_results=True)
+        result = connection.execute(query)
+
+        try:
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in resolve_versions(session, rows):
+                    yield row
+        finally:
+            result.close()
+
+    @staticmethod
+    def snapshot(session, node_cls, node_ids=None, project_id=None,
+                 gdc_versions=None):
+        """Version nodes of a class in bulk, like :meth:`clone` but with a
+        single ``INSERT ... SELECT`` and without loading any node or
+        edge.
+
+        :param node_cls: Node subclass of the nodes to version
+        :param node_ids: only version these nodes
+        :param project_id: only version nodes of this project
+        :param gdc_versions: ``gdc_versions`` of the new rows
+        :returns: number of nodes versioned
+
+        """
+
+        if node_ids is not None:
+            node_ids = list(node_ids)
+            if not node_ids:
+                return 0
+
+        return session.execute(
+            text(get_snapshot_sql(node_cls, node_ids, project_id)), {
+                'label': node_cls.get_label(),
+                'node_ids': node_ids,
+                'project_id': project_id,
+                'gdc_versions': gdc_versions,
+            }).rowcount
+
+    @staticmethod
+    def snapshot_project(session, node_cls, project_id, gdc_versions=None):
+        """Version every node of a project, see :meth:`snapshot`
+
+        :param node_cls: The abstract Node class of the graph
+        :returns: ``dict`` of label -> number of nodes versioned
+
+        """
+
+        counts = {}
+        for cls in node_cls.get_subclasses():
+            count = VersionedNode.snapshot(
+                session, cls, project_id=project_id,
+                gdc_versions=gdc_versions)
+            if count:
+                counts[cls.get_label()] = count
+        return counts
+
+    @staticmethod
+    def clone_delta(session, node,
+                    checkpoint_interval=DELTA_CHECKPOINT_INTERVAL):
+        """Like :meth:`clone`, but returns a delta version holding only the
+        changes since the node's latest version.  A full snapshot is
+        returned for the first version and whenever the latest
+        :param:`checkpoint_interval` versions are all deltas.
+
+        """
+
+        history = VersionedNode.query_history(
+            session, node.node_id, node.label, limit=checkpoint_interval)
+        full = VersionedNode.clone(node)
+
+        depth = 0
+        for version in history:
+            if version.delta is None:
+                break
+            depth += 1
+
+        if not history or depth + 1 >= checkpoint_interval:
+            return full
+
+        previous = resolve_versions(session, history[:1])[0]
+        return VersionedNode(
+            label=full.label,
+            node_id=full.node_id,
+            project_id=full.project_id,
+            created=full.created,
+            acl=None,
+            system_annotations=None,
+            properties=None,
+            neighbors=None,
+            base_key=previous.key,
+            delta=get_delta(get_state(previous), get_state(full)),
+        )
+
     @staticmethod
     def clone(node):
         return VersionedNode(
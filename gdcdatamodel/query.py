@@ -1,4 +1,52 @@
+"""gdcdatamodel.query
+----------------------------------
+
+Paths between node types used to filter queries by related nodes of
+another type (see :func:`union_subq_path`).
+
+The traversal table holds, for every pair of labels, the set of simple
+paths (dotted association names) from one to the other.  It is built
+on first use from an adjacency table of the loaded classes.  A source
+label with more than :data:`MAX_PATHS` paths, or with a path that
+continues past :data:`MAX_PATH_LENGTH` edges if that is set, raises
+:class:`TraversalLimitError` rather than exhausting memory or silently
+leaving paths out of the table.
+
+:func:`union_subq_path` can answer a query with one of three
+strategies:
+
+- ``paths``: one ``subq_path`` subquery per path, UNIONed (default)
+- ``recursive``: a single recursive CTE walking the edge tables along
+  the steps of those paths, from the destination nodes back to the
+  source label.  It may also match nodes connected by a walk that mixes
+  steps of different paths.
+- ``related_cases``: a single semi-join on the ``_related_cases``
+  shortcut edges, for pairs where one side is ``case``.  The shortcut
+  edges relate a node to every case above it, whatever the path.  Other
+  pairs fall back to ``recursive``.
+
+If ``$GDC_TRAVERSALS_CACHE`` points to a file, the table is read from
+it when it was built for the same dictionary, models and limits, and
+written to it otherwise.  Build it ahead of time with::
+
+    python -m gdcdatamodel.query -o traversals.json
+
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
 from psqlgraph import Node, Edge
+from sqlalchemy import Text, and_, cast, literal, select, union_all
+
+from gdcdatamodel.models.caching import RELATED_CASES_LINK_NAME
+from gdcdatamodel.models.snapshot import get_snapshot_key
+
+logger = logging.getLogger(__name__)
 
 traversals = {}
 terminal_nodes = ['annotations', 'centers', 'archives', 'tissue_source_sites',
@@ -10,50 +58,357 @@ terminal_nodes = ['annotations', 'centers', 'archives', 'tissue_source_sites',
                   'simple_somatic_mutations', 'gene_expressions', 'aggregated_somatic_mutations',
                   ]
 
+#: Maximum number of edges in a path, None for no limit other than the
+#: number of labels
+MAX_PATH_LENGTH = None
+
+#: Maximum number of paths from a label to all others
+MAX_PATHS = 100000
+
+#: Environment variable pointing to the traversal table cache file
+TRAVERSALS_CACHE_ENV_VAR = 'GDC_TRAVERSALS_CACHE'
+
+#: Strategies of :func:`union_subq_path`
+PATH_UNION = 'paths'
+RECURSIVE = 'recursive'
+RELATED_CASES = 'related_cases'
+STRATEGIES = (PATH_UNION, RECURSIVE, RELATED_CASES)
+
+_traversals_lock = threading.Lock()
+
+
+class TraversalLimitError(Exception):
+    """Raised when a label has more paths than the traversal table is
+    allowed to hold
+
+    """
+
+#: label -> association -> neighbor label of the loaded traversals
+_neighbors = {}
+
+#: (src label, dst label) -> set of (label, association, neighbor
+#: label) steps on the paths between them
+_steps = {}
+
+
+def get_adjacency():
+    """Returns map of label -> sorted list of (association, neighbor
+    label) for every edge to or from nodes with that label
+
+    """
+
+    classes = {cls.__name__: cls for cls in Node.get_subclasses()}
+
+    adjacency = {}
+    for name, cls in classes.items():
+        neighbors = set()
+        for edge in Edge._get_edges_with_src(name):
+            dst = classes.get(edge.__dst_class__)
+            if dst:
+                neighbors.add((edge.__src_dst_assoc__, dst.label))
+        for edge in Edge._get_edges_with_dst(name):
+            src = classes.get(edge.__src_class__)
+            if src:
+                neighbors.add((edge.__dst_src_assoc__, src.label))
+        adjacency[cls.label] = sorted(neighbors)
+
+    return adjacency
+
+
+def is_terminal(name):
+    """Paths don't continue past terminal associations"""
+
+    return name in terminal_nodes or name.startswith('_related')
+
+
+def iter_paths(adjacency, label, visited, path, max_length):
+    """Yields ``(label, path)`` for every simple path from the last label
+    of :param:`visited` that extends :param:`path`.  The yielded path is
+    only valid until the next iteration.
+
+    :raises TraversalLimitError:
+        if a path could continue past :param:`max_length` edges
+
+    """
+
+    yield label, path
+
+    if path and is_terminal(path[-1]):
+        return
+
+    steps = [
+        (name, neighbor) for name, neighbor in adjacency[label]
+        # the first step is filtered on the neighbor label
+        if neighbor not in visited and (path or not is_terminal(neighbor))
+    ]
+
+    if steps and max_length is not None and len(path) >= max_length:
+        raise TraversalLimitError(
+            'Path {} to {} continues past {} edges, raise MAX_PATH_LENGTH'
+            .format('.'.join(path), label, max_length))
+
+    for name, neighbor in steps:
+        visited.add(neighbor)
+        path.append(name)
+        for item in iter_paths(adjacency, neighbor, visited, path, max_length):
+            yield item
+        path.pop()
+        visited.remove(neighbor)
+
+
+def build_traversals(adjacency, max_length=MAX_PATH_LENGTH, max_paths=MAX_PATHS):
+    """Returns map of source label -> destination label -> set of paths
+
+    :raises TraversalLimitError:
+        if there are more than :param:`max_paths` paths from a label or
+        a path is longer than :param:`max_length` edges
+
+    """
+
+    table = {}
+    for root in adjacency:
+        table[root] = {}
+        count = 0
+        for label, path in iter_paths(adjacency, root, {root}, [], max_length):
+            count += 1
+            if count > max_paths:
+                raise TraversalLimitError(
+                    'More than {} paths from {}, raise MAX_PATHS'
+                    .format(max_paths, root))
+            table[root].setdefault(label, set()).add('.'.join(path))
+    return table
+
+
+def get_traversals_key(adjacency, max_length=MAX_PATH_LENGTH, max_paths=MAX_PATHS):
+    """Returns the key identifying what a traversal table was built from"""
+
+    digest = hashlib.sha1(
+        json.dumps(adjacency, sort_keys=True).encode('utf-8')).hexdigest()
+
+    key = get_snapshot_key()
+    key.update({
+        'adjacency': digest,
+        'max_length': max_length,
+        'max_paths': max_paths,
+    })
+    return key
+
+
+def write_traversals(table, key, path):
+    document = {
+        'key': key,
+        'traversals': {
+            root: {label: sorted(paths) for label, paths in dsts.items()}
+            for root, dsts in table.items()
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, sort_keys=True)
+
 
-def construct_traversals(root, node, visited, path):
-    recurse = lambda neighbor: (
-        neighbor
-        # no backtracking
-        and neighbor not in visited
-        and neighbor != node
-        # no traveling THROUGH terminal nodes
-        and (path[-1] not in terminal_nodes
-             if path else neighbor.label not in terminal_nodes)
-        and (not path[-1].startswith('_related')
-             if path else not neighbor.label.startswith('_related')))
+def read_traversals(key, path):
+    """Read a traversal table if it was built with the same key
 
-    for edge in Edge._get_edges_with_src(node.__name__):
-        neighbor = [n for n in Node.get_subclasses()
-                    if n.__name__ == edge.__dst_class__][0]
-        if recurse(neighbor):
-            construct_traversals(
-                root, neighbor, visited+[node], path+[edge.__src_dst_assoc__])
+    :returns: the traversal table or None
 
-    for edge in Edge._get_edges_with_dst(node.__name__):
-        neighbor = [n for n in Node.get_subclasses()
-                    if n.__name__ == edge.__src_class__][0]
-        if recurse(neighbor):
-            construct_traversals(
-                root, neighbor, visited+[node], path+[edge.__dst_src_assoc__])
+    """
 
-    traversals[root][node.label] = traversals[root].get(node.label) or set()
-    traversals[root][node.label].add('.'.join(path))
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except (IOError, OSError, ValueError) as e:
+        logger.info('Unable to read traversals %s: %s', path, e)
+        return None
 
+    if document.get('key') != key:
+        logger.info('Ignoring traversals %s built for %s',
+                    path, document.get('key'))
+        return None
 
-def construct_traversals_for_all_nodes():
-    for node in Node.get_subclasses():
-        traversals[node.label] = {}
-        construct_traversals(node.label, node, [node], [])
+    return {
+        root: {label: set(paths) for label, paths in dsts.items()}
+        for root, dsts in document['traversals'].items()
+    }
+
+
+def construct_traversals_for_all_nodes(path=None):
+    """Fill :data:`traversals`, reading from or writing to the cache file
+    at :param:`path` (defaults to ``$GDC_TRAVERSALS_CACHE``) if any
+
+    """
+
+    path = path or os.environ.get(TRAVERSALS_CACHE_ENV_VAR)
+    adjacency = get_adjacency()
+    key = get_traversals_key(adjacency)
+
+    table = read_traversals(key, path) if path else None
+    if table is None:
+        table = build_traversals(adjacency)
+        if path:
+            try:
+                write_traversals(table, key, path)
+            except (IOError, OSError) as e:
+                logger.warning('Unable to write traversals %s: %s', path, e)
+
+    _neighbors.clear()
+    _neighbors.update(
+        {label: dict(neighbors) for label, neighbors in adjacency.items()})
+    _steps.clear()
+
+    for root in set(traversals) - set(table):
+        del traversals[root]
+    traversals.update(table)
+
+
+def get_traversals():
+    if traversals == {}:
+        with _traversals_lock:
+            if traversals == {}:
+                construct_traversals_for_all_nodes()
+    return traversals
+
+
+def get_steps(src_label, dst_label):
+    """Returns the set of ``(label, association, neighbor label)`` steps
+    taken by the paths from src_label to dst_label
+
+    """
+
+    key = (src_label, dst_label)
+    if key not in _steps:
+        steps = set()
+        for path in get_traversals()[src_label].get(dst_label, ()):
+            label = src_label
+            for name in path.split('.') if path else []:
+                neighbor = _neighbors[label][name]
+                steps.add((label, name, neighbor))
+                label = neighbor
+        _steps[key] = steps
+    return _steps[key]
+
+
+def get_edge_cls(label, name):
+    """Returns ``(edge class, forward)`` for the association name of nodes
+    with label, forward is False if the nodes are the edge destinations
+
+    """
+
+    cls_name = Node.get_subclass(label).__name__
+    for edge in Edge._get_edges_with_src(cls_name):
+        if edge.__src_dst_assoc__ == name:
+            return edge, True
+    for edge in Edge._get_edges_with_dst(cls_name):
+        if edge.__dst_src_assoc__ == name:
+            return edge, False
+    raise KeyError('No association {} on {}'.format(name, label))
+
+
+def get_dst_ids(q, dst_label, post_filters):
+    """Returns a query for the ids of the dst_label nodes passing
+    post_filters
+
+    """
+
+    dst_cls = Node.get_subclass(dst_label)
+    dst_q = q.session.query(dst_cls)
+    for post_filter in post_filters:
+        dst_q = post_filter(dst_q)
+    return dst_q.with_entities(dst_cls.node_id.label('node_id'))
+
+
+def recursive_subq_path(q, dst_label, post_filters=[]):
+    """Filter q to the nodes reachable from dst_label nodes passing
+    post_filters with one recursive CTE, see :mod:`gdcdatamodel.query`
+
+    """
+
+    entity = q.entity()
+    src_label = entity.label
+    if not get_traversals().get(src_label, {}).get(dst_label):
+        return q
+
+    def label(value):
+        return cast(literal(value), Text)
+
+    # Walk each step backwards, from the neighbor to the label
+    selects = []
+    for step_label, name, neighbor in sorted(get_steps(src_label, dst_label)):
+        edge, forward = get_edge_cls(step_label, name)
+        here, there = (edge.dst_id, edge.src_id) if forward else (edge.src_id, edge.dst_id)
+        selects.append(select([
+            here.label('node_id'),
+            label(neighbor).label('label'),
+            there.label('next_id'),
+            label(step_label).label('next_label'),
+        ]))
+
+    dst_ids = get_dst_ids(q, dst_label, post_filters).subquery()
+    reach = select([
+        dst_ids.c.node_id, label(dst_label).label('label'),
+    ]).cte('reach', recursive=True)
+
+    if selects:
+        steps = union_all(*selects).alias('steps')
+        reach = reach.union(
+            select([steps.c.next_id, steps.c.next_label])
+            .select_from(steps.join(reach, and_(
+                steps.c.node_id == reach.c.node_id,
+                steps.c.label == reach.c.label,
+            )))
+        )
+
+    return q.filter(entity.node_id.in_(
+        select([reach.c.node_id]).where(reach.c.label == src_label)))
+
+
+def related_cases_subq_path(q, dst_label, post_filters=[]):
+    """Filter q to the nodes related to dst_label nodes passing
+    post_filters through the ``_related_cases`` shortcut edges, see
+    :mod:`gdcdatamodel.query`
+
+    """
+
+    entity = q.entity()
+    src_label = entity.label
+
+    try:
+        if dst_label == 'case':
+            edge, _ = get_edge_cls(src_label, RELATED_CASES_LINK_NAME)
+            src_id, dst_id = edge.src_id, edge.dst_id
+        elif src_label == 'case':
+            edge, _ = get_edge_cls(dst_label, RELATED_CASES_LINK_NAME)
+            src_id, dst_id = edge.dst_id, edge.src_id
+        else:
+            raise KeyError(dst_label)
+    except KeyError:
+        return recursive_subq_path(q, dst_label, post_filters)
+
+    dst_ids = get_dst_ids(q, dst_label, post_filters)
+    return q.filter(entity.node_id.in_(
+        q.session.query(src_id).filter(dst_id.in_(dst_ids.subquery()))))
 
 
 def union_subq_without_path(q, *args, **kwargs):
     return q.except_(union_subq_path(q, *args, **kwargs))
 
 
-def union_subq_path(q, dst_label, post_filters=[]):
-    if traversals == {}:
-        construct_traversals_for_all_nodes()
+def union_subq_path(q, dst_label, post_filters=[], strategy=PATH_UNION):
+    """Filter q to the nodes with a path to dst_label nodes passing
+    post_filters
+
+    :param strategy: one of :data:`STRATEGIES`
+
+    """
+
+    if strategy == RECURSIVE:
+        return recursive_subq_path(q, dst_label, post_filters)
+    if strategy == RELATED_CASES:
+        return related_cases_subq_path(q, dst_label, post_filters)
+    if strategy != PATH_UNION:
+        raise ValueError('Unknown strategy {}, expected one of {}'
+                         .format(strategy, STRATEGIES))
+
+    get_traversals()
     src_label = q.entity().label
     if not traversals.get(src_label, {}).get(dst_label, {}):
         return q
@@ -62,3 +417,23 @@ def union_subq_path(q, dst_label, post_filters=[]):
     while paths:
         base = base.union(q.subq_path(paths.pop(), post_filters))
     return base
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write the traversal table of the loaded models')
+    parser.add_argument('-o', '--output', required=True,
+                        help='path to write the traversals to')
+    args = parser.parse_args()
+
+    from gdcdatamodel import models  # noqa
+
+    adjacency = get_adjacency()
+    write_traversals(
+        build_traversals(adjacency), get_traversals_key(adjacency), args.output)
+    logger.info('Wrote traversals to %s', args.output)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,2 +1,3 @@
 from .json_validators import GDCJSONValidator
 from .graph_validators import GDCGraphValidator
+from .pipeline import ValidationPipeline
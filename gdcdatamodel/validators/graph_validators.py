@@ -1,7 +1,22 @@
+import json
+
+from collections import defaultdict
+
 import psqlgraph
 import sqlalchemy
 from gdcdictionary import gdcdictionary
 
+from gdcdatamodel.models.link_rules import (
+    ONE_TO,
+    TO_ONE,
+    LinkGroup,
+    get_link_rules,
+)
+
+
+#: Placeholder for a property absent from a node's ``_props``
+MISSING = '__missing__'
+
 
 class GDCGraphValidator(object):
     '''
@@ -18,7 +33,7 @@ class GDCGraphValidator(object):
         self.optional_validators = {}
 
     def record_errors(self, graph, entities):
-        for validator in self.required_validators.values():
+        for _, validator in sorted(self.required_validators.items()):
             validator.validate(entities, graph)
 
         for entity in entities:
@@ -29,41 +44,128 @@ class GDCGraphValidator(object):
                     self.optional_validators[validator_name].validate()
 
 
+class LinksIndex(object):
+    """Targets and backref counts of the links of a batch of entities,
+    loaded with one query per edge table and chunk of node ids.
+
+    Relies on the session's autoflush so that links of the batch that
+    were not flushed yet are included.
+
+    """
+
+    #: Maximum number of node ids per query
+    chunk_size = 1000
+
+    def __init__(self, graph, entities):
+        #: (src_id, association) -> list of dst_ids
+        self.targets = defaultdict(list)
+
+        #: (edge class, dst_id) -> number of edges to dst_id
+        self.backref_counts = defaultdict(int)
+
+        session = graph.current_session()
+        edges = self.get_edges(entities)
+
+        for edge_cls, associations in edges.items():
+            src_ids = {
+                node_id for node_ids in associations.values()
+                for node_id in node_ids
+            }
+            dst_ids = set()
+            for src_id, dst_id in self.query(
+                    session.query(edge_cls.src_id, edge_cls.dst_id),
+                    edge_cls.src_id, src_ids):
+                dst_ids.add(dst_id)
+                for association, node_ids in associations.items():
+                    if src_id in node_ids:
+                        self.targets[src_id, association].append(dst_id)
+
+            for dst_id, count in self.query(
+                    session.query(edge_cls.dst_id, sqlalchemy.func.count())
+                    .group_by(edge_cls.dst_id),
+                    edge_cls.dst_id, dst_ids):
+                self.backref_counts[edge_cls, dst_id] = count
+
+    @staticmethod
+    def get_edge_cls(node, association):
+        edge_out = node._pg_links[association]['edge_out']
+        return getattr(type(node), edge_out).property.mapper.class_
+
+    @classmethod
+    def get_edges(cls, entities):
+        """Returns map of edge class -> association -> ids of the nodes
+        whose links to validate go through that edge class
+
+        """
+
+        edges = defaultdict(lambda: defaultdict(set))
+        rules = {}
+        for entity in entities:
+            node = entity.node
+            if node.label not in rules:
+                rules[node.label] = [
+                    (name, cls.get_edge_cls(node, name))
+                    for name in get_link_rules(
+                        gdcdictionary.schema[node.label]).by_name
+                    if name in node._pg_links
+                ]
+            for name, edge_cls in rules[node.label]:
+                edges[edge_cls][name].add(node.node_id)
+        return edges
+
+    def query(self, query, column, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            for row in query.filter(column.in_(chunk)):
+                yield row
+
+    def get_targets(self, node, association):
+        return self.targets[node.node_id, association]
+
+    def get_backref_count(self, node, association, dst_id):
+        edge_cls = self.get_edge_cls(node, association)
+        return self.backref_counts[edge_cls, dst_id]
+
+
 class GDCLinksValidator(object):
+    """Validates the links of entities against the link rules of their
+    label, see :mod:`gdcdatamodel.models.link_rules`
+
+    """
 
     def validate(self, entities, graph=None):
+        index = LinksIndex(graph, entities) if graph is not None else None
+        rules = {}
         for entity in entities:
-            for link in gdcdictionary.schema[entity.node.label]['links']:
-                if 'name' in link:
-                    self.validate_edge(link, entity)
-                elif 'subgroup' in link:
-                    self.validate_edge_group(link, entity)
+            label = entity.node.label
+            if label not in rules:
+                rules[label] = get_link_rules(gdcdictionary.schema[label])
+            for entry in rules[label].entries:
+                if isinstance(entry, LinkGroup):
+                    self.validate_edge_group(entry, entity, index)
+                else:
+                    self.validate_edge(entry, entity, index)
 
-    def validate_edge_group(self, schema, entity):
+    def validate_edge_group(self, group, entity, index=None):
         submitted_links = []
-        schema_links = []
+        schema_links = list(group.names)
         num_of_edges = 0
 
-        for group in schema['subgroup']:
-            if 'subgroup' in schema['subgroup']:
-                # nested subgroup
-                result = self.validate_edge_group(group, entity)
-            if 'name' in group:
-                result = self.validate_edge(group, entity)
-
+        for rule in group.rules:
+            result = self.validate_edge(rule, entity, index)
             if result['length'] > 0:
                 submitted_links.append(result)
                 num_of_edges += result['length']
-            schema_links.append(result['name'])
 
-        if schema.get('required') is True and len(submitted_links) == 0:
+        if group.required and len(submitted_links) == 0:
             names = ", ".join(
                 schema_links[:-2] + [" or ".join(schema_links[-2:])])
             entity.record_error(
                 "Entity is missing a required link to {}"
                 .format(names), keys=schema_links)
 
-        if schema.get("exclusive") is True and len(submitted_links) > 1:
+        if group.exclusive and len(submitted_links) > 1:
             names = ", ".join(
                 schema_links[:-2] + [" and ".join(schema_links[-2:])])
             entity.record_error(
@@ -72,37 +174,51 @@ class GDCLinksValidator(object):
             for edge in entity.node.edges_out:
                 entity.record_error('{}'.format(edge.dst.submitter_id))
 
-        result = {'length': num_of_edges, 'name': ", ".join(schema_links)}
+        return {'length': num_of_edges, 'name': ", ".join(schema_links)}
+
+    def validate_edge(self, rule, entity, index=None):
+        """Validate a link's multiplicity.  Targets and their backrefs are
+        read from :param:`index` if given, loaded lazily otherwise.
+
+        :param rule: :class:`gdcdatamodel.models.link_rules.LinkRule`
+
+        """
 
-    def validate_edge(self, link_sub_schema, entity):
-        association = link_sub_schema['name']
+        association = rule.name
         node = entity.node
-        targets = node[association]
+        if index is not None:
+            targets = index.get_targets(node, association)
+        else:
+            targets = node[association]
         result = {'length': len(targets), 'name': association}
 
         if len(targets) > 0:
-            multi = link_sub_schema['multiplicity']
+            multi = rule.multiplicity
 
-            if multi in ['many_to_one', 'one_to_one']:
+            if multi in TO_ONE:
                 if len(targets) > 1:
                     entity.record_error(
                         "'{}' link has to be {}"
                         .format(association, multi),
                         keys=[association])
 
-            if multi in ['one_to_many', 'one_to_one']:
+            if multi in ONE_TO:
                 for target in targets:
-                    if len(target[link_sub_schema['backref']]) > 1:
+                    if index is not None:
+                        count = index.get_backref_count(
+                            node, association, target)
+                        label = rule.target_type
+                    else:
+                        count = len(target[rule.backref])
+                        label = target.label
+                    if count > 1:
                         entity.record_error(
                             "'{}' link has to be {}, target node {} already has {}"
                             .format(association, multi,
-                                    target.label, link_sub_schema['backref']),
+                                    label, rule.backref),
                             keys=[association])
-
-            if multi == 'many_to_many':
-                pass
         else:
-            if link_sub_schema.get('required') is True:
+            if rule.required:
                 entity.record_error(
                     "Entity is missing required link to {}"
                     .format(association),
@@ -111,8 +227,41 @@ class GDCLinksValidator(object):
 
 
 class GDCUniqueKeysValidator(object):
+    """Checks that no other node shares an entity's uniqueKeys values.
+
+    Entities are grouped by label and key tuple, each group is resolved
+    with one query (per :attr:`chunk_size` entities) for all nodes
+    matching any of the group's values, and the matches are counted in
+    memory together with the entities of the batch.
+
+    """
+
+    #: Maximum number of key values per query
+    chunk_size = 1000
 
     def validate(self, entities, graph=None):
+        for (label, keys), group in self.get_groups(entities).items():
+            counts = self.count_matches(graph, keys, group)
+            for entity, props in group:
+                if counts[self.get_values(props, keys)] > 1:
+                    entity.record_error(
+                        '{} with {} already exists in the GDC'
+                        .format(label, props), keys=list(props.keys())
+                    )
+
+    @staticmethod
+    def get_values(props, keys):
+        """Returns a hashable representation of the values of keys"""
+
+        return json.dumps([props.get(key, MISSING) for key in keys])
+
+    def get_groups(self, entities):
+        """Returns map of (label, property names) -> list of (entity,
+        props) to check for each uniqueKeys tuple of each entity
+
+        """
+
+        groups = defaultdict(list)
         for entity in entities:
             schema = gdcdictionary.schema[entity.node.label]
             node = entity.node
@@ -126,8 +275,35 @@ class GDCUniqueKeysValidator(object):
                         props[prop] = node[prop]
                     else:
                         props[key] = node[key]
-                if graph.nodes().props(props).count() > 1:
-                        entity.record_error(
-                            '{} with {} already exists in the GDC'
-                            .format(node.label, props), keys=list(props.keys())
-                        )
+                group_keys = tuple(sorted(props))
+                groups[node.label, group_keys].append((entity, props))
+        return groups
+
+    def count_matches(self, graph, keys, group):
+        """Count the distinct nodes, in the graph or in the batch, having
+        each of the group's key values
+
+        :returns: map of :meth:`get_values` -> number of nodes
+
+        """
+
+        matches = defaultdict(set)
+        for entity, props in group:
+            matches[self.get_values(props, keys)].add(entity.node.node_id)
+
+        distinct = list({
+            self.get_values(props, keys): props for _, props in group
+        }.values())
+
+        for start in range(0, len(distinct), self.chunk_size):
+            chunk = distinct[start:start + self.chunk_size]
+            query = graph.nodes()
+            entity = query.entity()
+            rows = query.filter(sqlalchemy.or_(*[
+                entity._props.contains(props) for props in chunk
+            ])).with_entities(entity.node_id, entity._props)
+
+            for node_id, props in rows:
+                matches[self.get_values(props, keys)].add(node_id)
+
+        return {values: len(ids) for values, ids in matches.items()}
@@ -1,6 +1,17 @@
 from gdcdictionary import gdcdictionary
-from jsonschema import Draft4Validator, RefResolver
+from jsonschema import Draft4Validator
+import logging
 import re
+import threading
+
+from gdcdatamodel.models.snapshot import get_distribution_version
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+logger = logging.getLogger(__name__)
 
 missing_prop_re = re.compile("\'([a-zA-Z_-]+)\' is a required property")
 extra_prop_re = re.compile("Additional properties are not allowed \(u\'([a-zA-Z_-]+)\' was unexpected\)")
@@ -19,35 +30,149 @@ def get_keys(error_msg):
         return []
 
 
+#: (dictionary version, type) -> (schema, Draft4Validator, compiled
+#: validation function, None if not compiled yet or False if it can't
+#: be), shared by all GDCJSONValidators
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+#: Keywords whose value maps names to subschemas
+SUBSCHEMA_MAPPINGS = ('properties', 'patternProperties', 'definitions')
+
+
+def without_defaults(schema):
+    """Returns a copy of schema without its ``default`` keywords"""
+
+    if isinstance(schema, list):
+        return [without_defaults(value) for value in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    copy = {}
+    for key, value in schema.items():
+        if key == 'default':
+            continue
+        if key in SUBSCHEMA_MAPPINGS and isinstance(value, dict):
+            copy[key] = {
+                name: without_defaults(subschema)
+                for name, subschema in value.items()
+            }
+        else:
+            copy[key] = without_defaults(value)
+    return copy
+
+
+def compile_schema(schema):
+    """Returns a fastjsonschema validation function for schema or None if
+    fastjsonschema is not installed or can't compile it.
+
+    fastjsonschema writes the ``default`` of missing properties into the
+    validated document, so the function is compiled without them.
+
+    """
+
+    if fastjsonschema is None:
+        return None
+
+    try:
+        return fastjsonschema.compile(without_defaults(schema))
+    except Exception as e:
+        logger.warning('Unable to compile schema %s: %s', schema.get('id'), e)
+        return None
+
+
+def get_validators(version, schema, compiled=False):
+    """Returns the cached ``(Draft4Validator, compiled function)`` for a
+    type's schema, building them on first use.  Entries are rebuilt if
+    the schema object of the type was replaced.
+
+    """
+
+    key = (version, schema.get('id'))
+    cached = _validators.get(key)
+
+    if cached is None or cached[0] is not schema or (compiled and cached[2] is None):
+        with _validators_lock:
+            cached = _validators.get(key)
+            if cached is None or cached[0] is not schema:
+                # Note whenever gdcdictionary use a newer version of
+                # jsonschema we need to update the Validator
+                cached = (schema, Draft4Validator(schema), None)
+            if compiled and cached[2] is None:
+                cached = cached[:2] + (compile_schema(schema) or False,)
+            _validators[key] = cached
+
+    return cached[1], cached[2] or None
+
+
 class GDCJSONValidator(object):
-    def __init__(self):
+    """Validates documents against the dictionary's JSON schemas.
+
+    :param compiled:
+        Check documents with a compiled validation function first (needs
+        the optional ``fastjsonschema`` package) and only use jsonschema
+        to describe the errors of invalid documents
+
+    """
+
+    def __init__(self, compiled=False):
         self.schemas = gdcdictionary
+        self.version = get_distribution_version('gdcdictionary')
+        self.compiled = compiled
 
     def iter_errors(self, doc):
-        # Note whenever gdcdictionary use a newer version of jsonschema
-        # we need to update the Validator
-        validator = Draft4Validator(self.schemas.schema[doc['type']])
+        validator, compiled = get_validators(
+            self.version, self.schemas.schema[doc['type']], self.compiled)
+
+        if compiled is not None:
+            try:
+                compiled(doc)
+                return iter([])
+            except fastjsonschema.JsonSchemaException:
+                pass
+
         return validator.iter_errors(doc)
 
+    def get_errors(self, doc):
+        """Returns the list of ``(message, keys)`` errors of a document
+        other than a missing or unknown type
+
+        """
+
+        errors = []
+        for error in self.iter_errors(doc):
+            # the key will be  property.subproperty for nested properties
+            keys = ['.'.join(error.path)] if error.path else []
+            if not keys:
+                keys = get_keys(error.message)
+            message = error.message
+            if error.context:
+                message += ': {}'.format(' and '.join([c.message for c in error.context]))
+            errors.append((message, keys))
+        return errors
+
+    def get_type_error(self, doc):
+        """Returns a ``(message, keys)`` error if the document has no or
+        an unknown type, None otherwise
+
+        """
+
+        if 'type' not in doc:
+            return "'type' is a required property", ['type']
+        if doc['type'] not in self.schemas.schema:
+            return ("specified type: {} is not in the current data model"
+                    .format(doc['type']), ['type'])
+        return None
+
     def record_errors(self, entities):
         for entity in entities:
             json_doc = entity.doc
-            if 'type' not in json_doc:
-                entity.record_error(
-                    "'type' is a required property", keys=['type'])
-                break
-            if json_doc['type'] not in self.schemas.schema:
-                entity.record_error(
-                    "specified type: {} is not in the current data model"
-                    .format(json_doc['type']), keys=['type'])
+            type_error = self.get_type_error(json_doc)
+            if type_error:
+                message, keys = type_error
+                entity.record_error(message, keys=keys)
                 break
-            for error in self.iter_errors(json_doc):
-                # the key will be  property.subproperty for nested properties
-                keys = ['.'.join(error.path)] if error.path else []
-                if not keys:
-                    keys = get_keys(error.message)
-                message = error.message
-                if error.context:
-                    message += ': {}'.format(' and '.join([c.message for c in error.context]))
+            for message, keys in self.get_errors(json_doc):
                 entity.record_error(message, keys=keys)
             # additional validators go here
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""gdcdatamodel.validators.pipeline
+----------------------------------
+
+Validation of large submission batches.
+
+:class:`ValidationPipeline` streams entities through in chunks.  The
+JSON schema stage of a chunk is sharded across a process pool while the
+graph validators (which resolve a whole chunk with a few queries, see
+:mod:`gdcdatamodel.validators.graph_validators`) run on the previous
+chunk.  Errors are recorded on the entities in input order regardless
+of which worker validated them.
+
+"""
+
+import itertools
+import logging
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from gdcdatamodel.validators.graph_validators import GDCGraphValidator
+from gdcdatamodel.validators.json_validators import GDCJSONValidator
+
+logger = logging.getLogger(__name__)
+
+
+#: Number of entities validated together by the graph validators
+CHUNK_SIZE = 5000
+
+#: Number of documents sent to a worker process at once
+SHARD_SIZE = 500
+
+
+StageMetrics = namedtuple('StageMetrics', ['entities', 'errors', 'seconds'])
+
+
+def get_rate(metrics):
+    """Returns the throughput of a stage in entities per second"""
+
+    return metrics.entities / metrics.seconds if metrics.seconds else 0.0
+
+
+#: GDCJSONValidator of a worker process
+_json_validator = None
+
+
+def get_json_validator(compiled):
+    global _json_validator
+    if _json_validator is None or _json_validator.compiled != compiled:
+        _json_validator = GDCJSONValidator(compiled=compiled)
+    return _json_validator
+
+
+def validate_docs(docs, compiled=False):
+    """Returns the list of ``(message, keys)`` errors of each document,
+    run in a worker process
+
+    """
+
+    json_validator = get_json_validator(compiled)
+
+    errors = []
+    for doc in docs:
+        type_error = json_validator.get_type_error(doc)
+        errors.append(
+            [type_error] if type_error else json_validator.get_errors(doc))
+    return errors
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ValidationPipeline(object):
+    """Validates entities with :class:`GDCJSONValidator` and
+    :class:`GDCGraphValidator`.
+
+    Unlike ``GDCJSONValidator.record_errors``, an entity with a missing
+    or unknown type doesn't stop the validation of the rest of the batch.
+
+    :param workers:
+        Number of processes for the JSON schema stage, 0 to validate
+        in the current process
+    :param chunk_size: Number of entities per graph validation batch
+    :param shard_size: Number of documents per worker task
+    :param compiled: See :class:`GDCJSONValidator`
+
+    """
+
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE,
+                 shard_size=SHARD_SIZE, compiled=False):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.shard_size = shard_size
+        self.compiled = compiled
+        self.graph_validator = GDCGraphValidator()
+
+    def submit_json(self, executor, chunk):
+        """Start the JSON schema stage of a chunk
+
+        :returns: ``(start time, callable returning the errors of each
+            shard)``
+
+        """
+
+        start = time.time()
+        docs = [entity.doc for entity in chunk]
+        shards = list(iter_chunks(docs, self.shard_size))
+
+        if executor is None:
+            errors = [validate_docs(shard, self.compiled) for shard in shards]
+            return start, lambda: errors
+
+        futures = [
+            executor.submit(validate_docs, shard, self.compiled)
+            for shard in shards
+        ]
+        return start, lambda: [future.result() for future in futures]
+
+    def record_json_errors(self, chunk, pending, metrics):
+        start, get_shards = pending
+        shards = get_shards()
+
+        count = 0
+        docs_errors = itertools.chain.from_iterable(shards)
+        for entity, errors in zip(chunk, docs_errors):
+            for message, keys in errors:
+                entity.record_error(message, keys=keys)
+            count += len(errors)
+
+        metrics['json'].append((len(chunk), count, time.time() - start))
+
+    def record_graph_errors(self, graph, chunk, metrics):
+        start = time.time()
+        before = sum(len(entity.errors) for entity in chunk)
+
+        valid = [
+            entity for entity in chunk
+            if getattr(entity, 'node', None) is not None
+        ]
+        self.graph_validator.record_errors(graph, valid)
+
+        count = sum(len(entity.errors) for entity in chunk) - before
+        metrics['graph'].append((len(chunk), count, time.time() - start))
+
+    def run(self, entities, graph=None):
+        """Validate entities, recording their errors
+
+        :param entities: iterable of submission entities
+        :param graph:
+            PsqlGraphDriver with an open session to run the graph
+            validators, None to only check the JSON schemas
+        :returns: dict of stage -> :class:`StageMetrics`, the seconds
+            are wall clock time spent in each stage, which overlap
+
+        """
+
+        metrics = {'json': [], 'graph': []}
+        start = time.time()
+
+        executor = None
+        if self.workers != 0:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        try:
+            previous = None
+            for chunk in iter_chunks(entities, self.chunk_size):
+                pending = self.submit_json(executor, chunk)
+                if previous is not None and graph is not None:
+                    self.record_graph_errors(graph, previous, metrics)
+                self.record_json_errors(chunk, pending, metrics)
+                previous = chunk
+
+            if previous is not None and graph is not None:
+                self.record_graph_errors(graph, previous, metrics)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        results = {
+            stage: StageMetrics(*[sum(values) for values in zip(*chunks)])
+            if chunks else StageMetrics(0, 0, 0.0)
+            for stage, chunks in metrics.items()
+        }
+        for stage, result in sorted(results.items()):
+            logger.info('%s validation: %d entities, %d errors, %.2fs (%.0f/s)',
+                        stage, result.entities, result.errors,
+                        result.seconds, get_rate(result))
+        logger.info('Validated batch in %.2fs', time.time() - start)
+
+        return results
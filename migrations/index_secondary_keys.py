@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-migrations.async_transactions
+migrations.index_secondary_keys
 ----------------------------------
 
 Migrates up/down between states A -> B
@@ -9,13 +9,26 @@ B: with
 the following indexes per secondary key
 - lower(_props ->> key)
 - _props ->> key
+and per multi-key secondary key tuple (uniqueKeys)
+- (_props ->> key_1, ..., _props ->> key_n)
+- optionally the same restricted to nodes that are not deleted/legacy
+
+Indexes are built with ``CREATE INDEX CONCURRENTLY`` so writes to the
+tables are not blocked.  This can't run inside a transaction: the
+migration switches the connection to autocommit and skips indexes that
+already exist, so it can be re-run after an interruption.
 
 """
 
 from psqlgraph import Node
-from gdcdatamodel.models import get_secondary_key_indexes
+from gdcdatamodel.models.indexes import (
+    create_index_concurrently,
+    get_partial_unique_key_indexes,
+    get_secondary_key_indexes,
+    get_unique_key_indexes,
+)
 from gdcdatamodel.models.submission import TransactionLog
-from sqlalchemy import Index
+from sqlalchemy import Index, text
 
 
 import logging
@@ -29,41 +42,106 @@ TX_LOG_PROJECT_ID_IDX = Index(
     TransactionLog.program+'_'+TransactionLog.project)
 
 
-def up_transaction(connection):
-    logger.info('Migrating async-transactions: up')
+INDEX_EXISTS_SQL = """
+SELECT 1 FROM pg_indexes WHERE indexname = :name
+"""
 
-    for cls in Node.get_subclasses():
-        for index in get_secondary_key_indexes(cls):
-            logger.info('Creating %s', index.name)
-            index.create(connection)
-    TX_LOG_PROJECT_ID_IDX.create(connection)
+INDEX_SIZES_SQL = """
+SELECT indexname, pg_relation_size(quote_ident(indexname)::regclass) AS size
+FROM pg_indexes
+WHERE indexname = ANY(:names)
+"""
+
+
+#: class -> partial unique key indexes, built once per process
+_partial_indexes = {}
+
+
+def get_declared_indexes(cls, indexes):
+    """Returns the indexes declared on the class' table with the names of
+    :param:`indexes`
 
+    """
 
-def down_transaction(connection):
-    logger.info('Migrating async-transactions: down')
+    declared = {index.name: index for index in cls.__table__.indexes}
+    return [declared.get(index.name, index) for index in indexes]
 
+
+def get_partial_indexes(cls):
+    if cls not in _partial_indexes:
+        _partial_indexes[cls] = get_partial_unique_key_indexes(cls)
+    return _partial_indexes[cls]
+
+
+def get_indexes(partial=False):
+    """Returns a list of (description, index) to migrate"""
+
+    indexes = []
     for cls in Node.get_subclasses():
-        for index in get_secondary_key_indexes(cls):
-            logger.info('Dropping %s', index.name)
-            index.drop(connection)
-    TX_LOG_PROJECT_ID_IDX.drop(connection)
-
-
-def up(connection):
-    transaction = connection.begin()
-    try:
-        up_transaction(connection)
-        transaction.commit()
-    except Exception:
-        transaction.rollback()
-        raise
-
-
-def down(connection):
-    transaction = connection.begin()
-    try:
-        down_transaction(connection)
-        transaction.commit()
-    except Exception:
-        transaction.rollback()
-        raise
+        for index in get_declared_indexes(cls, get_secondary_key_indexes(cls)):
+            indexes.append(('key', index))
+        for index in get_declared_indexes(cls, get_unique_key_indexes(cls)):
+            indexes.append(('unique', index))
+        if partial:
+            for index in get_partial_indexes(cls):
+                indexes.append(('partial', index))
+    indexes.append(('key', TX_LOG_PROJECT_ID_IDX))
+    return indexes
+
+
+def index_exists(connection, index):
+    return connection.execute(
+        text(INDEX_EXISTS_SQL), name=index.name).first() is not None
+
+
+def autocommit(connection):
+    return connection.execution_options(isolation_level='AUTOCOMMIT')
+
+
+def up(connection, partial=False):
+    logger.info('Migrating index-secondary-keys: up')
+
+    connection = autocommit(connection)
+    for _, index in get_indexes(partial):
+        if index_exists(connection, index):
+            logger.info('Skipping existing %s', index.name)
+            continue
+
+        create_index_concurrently(connection, index)
+
+
+def down(connection, partial=True):
+    logger.info('Migrating index-secondary-keys: down')
+
+    connection = autocommit(connection)
+    for _, index in get_indexes(partial):
+        logger.info('Dropping %s', index.name)
+        connection.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(index.name))
+
+
+def report_index_sizes(connection, partial=True):
+    """Compare the size of the per-key indexes with the composite
+    (and partial) unique key indexes per table
+
+    :returns: ``dict`` of table -> {description: bytes}
+
+    """
+
+    indexes = get_indexes(partial)
+    sizes = dict(connection.execute(
+        text(INDEX_SIZES_SQL), names=[index.name for _, index in indexes]
+    ).fetchall())
+
+    report = {}
+    for description, index in indexes:
+        table = report.setdefault(index.table.name, {})
+        table[description] = table.get(description, 0) + sizes.get(index.name, 0)
+
+    for table, table_sizes in sorted(report.items()):
+        if len(table_sizes) > 1:
+            logger.info('%-40s %s', table, ', '.join(
+                '{}: {} kB'.format(description, size // 1024)
+                for description, size in sorted(table_sizes.items())))
+
+    return report
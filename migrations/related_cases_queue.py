@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.related_cases_queue
+----------------------------------
+
+Create `related_cases_queue` table used by the deferred related case
+cache mode.
+"""
+
+from gdcdatamodel import models
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def up(connection):
+    logger.info('Migrating related_cases_queue: up')
+
+    models.case_cache_queue.Base.metadata.create_all(connection)
+
+
+def down(connection):
+    logger.info('Migrating related_cases_queue: down')
+
+    models.case_cache_queue.Base.metadata.drop_all(connection)
@@ -139,7 +139,7 @@ def append_cache_from_parents(graph, cls):
 
     parents = {
         link['dst_type']
-        for link in cls._pg_links.itervalues()
+        for link in cls._pg_links.values()
     }
 
     for parent in parents:
@@ -196,7 +196,9 @@ def update_case_cache_append_only(graph):
 
 def main():
     print("No main() action defined, please manually call "
-          "update_case_cache_append_only(graph)")
+          "update_case_cache_append_only(graph) or run "
+          "`gdc_postgres_admin graph-cache-rebuild` to also delete stale "
+          "cache edges")
 
 
 if __name__ == '__main__':
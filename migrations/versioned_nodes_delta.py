@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.versioned_nodes_delta
+----------------------------------
+
+Add the `base_key` and `delta` columns of delta versions (see
+:meth:`gdcdatamodel.models.versioned_nodes.VersionedNode.clone_delta`)
+to `versioned_nodes`.
+
+"""
+
+from sqlalchemy import text
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+COLUMNS = [
+    ('base_key', 'BIGINT'),
+    ('delta', 'JSONB'),
+]
+
+COLUMN_EXISTS_SQL = """
+SELECT 1 FROM information_schema.columns
+WHERE table_name = 'versioned_nodes' AND column_name = :name
+"""
+
+
+def column_exists(connection, name):
+    return connection.execute(
+        text(COLUMN_EXISTS_SQL), name=name).first() is not None
+
+
+def up(connection):
+    logger.info('Migrating versioned-nodes-delta: up')
+
+    for name, column_type in COLUMNS:
+        if column_exists(connection, name):
+            logger.info('Skipping existing column %s', name)
+            continue
+        connection.execute(
+            'ALTER TABLE versioned_nodes ADD COLUMN {} {}'.format(
+                name, column_type))
+
+
+def down(connection):
+    logger.info('Migrating versioned-nodes-delta: down')
+
+    connection.execute("""
+        ALTER TABLE versioned_nodes
+        DROP COLUMN IF EXISTS base_key,
+        DROP COLUMN IF EXISTS delta
+    """)
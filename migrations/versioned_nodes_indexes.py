@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+migrations.versioned_nodes_indexes
+----------------------------------
+
+Migrates up/down between states A -> B
+A: `submitted_node_gdc_versions_idx` is a btree on `node_id`
+B: `submitted_node_gdc_versions_idx` is a GIN index on `gdc_versions`,
+   and `versioned_nodes_node_id_label_key_idx` is a btree on
+   `(node_id, label, key)`
+
+Indexes are built with ``CREATE INDEX CONCURRENTLY`` on an autocommit
+connection so writes to `versioned_nodes` are not blocked.
+
+"""
+
+from gdcdatamodel.models.indexes import create_index_concurrently
+from gdcdatamodel.models.versioned_nodes import VersionedNode
+from sqlalchemy import text
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+GDC_VERSIONS_IDX = 'submitted_node_gdc_versions_idx'
+NODE_ID_LABEL_KEY_IDX = 'versioned_nodes_node_id_label_key_idx'
+
+
+INDEX_DEF_SQL = """
+SELECT indexdef FROM pg_indexes WHERE indexname = :name
+"""
+
+
+def autocommit(connection):
+    return connection.execution_options(isolation_level='AUTOCOMMIT')
+
+
+def drop_index(connection, name):
+    logger.info('Dropping %s', name)
+    connection.execute('DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(name))
+
+
+def get_index_def(connection, name):
+    """Returns the definition of an index or None if it doesn't exist"""
+
+    return connection.execute(text(INDEX_DEF_SQL), name=name).scalar()
+
+
+def get_index(name):
+    return next(
+        index for index in VersionedNode.__table__.indexes
+        if index.name == name)
+
+
+def up(connection):
+    logger.info('Migrating versioned-nodes-indexes: up')
+
+    connection = autocommit(connection)
+
+    indexdef = get_index_def(connection, GDC_VERSIONS_IDX)
+    if indexdef and 'USING gin' not in indexdef:
+        drop_index(connection, GDC_VERSIONS_IDX)
+        indexdef = None
+    if not indexdef:
+        create_index_concurrently(connection, get_index(GDC_VERSIONS_IDX))
+
+    if not get_index_def(connection, NODE_ID_LABEL_KEY_IDX):
+        create_index_concurrently(connection, get_index(NODE_ID_LABEL_KEY_IDX))
+
+
+def down(connection):
+    logger.info('Migrating versioned-nodes-indexes: down')
+
+    connection = autocommit(connection)
+    drop_index(connection, NODE_ID_LABEL_KEY_IDX)
+    drop_index(connection, GDC_VERSIONS_IDX)
+    logger.info('Creating %s', GDC_VERSIONS_IDX)
+    connection.execute(
+        'CREATE INDEX CONCURRENTLY "{}" ON versioned_nodes (node_id)'
+        .format(GDC_VERSIONS_IDX))
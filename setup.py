@@ -12,6 +12,7 @@ setup(
         'pytz~=2020.1',
         'graphviz==0.4.10',
         'jsonschema~=3.2',
+        'importlib_metadata; python_version < "3.8"',
         'gdcdictionary @ git+https://github.com/NCI-GDC/gdcdictionary.git@2.2.0#egg=gdcdictionary',
         'psqlgraph @ git+https://github.com/NCI-GDC/psqlgraph.git@3.0.0a2#egg=psqlgraph',
         'gdc-ng-models @ git+https://github.com/NCI-GDC/gdc-ng-models.git@1.3.0#egg=gdc-ng-models',
@@ -20,7 +21,10 @@ setup(
       'python_version == "2.7"': [
           "futures~=3.3",
           "functools32~=3.2",
-      ]
+      ],
+      'fast': [
+          "fastjsonschema~=2.14",
+      ],
     },
     package_data={
         "gdcdatamodel": [
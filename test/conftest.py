@@ -25,6 +25,7 @@ def create_tables(engine):
     models.redaction.Base.metadata.create_all(engine)
     models.qcreport.Base.metadata.create_all(engine)
     models.misc.Base.metadata.create_all(engine)
+    models.case_cache_queue.Base.metadata.create_all(engine)
 
 
 def truncate(engine):
@@ -46,6 +47,7 @@ def truncate(engine):
         models.redaction.Base.metadata,
         models.qcreport.Base.metadata,
         models.misc.Base.metadata,
+        models.case_cache_queue.Base.metadata,
     ]
 
     for meta in ng_models_metadata:
@@ -1,4 +1,7 @@
+import pytest
+
 from gdcdatamodel import models as md
+from gdcdatamodel.models import caching, case_cache_queue
 from psqlgraph import Node
 
 from test.conftest import BaseTestCase
@@ -238,3 +241,159 @@ class TestCacheRelatedCases(BaseTestCase):
             case = self.g.nodes(md.Case).one()
             assert case.created_datetime == old_created_datetime
             assert case.updated_datetime == old_updated_datetime
+
+
+class TestCacheRelatedCasesBatched(TestCacheRelatedCases):
+    """Runs the scenarios above with the set-based cache update"""
+
+    def setUp(self):
+        super(TestCacheRelatedCasesBatched, self).setUp()
+        caching.set_related_cases_mode(caching.RELATED_CASES_BATCHED)
+
+    def tearDown(self):
+        caching.set_related_cases_mode(caching.RELATED_CASES_RECURSIVE)
+        super(TestCacheRelatedCasesBatched, self).tearDown()
+
+    def test_cache_visible_after_flush(self):
+        with self.g.session_scope() as s:
+            case = md.Case('case_id_1')
+            sample = md.Sample('sample_id_1')
+            aliquot = md.Aliquot('aliquot_id_1')
+            aliquot.samples = [sample]
+            sample.cases = [case]
+            s.add(aliquot)
+            s.flush()
+
+            assert [c.node_id for c in aliquot._related_cases] == ['case_id_1']
+            assert [a.node_id for a in case._related_aliquot] == [
+                'aliquot_id_1']
+
+            sample.cases = []
+            s.flush()
+
+            assert aliquot._related_cases == []
+            assert case._related_aliquot == []
+
+    def test_session_mode(self):
+        caching.set_related_cases_mode(caching.RELATED_CASES_RECURSIVE)
+
+        with self.g.session_scope() as s:
+            caching.set_related_cases_mode(caching.RELATED_CASES_BATCHED, s)
+            assert caching.get_related_cases_mode(s) == caching.RELATED_CASES_BATCHED
+            sample = md.Sample('sample_id_1')
+            sample.cases = [md.Case('case_id_1')]
+            s.add(sample)
+
+        with self.g.session_scope():
+            sample = self.g.nodes(md.Sample).one()
+            assert [c.node_id for c in sample._related_cases] == ['case_id_1']
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            caching.set_related_cases_mode('eventually')
+
+
+class TestCacheRelatedCasesDeferred(BaseTestCase):
+
+    def setUp(self):
+        super(TestCacheRelatedCasesDeferred, self).setUp()
+        caching.set_related_cases_mode(caching.RELATED_CASES_DEFERRED)
+
+    def tearDown(self):
+        caching.set_related_cases_mode(caching.RELATED_CASES_RECURSIVE)
+        super(TestCacheRelatedCasesDeferred, self).tearDown()
+
+    def test_drain_queue(self):
+        with self.g.session_scope() as s:
+            case = md.Case('case_id_1')
+            sample = md.Sample('sample_id_1')
+            aliquot = md.Aliquot('aliquot_id_1')
+            aliquot.samples = [sample]
+            sample.cases = [case]
+            s.add(aliquot)
+
+        with self.g.session_scope() as s:
+            assert not self.g.nodes(md.Sample).one()._related_cases
+            assert case_cache_queue.get_queue_size(s) == 2
+
+            diffs, queued = case_cache_queue.verify(s, Node, {
+                md.Sample: ['sample_id_1'],
+                md.Aliquot: ['aliquot_id_1'],
+            })
+            assert diffs[md.Sample] == [('sample_id_1', 'case_id_1', True)]
+            assert sorted(queued) == ['aliquot_id_1', 'sample_id_1']
+
+        assert case_cache_queue.drain(self.g, Node) == 2
+        assert case_cache_queue.wait_until_empty(self.g, timeout=0)
+
+        with self.g.session_scope() as s:
+            for cls in [md.Sample, md.Aliquot]:
+                node = self.g.nodes(cls).one()
+                assert [c.node_id for c in node._related_cases] == ['case_id_1']
+
+            diffs, queued = case_cache_queue.verify(s, Node, {
+                md.Sample: ['sample_id_1'],
+                md.Aliquot: ['aliquot_id_1'],
+            })
+            assert not diffs
+            assert not queued
+
+
+class TestRelatedCasesMemo(BaseTestCase):
+
+    def test_shared_ancestor_memoized(self):
+        with self.g.session_scope() as s:
+            case = md.Case('case_id_1')
+            sample1 = md.Sample('sample_id_1')
+            sample2 = md.Sample('sample_id_2')
+            sample1.cases = [case]
+            sample2.cases = [case]
+            s.add_all([sample1, sample2])
+
+        caching.reset_related_cases_memo_stats()
+
+        with self.g.session_scope() as s:
+            aliquot = md.Aliquot('aliquot_id_1')
+            aliquot.samples = self.g.nodes(md.Sample).all()
+            s.add(aliquot)
+
+        # The second edge reuses the case set computed for the first
+        assert caching.related_cases_memo_stats == {'misses': 1, 'hits': 1}
+
+        with self.g.session_scope():
+            aliquot = self.g.nodes(md.Aliquot).one()
+            assert [c.node_id for c in aliquot._related_cases] == ['case_id_1']
+
+    def test_parent_edge_removed_in_flush(self):
+        with self.g.session_scope() as s:
+            sample = md.Sample('sample_id_1')
+            sample.cases = [md.Case('case_id_1')]
+            aliquot = md.Aliquot('aliquot_id_1')
+            aliquot.samples = [sample]
+            s.add(aliquot)
+
+        caching.reset_related_cases_memo_stats()
+
+        with self.g.session_scope() as s:
+            # The updated edge memoizes the aliquot's cases before the
+            # deleted edge changes its parent's cache
+            aliquot_edge = self.g.edges(md.AliquotDerivedFromSample).one()
+            aliquot_edge.sysan['touched'] = True
+            s.delete(self.g.edges(md.SampleDerivedFromCase).one())
+
+        assert caching.related_cases_memo_stats == {
+            'misses': 3, 'invalidations': 1}
+
+        with self.g.session_scope():
+            for cls in [md.Sample, md.Aliquot]:
+                assert self.g.nodes(cls).one()._related_cases == []
+
+    def test_invalidate(self):
+        memo = caching.RelatedCasesMemo()
+        memo.case_ids['sample_id_1'] = frozenset(['case_id_1'])
+
+        memo.invalidate('sample_id_1')
+        memo.invalidate('sample_id_2')
+
+        assert 'sample_id_1' not in memo.case_ids
+        assert memo.stats['invalidations'] == 1
@@ -133,3 +133,86 @@ class TestDataModel(unittest.TestCase):
             updated_case = self.g.nodes(md.Case).one()
             assert updated_case.created_datetime == old_created_datetime
             assert updated_case.updated_datetime == old_updated_datetime
+
+    def test_no_datetime_update_for_sysan(self):
+        """Verify system annotation changes do not affect a node's updated
+        datetime."""
+        with self.g.session_scope() as s:
+            s.merge(md.Case('case1'))
+
+        with self.g.session_scope():
+            case = self.g.nodes(md.Case).one()
+            old_updated_datetime = case.updated_datetime
+            case.sysan['key'] = 'value'
+
+        with self.g.session_scope():
+            updated_case = self.g.nodes(md.Case).one()
+            assert updated_case.sysan['key'] == 'value'
+            assert updated_case.updated_datetime == old_updated_datetime
+
+    def test_bulk_update_props(self):
+        """Verify bulk updates set the updated datetime server-side"""
+        with self.g.session_scope() as s:
+            s.merge(md.Case('case1'))
+            s.merge(md.Case('case2'))
+
+        with self.g.session_scope() as s:
+            case1 = self.g.nodes(md.Case).ids('case1').one()
+            old_updated_datetime = case1.updated_datetime
+            created_datetime = case1.created_datetime
+            s.expunge_all()
+
+        with self.g.session_scope() as s:
+            count = md.Case.bulk_update_props(
+                s, ['case1', 'missing'], {'primary_site': 'Kidney'})
+            assert count == 1
+
+        with self.g.session_scope():
+            case1 = self.g.nodes(md.Case).ids('case1').one()
+            case2 = self.g.nodes(md.Case).ids('case2').one()
+            assert case1.primary_site == 'Kidney'
+            assert case1.created_datetime == created_datetime
+            assert case1.updated_datetime > old_updated_datetime
+            assert case2.primary_site is None
+
+    def test_bulk_update_props_unknown_key(self):
+        """Verify bulk updates reject keys that aren't settable properties"""
+        with self.g.session_scope() as s:
+            s.merge(md.Case('case1'))
+
+        with self.g.session_scope() as s:
+            with self.assertRaises(KeyError):
+                md.Case.bulk_update_props(s, ['case1'], {'nope': 'value'})
+            with self.assertRaises(KeyError):
+                md.Case.bulk_update_props(
+                    s, ['case1'], {'updated_datetime': 'value'})
+            assert 'nope' not in self.g.nodes(md.Case).one()._props
+
+    def test_bulk_secondary_key_lookup(self):
+        """Verify secondary key tuples resolve to nodes in bulk"""
+        with self.g.session_scope() as s:
+            for i in range(5):
+                s.add(md.Sample(
+                    'sample{}'.format(i),
+                    project_id='A-B',
+                    submitter_id='submitter{}'.format(i),
+                ))
+
+        values = [('A-B', 'submitter{}'.format(i)) for i in range(3)]
+        values += [('A-B', 'missing'), ('C-D', 'submitter4')]
+
+        with self.g.session_scope() as s:
+            node_ids = md.Sample.get_node_ids_by_secondary_keys(
+                s, values, chunk_size=2)
+            assert node_ids == {
+                ('A-B', 'submitter{}'.format(i)): 'sample{}'.format(i)
+                for i in range(3)
+            }
+
+            nodes = md.Sample.get_nodes_by_secondary_keys(
+                s, values, keys=['project_id', 'submitter_id'])
+            assert {k: n.node_id for k, n in nodes.items()} == node_ids
+
+            with self.assertRaises(ValueError):
+                md.Sample.get_node_ids_by_secondary_keys(
+                    s, values, keys=['submitter_id'])
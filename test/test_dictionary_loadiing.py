@@ -45,3 +45,29 @@ def test_case_cache_related_edge_resolution():
     ns = models.caching.get_related_case_edge_cls(gdc.AlignedReads())
     class_name = "{}.{}".format(ns.__module__, ns.__name__)
     assert "gdcdatamodel.models.gdc.AlignedReadsRelatesToCase" == class_name
+
+
+def test_link_rules():
+    """ Tests the link rules of a label cover its links and subgroups,
+        and are rebuilt when the links are replaced
+    """
+    from gdcdictionary import gdcdictionary
+    from gdcdatamodel.models import link_rules
+
+    schema = dict(gdcdictionary.schema['aliquot'])
+    rules = link_rules.get_link_rules(schema)
+
+    assert set(rules.by_name) == set(models.get_links(schema))
+    assert rules is link_rules.get_link_rules(schema)
+    assert {'analytes', 'samples'} <= {
+        name for group in rules.groups for name in group.names}
+
+    schema['links'] = [{'name': 'samples', 'backref': 'aliquots',
+                        'label': 'derived_from', 'target_type': 'sample',
+                        'multiplicity': 'one_to_one', 'required': True}]
+    rebuilt = link_rules.get_link_rules(schema)
+    assert rebuilt is not rules
+    assert [rule.name for rule in rebuilt.rules] == ['samples']
+    assert rebuilt.rules[0].required and not rebuilt.groups
+
+    link_rules.get_link_rules(gdcdictionary.schema['aliquot'])
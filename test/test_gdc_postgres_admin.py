@@ -169,6 +169,52 @@ class TestGDCPostgresAdmin(unittest.TestCase):
         q.put(0)
         p.terminate()
 
+    def test_index_missing(self):
+        """Test building missing indexes concurrently"""
+
+        self.create_all_tables()
+        self.engine.execute('DROP INDEX index_node_analyte_project_id')
+
+        result = pgadmin.main(pgadmin.get_parser().parse_args([
+            'graph-index', '--workers', '2',
+        ] + self.base_args))
+
+        assert result['created'] == ['index_node_analyte_project_id']
+        assert pgadmin.get_existing_indexes(self.engine)[
+            'index_node_analyte_project_id']
+
+        result = pgadmin.main(pgadmin.get_parser().parse_args([
+            'graph-index',
+        ] + self.base_args))
+
+        assert result['created'] == []
+
+    def test_plan(self):
+        """Test the DDL plan for missing, renamed and orphaned objects"""
+
+        self.create_all_tables()
+        self.drop_a_table()
+        self.engine.execute('DROP INDEX index_node_analyte_project_id')
+        self.engine.execute('ALTER TABLE edge_casememberofproject '
+                            'RENAME TO edge_oldcasememberofproject')
+
+        steps = pgadmin.main(pgadmin.get_parser().parse_args([
+            'graph-plan',
+        ] + self.base_args))
+        statements = [step.statement for step in steps]
+
+        def position(prefix):
+            return next(i for i, statement in enumerate(statements)
+                        if statement.startswith(prefix))
+
+        assert statements[0] == ('ALTER TABLE edge_oldcasememberofproject '
+                                 'RENAME TO edge_casememberofproject')
+        assert (position('CREATE TABLE node_clinical')
+                < position('CREATE TABLE edge_clinicaldescribescase'))
+        assert ('CREATE INDEX CONCURRENTLY index_node_analyte_project_id'
+                in ''.join(statements))
+        assert not any(step.destructive for step in steps)
+
     def test_priv_grant_read(self):
         """Test ability to grant read but not write privs"""
 
@@ -199,6 +245,22 @@ class TestGDCPostgresAdmin(unittest.TestCase):
         finally:
             self.engine.execute("DROP OWNED BY pytest; DROP USER pytest")
 
+    def test_priv_grant_dry_run(self):
+        """Test grants are batched per chunk of tables and only printed"""
+
+        statements = pgadmin.grant_read_permissions_to_graph(
+            self.engine, ['pytest', 'pytest2'], dry_run=True, chunk_size=50)
+
+        tables = pgadmin.get_graph_tables()
+        assert len(statements) == (len(tables) + 49) // 50
+        assert all('TO pytest, pytest2' in s for s in statements)
+        assert all(t in ''.join(statements) for t in tables)
+
+        timings = pgadmin.main(pgadmin.get_parser().parse_args([
+            'graph-grant', '--read=pytest', '--write=pytest2', '--dry-run',
+        ] + self.base_args))
+        assert [phase for phase, _ in timings] == ['grant read', 'grant write']
+
     def test_priv_grant_write(self):
         """Test ability to grant read/write privs"""
 
@@ -7,9 +7,72 @@ Test GDC specific index creation.
 
 """
 
+from psqlgraph import Node
+
+from gdcdatamodel.models.indexes import (
+    get_partial_unique_key_indexes,
+    get_unique_key_indexes,
+    get_unique_key_tuples,
+    index_name,
+)
+
 
 def test_secondary_key_indexes(indexes):
     assert 'index_node_datasubtype_name_lower' in indexes
     assert 'index_node_analyte_project_id' in indexes
     assert 'index_4df72441_famihist_submitte_id_lower' in indexes
     assert 'transaction_logs_project_id_idx' in indexes
+
+
+def test_versioned_nodes_indexes(indexes):
+    assert indexes['versioned_nodes_node_id_label_key_idx'] == [
+        'node_id', 'label', 'key']
+    assert indexes['submitted_node_gdc_versions_idx'] == ['gdc_versions']
+
+
+def get_plan(session, query):
+    compiled = query.statement.compile(dialect=session.bind.dialect)
+    rows = session.connection().execute(
+        'EXPLAIN ' + str(compiled), compiled.params)
+    return '\n'.join(row[0] for row in rows)
+
+
+def test_secondary_key_lookup_uses_index(g):
+    """Every secondary key lookup must be able to use the secondary key
+    indexes
+
+    """
+
+    with g.session_scope() as session:
+        session.execute('SET LOCAL enable_seqscan = off')
+
+        for cls in Node.get_subclasses():
+            secondary_keys = getattr(cls, '__pg_secondary_keys', [])
+            if not secondary_keys:
+                continue
+
+            values = tuple(
+                tuple('value' for _ in keys) for keys in secondary_keys)
+            query = g.nodes(cls).filter(cls._secondary_keys == values)
+            plan = get_plan(session, query)
+
+            assert 'Index' in plan, '{}:\n{}'.format(cls.label, plan)
+            assert 'Seq Scan' not in plan, '{}:\n{}'.format(cls.label, plan)
+
+
+def test_unique_key_indexes(indexes):
+    for cls in Node.get_subclasses():
+        for keys in get_unique_key_tuples(cls):
+            name = index_name(cls, 'uk_' + '_'.join(keys))
+            assert name in indexes
+            assert len(indexes[name]) == len(keys)
+
+
+def test_index_builders_do_not_declare_indexes():
+    for cls in Node.get_subclasses():
+        declared = set(cls.__table__.indexes)
+        built = (get_unique_key_indexes(cls)
+                 + get_partial_unique_key_indexes(cls))
+        assert set(cls.__table__.indexes) == declared
+        for index in built:
+            assert index not in declared
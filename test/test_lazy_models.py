@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+gdcdatamodel.test.test_lazy_models
+----------------------------------
+
+Test lazy creation of the ORM classes.
+
+"""
+
+from psqlgraph import ext
+from sqlalchemy.orm import configure_mappers
+
+from gdcdatamodel import models
+
+
+def test_lazy_class_materialization():
+    models.load_dictionary(package_namespace='lazy_test', lazy=True)
+    from gdcdatamodel.models import lazy_test as lazy  # noqa
+
+    node_cls = ext.get_abstract_node('lazy_test')
+    assert 'aliquot' not in {
+        cls.get_label() for cls in node_cls.get_subclasses()}
+
+    aliquot = lazy.Aliquot
+    loaded = {cls.get_label() for cls in node_cls.get_subclasses()}
+    assert {'aliquot', 'analyte', 'sample', 'case'} <= loaded
+    assert 'program' not in loaded
+
+    program = node_cls.get_subclass('program')
+    assert program.__name__ == 'Program'
+    assert 'projects' in program._pg_backrefs
+
+    configure_mappers()
+    assert hasattr(aliquot, 'analytes')
+    assert hasattr(aliquot, '_related_cases')
+    assert aliquot._pg_links['analytes']['dst_type'] is lazy.Analyte
+
+
+def test_lazy_edge_class_lookup():
+    models.load_dictionary(package_namespace='lazy_test', lazy=True)
+    from gdcdatamodel.models import lazy_test as lazy  # noqa
+
+    edge = lazy.SampleDerivedFromCase
+    assert edge.__src_class__ == 'Sample'
+    assert edge.__tablename__ == models.SampleDerivedFromCase.__tablename__
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+gdcdatamodel.test.test_models_snapshot
+----------------------------------
+
+Test loading models from a schema snapshot.
+
+"""
+
+import pytest
+from gdcdictionary import gdcdictionary
+from psqlgraph import Edge, Node, ext
+
+from gdcdatamodel import models
+from gdcdatamodel.models import snapshot
+
+
+@pytest.fixture(scope='module')
+def snapshot_path(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('snapshot').join('snapshot.json'))
+    snapshot.write_snapshot(snapshot.build_snapshot(gdcdictionary), path)
+    return path
+
+
+def test_snapshot_round_trip(snapshot_path):
+    loaded = snapshot.read_snapshot(snapshot_path)
+
+    assert loaded['key'] == snapshot.get_snapshot_key()
+    assert {spec['id'] for spec in loaded['nodes']} == {
+        cls.get_label() for cls in Node.get_subclasses()}
+    assert {spec['tablename'] for spec in loaded['edges']} == {
+        cls.__tablename__ for cls in Edge.get_subclasses()}
+
+
+def test_snapshot_ignored_on_version_mismatch(snapshot_path, tmpdir):
+    stale = snapshot.read_snapshot(snapshot_path)
+    stale['key']['gdcdictionary'] = 'stale'
+    path = str(tmpdir.join('stale.json'))
+    snapshot.write_snapshot(stale, path)
+
+    assert snapshot.read_snapshot(path) is None
+
+
+def test_snapshot_ignored_on_unknown_version(snapshot_path, monkeypatch):
+    monkeypatch.setattr(
+        snapshot, 'get_distribution_version', lambda name: None)
+
+    assert snapshot.read_snapshot(snapshot_path) is None
+
+
+def test_snapshot_native_strings(snapshot_path):
+    loaded = snapshot.read_snapshot(snapshot_path)
+
+    for spec in loaded['nodes']:
+        assert type(spec['id']) is str
+    for spec in loaded['edges']:
+        assert type(spec['name']) is str
+
+
+def test_load_dictionary_from_snapshot(snapshot_path):
+    models.load_dictionary(package_namespace='snap', snapshot=snapshot_path)
+    from gdcdatamodel.models import snap  # noqa
+
+    node_cls = ext.get_abstract_node('snap')
+    for cls in Node.get_subclasses():
+        snap_cls = getattr(snap, cls.__name__)
+        assert snap_cls in node_cls.get_subclasses()
+        assert snap_cls.__tablename__ == cls.__tablename__
+        assert set(snap_cls._pg_edges) == set(cls._pg_edges)
+        assert snap_cls.__pg_properties__ == cls.__pg_properties__
+        assert (getattr(snap_cls, '__pg_secondary_keys')
+                == getattr(cls, '__pg_secondary_keys'))
+
+    assert snap.AlignedReadsRelatesToCase.__tablename__ == (
+        models.AlignedReadsRelatesToCase.__tablename__)
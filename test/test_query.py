@@ -0,0 +1,93 @@
+import pytest
+
+from gdcdatamodel import models as md
+from gdcdatamodel import query
+
+from test.conftest import BaseTestCase
+
+
+ADJACENCY = {
+    'case': [('samples', 'sample'), ('files', 'file')],
+    'sample': [('aliquots', 'aliquot'), ('cases', 'case')],
+    'aliquot': [('files', 'file'), ('samples', 'sample')],
+    'file': [('aliquots', 'aliquot'), ('cases', 'case')],
+}
+
+
+def test_build_traversals():
+    table = query.build_traversals(ADJACENCY)
+
+    assert table['case']['case'] == {''}
+    # no traveling through terminal associations
+    assert table['case']['aliquot'] == {'samples.aliquots'}
+    assert table['case']['file'] == {'files', 'samples.aliquots.files'}
+    assert table['file']['case'] == {'cases', 'aliquots.samples.cases'}
+
+
+def test_build_traversals_bounds():
+    # the longest path is 3 edges, a shorter bound can't drop it silently
+    table = query.build_traversals(ADJACENCY, max_length=3)
+    assert table == query.build_traversals(ADJACENCY)
+
+    with pytest.raises(query.TraversalLimitError):
+        query.build_traversals(ADJACENCY, max_length=2)
+
+    table = query.build_traversals(ADJACENCY, max_paths=7)
+    assert table == query.build_traversals(ADJACENCY)
+
+    with pytest.raises(query.TraversalLimitError):
+        query.build_traversals(ADJACENCY, max_paths=4)
+
+
+def test_shipped_dictionary_traversals():
+    table = query.build_traversals(query.get_adjacency())
+    assert table['case']['case'] == {''}
+
+
+def test_traversals_cache(tmpdir):
+    path = str(tmpdir.join('traversals.json'))
+    key = query.get_traversals_key(ADJACENCY)
+    table = query.build_traversals(ADJACENCY)
+
+    query.write_traversals(table, key, path)
+    assert query.read_traversals(key, path) == table
+
+    other = query.get_traversals_key(ADJACENCY, max_length=1)
+    assert query.read_traversals(other, path) is None
+
+
+class TestUnionSubqPath(BaseTestCase):
+
+    def setUp(self):
+        super(TestUnionSubqPath, self).setUp()
+        with self.g.session_scope() as s:
+            case = md.Case('case_id_1')
+            sample = md.Sample('sample_id_1')
+            sample.cases = [case]
+            aliquot = md.Aliquot('aliquot_id_1')
+            aliquot.samples = [sample]
+            s.merge(aliquot)
+            s.merge(md.Aliquot('aliquot_id_2'))
+
+    def test_strategies(self):
+        with self.g.session_scope():
+            for strategy in query.STRATEGIES:
+                aliquots = query.union_subq_path(
+                    self.g.nodes(md.Aliquot), 'case',
+                    [lambda q: q.ids('case_id_1')], strategy=strategy)
+                self.assertEqual(
+                    ['aliquot_id_1'], [n.node_id for n in aliquots.all()],
+                    strategy)
+
+                cases = query.union_subq_path(
+                    self.g.nodes(md.Case), 'aliquot',
+                    [lambda q: q.ids('aliquot_id_1')], strategy=strategy)
+                self.assertEqual(
+                    ['case_id_1'], [n.node_id for n in cases.all()],
+                    strategy)
+
+    def test_unknown_strategy(self):
+        with self.g.session_scope():
+            with self.assertRaises(ValueError):
+                query.union_subq_path(
+                    self.g.nodes(md.Aliquot), 'case', strategy='nope')
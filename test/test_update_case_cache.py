@@ -8,7 +8,10 @@ Test functionality to update stale case caches
 """
 
 import pytest
+from psqlgraph import Node
+
 from gdcdatamodel import models as md
+from gdcdatamodel.models import case_cache
 
 from migrations import update_case_cache
 
@@ -63,3 +66,123 @@ def test_update_case_cache(g, case_tree_no_cache):
 
         for node in nodes:
             assert node._related_cases
+
+
+def get_cached_case_ids(g):
+    with g.session_scope():
+        return {
+            node.node_id: sorted(c.node_id for c in node._related_cases)
+            for node in g.nodes().all()
+            if hasattr(node, '_related_cases')
+        }
+
+
+def test_rebuild_related_cases(g, case_tree_no_cache):
+    """Verify the server-side rebuild restores a dropped case cache"""
+
+    results = case_cache.rebuild_related_cases(g.engine, Node)
+
+    inserted = {r.label: r.inserted for r in results if r.inserted}
+    assert inserted == {'sample': 2, 'portion': 2, 'analyte': 2, 'aliquot': 2}
+    assert not any(r.deleted for r in results)
+
+    cached = get_cached_case_ids(g)
+    assert cached and all(ids == ['case'] for ids in cached.values())
+
+
+def test_rebuild_related_cases_deletes_stale(g, case_tree):
+    """Verify the server-side rebuild removes stale shortcut edges"""
+
+    with g.session_scope() as session:
+        session.add(md.Case('stale_case'))
+
+    # Bypass the flush hooks which would fix the cache right away
+    g.engine.execute(
+        "INSERT INTO {} (src_id, dst_id, _props, _sysan, acl) "
+        "VALUES ('aliquot1', 'stale_case', '{{}}', '{{}}', '{{}}')"
+        .format(md.AliquotRelatesToCase.__tablename__))
+
+    results = case_cache.rebuild_related_cases(g.engine, Node, workers=2)
+
+    deleted = {r.label: r.deleted for r in results if r.deleted}
+    assert deleted == {'aliquot': 1}
+    assert get_cached_case_ids(g)['aliquot1'] == ['case']
+
+    with g.session_scope():
+        g.nodes(md.Case).ids('stale_case').delete()
+
+
+def test_rebuild_related_cases_scoped(g, case_tree_no_cache):
+    """Verify a rebuild scoped to other cases doesn't touch this tree"""
+
+    results = case_cache.rebuild_related_cases(
+        g.engine, Node, case_ids=['other_case'])
+    assert not any(r.inserted or r.deleted for r in results)
+
+    results = case_cache.rebuild_related_cases(
+        g.engine, Node, case_ids=['case'])
+    assert sum(r.inserted for r in results) == 8
+
+
+def test_rebuild_scope_exclusive():
+    with pytest.raises(ValueError):
+        case_cache.get_rebuild_scope(project_ids=['A-B'], case_ids=['case'])
+
+
+def get_discrepancies(g, page_size=case_cache.VERIFY_PAGE_SIZE):
+    return [
+        discrepancy
+        for page in case_cache.verify_related_cases(g.engine, Node, page_size)
+        for discrepancy in page
+    ]
+
+
+def test_verify_related_cases(g, case_tree_no_cache):
+    """Verify missing shortcut edges are reported and repaired"""
+
+    discrepancies = get_discrepancies(g, page_size=1)
+
+    assert len(discrepancies) == 8
+    assert all(d.missing and d.dst_id == 'case' for d in discrepancies)
+    assert {d.label for d in discrepancies} == {
+        'sample', 'portion', 'analyte', 'aliquot'}
+
+    case_cache.repair_related_cases(g.engine, Node, discrepancies)
+
+    assert not get_discrepancies(g)
+    cached = get_cached_case_ids(g)
+    assert all(ids == ['case'] for ids in cached.values())
+
+
+def test_verify_related_cases_stale(g, case_tree):
+    """Verify stale shortcut edges are reported even when the parent's
+    cache is stale as well
+
+    """
+
+    with g.session_scope() as session:
+        session.add(md.Case('stale_case'))
+
+    for cls, src_id in [(md.AnalyteRelatesToCase, 'analyte1'),
+                        (md.AliquotRelatesToCase, 'aliquot1')]:
+        g.engine.execute(
+            "INSERT INTO {} (src_id, dst_id, _props, _sysan, acl) "
+            "VALUES ('{}', 'stale_case', '{{}}', '{{}}', '{{}}')"
+            .format(cls.__tablename__, src_id))
+
+    discrepancies = get_discrepancies(g)
+    assert sorted((d.label, d.src_id, d.missing) for d in discrepancies) == [
+        ('aliquot', 'aliquot1', False),
+        ('analyte', 'analyte1', False),
+    ]
+
+    graph = case_cache.get_case_cache_graph(Node)
+    script = case_cache.render_repair_sql(graph, discrepancies)
+    assert script.startswith('BEGIN;')
+    assert script.count('DELETE FROM') == 2
+
+    case_cache.repair_related_cases(g.engine, Node, discrepancies)
+    assert not get_discrepancies(g)
+
+    with g.session_scope():
+        g.nodes(md.Case).ids('stale_case').delete()
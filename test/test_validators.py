@@ -1,6 +1,10 @@
+import copy
+import unittest
 import uuid
 
 from gdcdatamodel.validators import GDCJSONValidator, GDCGraphValidator
+from gdcdatamodel.validators import ValidationPipeline
+from gdcdatamodel.validators import json_validators
 from gdcdatamodel.models import *
 
 from test.conftest import BaseTestCase
@@ -180,6 +184,34 @@ class TestValidators(BaseTestCase):
             self.graph_validator.record_errors(self.g, self.entities)
             self.assertEqual(['analytes'], self.entities[0].errors[0]['keys'])
 
+    def test_graph_validator_with_wrong_multiplicity_in_batch(self):
+        with self.g.session_scope() as session:
+            analyte = self.create_node({'type': 'analyte',
+                                        'props': {'submitter_id': 'test',
+                                                  'analyte_type_id': 'D',
+                                                  'analyte_type': 'DNA'},
+                                        'edges': {}}, session)
+            self.entities = []
+            for submitter_id in ['test_a', 'test_b']:
+                entity = MockSubmissionEntity()
+                entity.node = self.create_node(
+                    {'type': 'aliquot',
+                     'props': {'submitter_id': submitter_id},
+                     'edges': {'analytes': [analyte.node_id]}},
+                    session)
+                self.entities.append(entity)
+            self.update_schema(
+                'aliquot',
+                'links',
+                [{'name': 'analytes',
+                  'backref': 'aliquots',
+                  'label': 'derived_from',
+                  'multiplicity': 'one_to_one',
+                  'target_type': 'analyte'}])
+            self.graph_validator.record_errors(self.g, self.entities)
+            for entity in self.entities:
+                self.assertEqual(['analytes'], entity.errors[0]['keys'])
+
     def test_graph_validator_with_correct_node(self):
         with self.g.session_scope() as session:
             analyte = self.create_node({'type': 'analyte',
@@ -246,3 +278,100 @@ class TestValidators(BaseTestCase):
             # Check that missing edges is captured
             self.assertTrue(any({'analytes', 'samples'} == set(e['keys'])
                                 for e in self.entities[0].errors))
+
+    def test_graph_validator_with_unique_keys_in_batch(self):
+        with self.g.session_scope() as session:
+            self.update_schema('data_format', 'uniqueKeys', [['name']])
+            docs = [{'type': 'data_format', 'props': {'name': name},
+                     'edges': {}}
+                    for name in ['dup', 'dup', 'single']]
+            self.entities = []
+            for doc in docs:
+                entity = MockSubmissionEntity()
+                entity.node = self.create_node(doc, session)
+                self.entities.append(entity)
+
+            self.graph_validator.record_errors(self.g, self.entities)
+            self.assertEqual(['name'], self.entities[0].errors[0]['keys'])
+            self.assertEqual(['name'], self.entities[1].errors[0]['keys'])
+            self.assertEqual([], [
+                e for e in self.entities[2].errors if e['keys'] == ['name']])
+
+    def test_json_validator_reuses_validators(self):
+        self.entities[0].doc = {'type': 'aliquot', 'submitter_id': 'test',
+                                'centers': {'submitter_id': 'test'}}
+        self.json_validator.record_errors(self.entities)
+
+        schema = self.json_validator.schemas.schema['aliquot']
+        first = json_validators.get_validators(
+            self.json_validator.version, schema)
+        second = json_validators.get_validators(
+            self.json_validator.version, schema)
+        self.assertIs(first[0], second[0])
+
+    @unittest.skipIf(json_validators.fastjsonschema is None,
+                     'fastjsonschema is not installed')
+    def test_json_validator_compiled(self):
+        validator = GDCJSONValidator(compiled=True)
+        schema = validator.schemas.schema['aliquot']
+        _, compiled = json_validators.get_validators(
+            validator.version, schema, compiled=True)
+        self.assertIsNotNone(compiled)
+
+        self.entities[0].doc = {'type': 'aliquot', 'submitter_id': 1,
+                                'test': 'test',
+                                'centers': {'submitter_id': 'test'}}
+        entity = MockSubmissionEntity()
+        entity.doc = {'type': 'aliquot', 'submitter_id': 'test',
+                      'centers': {'submitter_id': 'test'}}
+        self.entities.append(entity)
+
+        docs = copy.deepcopy([e.doc for e in self.entities])
+        validator.record_errors(self.entities)
+        self.assertEqual(2, len(self.entities[0].errors))
+        self.assertEqual(0, len(entity.errors))
+        self.assertEqual(docs, [e.doc for e in self.entities])
+
+    def test_validation_pipeline_matches_json_validator(self):
+        docs = [
+            {'type': 'aliquot', 'submitter_id': 1, 'test': 'test',
+             'centers': {'submitter_id': 'test'}},
+            {'type': 'aliquot', 'submitter_id': 'test',
+             'centers': {'submitter_id': 'test'}},
+            {'type': 'aliquot', 'centers': {'submitter_id': True}},
+        ] * 5
+        expected, entities = [], []
+        for doc in docs:
+            for entities_list in (expected, entities):
+                entity = MockSubmissionEntity()
+                entity.doc = doc
+                entities_list.append(entity)
+
+        self.json_validator.record_errors(expected)
+        metrics = ValidationPipeline(workers=2, chunk_size=4, shard_size=3)\
+            .run(iter(entities))
+
+        self.assertEqual([e.errors for e in expected],
+                         [e.errors for e in entities])
+        self.assertEqual(len(docs), metrics['json'].entities)
+        self.assertEqual(sum(len(e.errors) for e in entities),
+                         metrics['json'].errors)
+        self.assertEqual(0, metrics['graph'].entities)
+
+    def test_validation_pipeline_with_graph(self):
+        with self.g.session_scope() as session:
+            self.update_schema('data_format', 'uniqueKeys', [['name']])
+            entities = []
+            for name in ['dup', 'dup']:
+                entity = MockSubmissionEntity()
+                entity.doc = {'type': 'data_format', 'name': name}
+                entity.node = self.create_node(
+                    {'type': 'data_format', 'props': {'name': name},
+                     'edges': {}}, session)
+                entities.append(entity)
+
+            metrics = ValidationPipeline(workers=0, chunk_size=1)\
+                .run(entities, self.g)
+            for entity in entities:
+                self.assertIn(['name'], [e['keys'] for e in entity.errors])
+            self.assertEqual(2, metrics['graph'].entities)
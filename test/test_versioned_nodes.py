@@ -1,3 +1,5 @@
+from sqlalchemy import event
+
 from gdcdatamodel import models as md
 
 from test.conftest import BaseTestCase
@@ -76,3 +78,197 @@ class TestValidators(BaseTestCase):
 
         with self.g.session_scope() as s:
             portion.get_versions(s).one()
+
+    def test_snapshot(self):
+        with self.g.session_scope() as session:
+            portion = self.new_portion()
+            analyte = self.new_analyte()
+            portion.analytes = [analyte]
+            session.add(portion)
+
+        with self.g.session_scope() as session:
+            count = md.VersionedNode.snapshot(
+                session, md.Portion, gdc_versions=['1.0'])
+            self.assertEqual(1, count)
+            self.assertEqual(0, md.VersionedNode.snapshot(
+                session, md.Portion, node_ids=[]))
+
+        with self.g.session_scope():
+            v_node = self.g.nodes(md.VersionedNode).one()
+            expected = md.VersionedNode.clone(self.g.nodes(md.Portion).one())
+
+        for attr in ['label', 'node_id', 'project_id', 'acl',
+                     'system_annotations', 'properties', 'neighbors']:
+            self.assertEqual(getattr(expected, attr), getattr(v_node, attr))
+        self.assertEqual(['1.0'], v_node.gdc_versions)
+
+    def test_snapshot_project(self):
+        with self.g.session_scope() as session:
+            portion = self.new_portion()
+            portion.analytes = [self.new_analyte()]
+            session.add(portion)
+
+        with self.g.session_scope() as session:
+            counts = md.VersionedNode.snapshot_project(
+                session, md.Node, 'CGCI-BLGSP')
+        self.assertEqual({'portion': 1, 'analyte': 1}, counts)
+
+        with self.g.session_scope():
+            analyte = self.g.nodes(md.VersionedNode).filter(
+                md.VersionedNode.label == 'analyte').one()
+            self.assertEqual(['case1'], analyte.neighbors)
+
+    def test_version_history(self):
+        with self.g.session_scope() as session:
+            session.add(self.new_portion())
+
+        with self.g.session_scope() as session:
+            portion = self.g.nodes(md.Portion).one()
+            for release in ['1', '2', '3', '4', '5']:
+                v_node = md.VersionedNode.clone(portion)
+                v_node.gdc_versions = [release]
+                session.add(v_node)
+
+        with self.g.session_scope() as session:
+            portion = self.g.nodes(md.Portion).one()
+
+            first = portion.get_version_history(session, limit=2)
+            self.assertEqual([['5'], ['4']], [v.gdc_versions for v in first])
+            second = portion.get_version_history(
+                session, before_key=first[-1].key, limit=2)
+            self.assertEqual([['3'], ['2']], [v.gdc_versions for v in second])
+
+            history = list(md.VersionedNode.iter_history(
+                session, portion.node_id, portion.label, page_size=2))
+            self.assertEqual(
+                [v.key for v in portion.get_versions(session)],
+                [v.key for v in history])
+
+            self.assertEqual(
+                ['3'], portion.get_version_as_of(session, '3').gdc_versions)
+            self.assertIsNone(portion.get_version_as_of(session, '6'))
+
+    def test_iter_as_of(self):
+        with self.g.session_scope() as session:
+            portion = self.new_portion()
+            portion.analytes = [self.new_analyte()]
+            session.add(portion)
+
+        with self.g.session_scope() as session:
+            portion = self.g.nodes(md.Portion).one()
+            analyte = self.g.nodes(md.Analyte).one()
+            for node, releases in [(portion, ['1']), (portion, ['2']),
+                                   (analyte, ['1']), (portion, ['3'])]:
+                v_node = md.VersionedNode.clone(node)
+                v_node.gdc_versions = releases
+                session.add(v_node)
+
+        with self.g.session_scope() as session:
+            rows = list(md.VersionedNode.iter_as_of(
+                session, '2', batch_size=1))
+            self.assertEqual(['portion'], [row.label for row in rows])
+            self.assertEqual(['2'], rows[0].gdc_versions)
+
+            rows = list(md.VersionedNode.iter_as_of(
+                session, '2', releases=['1', '2'], batch_size=1))
+            self.assertEqual(
+                {('analyte', ('1',)), ('portion', ('2',))},
+                {(row.label, tuple(row.gdc_versions)) for row in rows})
+            self.assertEqual(sorted(row.node_id for row in rows),
+                             [row.node_id for row in rows])
+
+            rows = list(md.VersionedNode.iter_as_of(
+                session, '2', label='analyte', releases=['1', '2']))
+            self.assertEqual(['analyte'], [row.label for row in rows])
+
+    def test_clone_delta(self):
+        with self.g.session_scope() as session:
+            portion = self.new_portion()
+            portion.analytes = [self.new_analyte()]
+            session.add(portion)
+
+        with self.g.session_scope() as session:
+            portion = self.g.nodes(md.Portion).one()
+            expected = []
+            for weight in range(5):
+                portion.weight = float(weight)
+                portion.sysan['weight'] = weight
+                if weight == 3:
+                    portion.analytes = []
+                session.flush()
+                full = md.VersionedNode.clone(portion)
+                full.gdc_versions = [str(weight)]
+                expected.append(full)
+
+                v_node = md.VersionedNode.clone_delta(
+                    session, portion, checkpoint_interval=3)
+                v_node.gdc_versions = [str(weight)]
+                session.add(v_node)
+                session.flush()
+
+        with self.g.session_scope() as session:
+            stored = md.VersionedNode.query_history(
+                session, 'case1', 'portion')
+            self.assertEqual(
+                [True, False, False, True, False],
+                [v.delta is None for v in reversed(stored)])
+            self.assertIsNone(stored[0].properties)
+
+            history = md.VersionedNode.get_history(
+                session, 'case1', 'portion', limit=2)
+            history += md.VersionedNode.get_history(
+                session, 'case1', 'portion', before_key=history[-1].key)
+            for version, full in zip(reversed(history), expected):
+                self.assertEqual(full.properties, version.properties)
+                self.assertEqual(full.system_annotations,
+                                 version.system_annotations)
+                self.assertEqual(full.acl, version.acl)
+                self.assertEqual(sorted(full.neighbors),
+                                 sorted(version.neighbors))
+
+            as_of = md.VersionedNode.get_as_of(
+                session, 'case1', 'portion', '2')
+            self.assertEqual(2.0, as_of.properties['weight'])
+
+            rows = list(md.VersionedNode.iter_as_of(session, '4'))
+            self.assertEqual(4.0, rows[0].properties['weight'])
+            self.assertEqual([], rows[0].neighbors)
+
+            portion = self.g.nodes(md.Portion).one()
+            versions = portion.get_versions(session).all()
+            self.assertEqual(
+                [full.properties for full in reversed(expected)],
+                [version.properties for version in versions])
+            self.assertEqual(
+                4.0, portion.get_versions(session).first().properties['weight'])
+
+    def test_resolve_bases_in_one_query(self):
+        with self.g.session_scope() as session:
+            session.add(self.new_portion())
+
+        with self.g.session_scope() as session:
+            portion = self.g.nodes(md.Portion).one()
+            for weight in range(4):
+                portion.weight = float(weight)
+                session.flush()
+                session.add(md.VersionedNode.clone_delta(session, portion))
+                session.flush()
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.g.session_scope() as session:
+            event.listen(self.g.engine, 'before_cursor_execute', count)
+            try:
+                history = md.VersionedNode.get_history(
+                    session, 'case1', 'portion', limit=1)
+            finally:
+                event.remove(self.g.engine, 'before_cursor_execute', count)
+
+            self.assertEqual(3.0, history[0].properties['weight'])
+            # the page and its bases, which are not added to the session
+            self.assertEqual(2, len(statements))
+            self.assertEqual(
+                1, len([v for v in session if isinstance(v, md.VersionedNode)]))